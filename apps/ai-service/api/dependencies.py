@@ -0,0 +1,26 @@
+"""
+FastAPI dependencies shared by the API routers.
+"""
+
+from fastapi import Request
+
+from services.claude import ClaudeService
+from services.moderation import ModerationService
+from services.registry import ServiceRegistry
+
+
+async def get_services(request: Request) -> ServiceRegistry:
+    """Return the service registry created in the app lifespan, once warmed up."""
+    services: ServiceRegistry = request.app.state.services
+    await services.ready()
+    return services
+
+
+async def get_claude_service(request: Request) -> ClaudeService:
+    """Dependency for the process-wide Claude service."""
+    return (await get_services(request)).claude
+
+
+async def get_moderation_service(request: Request) -> ModerationService:
+    """Dependency for the process-wide moderation service."""
+    return (await get_services(request)).moderation
@@ -3,22 +3,38 @@ Design assistant API endpoints.
 """
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional
 import json
 
 from models.design import (
+    BatchDesignItem,
+    BatchDesignRequest,
+    DesignAnalysis,
     DesignPreferences,
     CSSGenerationResponse,
+    CSSRefinementRequest,
+    CSSRefinementResponse,
+    PaletteResponse,
+    PaletteSwatch,
     TextDesignRequest,
 )
 from services.claude import ClaudeService
+from services.registry import ServiceRegistry
+from services.batch import bounded_map
+from services.css_parser import extract_colors
+from services.image_processing import ImageProcessingError
+from services.palette import extract_palette_async
+from services.limiter import UpstreamOverloaded
+from services.tracing import stage
+from services.streaming import StreamEvent
+from services.themes import theme_cache_stats
+from api.dependencies import get_claude_service, get_services
+from api.uploads import read_image_upload
+from config import get_settings
 
 router = APIRouter(prefix="/design", tags=["design"])
-
-
-def get_claude_service():
-    """Dependency for Claude service."""
-    return ClaudeService()
+settings = get_settings()
 
 
 @router.post("/from-image", response_model=CSSGenerationResponse)
@@ -31,63 +47,79 @@ async def design_from_image(
     Generate CSS from an inspiration image.
 
     Args:
-        image: Uploaded image file (JPEG, PNG, GIF)
+        image: Uploaded image file (JPEG, PNG, GIF, WebP)
         preferences: Optional JSON string of design preferences
 
     Returns:
         CSSGenerationResponse with generated CSS and metadata
     """
-    # Validate file type
-    if not image.content_type or not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
-
-    # Read image bytes
-    try:
-        image_bytes = await image.read()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read image: {str(e)}")
+    with stage("upload_read"):
+        upload = await read_image_upload(
+            image, settings.max_upload_bytes, settings.upload_chunk_size
+        )
 
     # Parse preferences
-    user_preferences = DesignPreferences()
-    if preferences:
-        try:
-            prefs_dict = json.loads(preferences)
-            user_preferences = DesignPreferences(**prefs_dict)
-        except Exception as e:
-            raise HTTPException(
-                status_code=400, detail=f"Invalid preferences JSON: {str(e)}"
-            )
+    with stage("preferences_parse"):
+        user_preferences = _parse_preferences(preferences)
 
-    # Analyze image
+    # Analyze image and generate CSS (cached by image content + preferences)
     try:
-        analysis = await claude_service.analyze_inspiration_image(image_bytes)
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to analyze image: {str(e)}"
-        )
-
-    # Generate CSS
-    try:
-        css = await claude_service.generate_css_from_analysis(
-            analysis, user_preferences
+        analysis, css = await claude_service.design_from_image(
+            upload.data, user_preferences, image_digest=upload.sha256
         )
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(
-            status_code=500, detail=f"Failed to generate CSS: {str(e)}"
+            status_code=500, detail=f"Failed to generate design: {str(e)}"
         )
 
-    # Build explanation
-    explanation = f"Generated a {analysis.aesthetic} design with a {analysis.mood} mood. "
-    explanation += f"The color palette includes {', '.join(analysis.colors[:3])}. "
-    explanation += f"Layout style: {analysis.layout_style}."
-
     return CSSGenerationResponse(
         css=css,
-        explanation=explanation,
+        explanation=_explain_analysis(analysis),
         colors=analysis.colors,
     )
 
 
+@router.post("/palette", response_model=PaletteResponse)
+async def palette_from_image(
+    image: UploadFile = File(..., description="Image to extract colors from"),
+    colors: int = Form(8, ge=1, le=16, description="Maximum number of colors"),
+):
+    """
+    Extract an image's dominant colors locally, without a model call.
+
+    Args:
+        image: Uploaded image file (JPEG, PNG, GIF, WebP)
+        colors: Maximum number of colors to return
+
+    Returns:
+        PaletteResponse with colors ordered by how much of the image they cover
+    """
+    with stage("upload_read"):
+        upload = await read_image_upload(
+            image, settings.max_upload_bytes, settings.upload_chunk_size
+        )
+
+    with stage("palette_extract"):
+        try:
+            swatches = await extract_palette_async(
+                upload.data, colors, settings.palette_sample_edge
+            )
+        except ImageProcessingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return PaletteResponse(
+        colors=[swatch.color for swatch in swatches],
+        swatches=[
+            PaletteSwatch(color=swatch.color, proportion=swatch.proportion)
+            for swatch in swatches
+        ],
+    )
+
+
 @router.post("/from-description", response_model=CSSGenerationResponse)
 async def design_from_description(
     request: TextDesignRequest,
@@ -102,12 +134,226 @@ async def design_from_description(
     Returns:
         CSSGenerationResponse with generated CSS and metadata
     """
-    if not request.description or len(request.description.strip()) < 10:
+    return await _design_from_description(request, claude_service)
+
+
+@router.post("/refine", response_model=CSSRefinementResponse)
+async def refine_design(
+    request: CSSRefinementRequest,
+    claude_service: ClaudeService = Depends(get_claude_service),
+):
+    """
+    Apply a small change to existing CSS without regenerating it.
+
+    Only the rules relevant to the feedback are sent to the model, which
+    returns just the rules it changes; those are merged into the stylesheet.
+
+    Args:
+        request: Current CSS and the requested change
+
+    Returns:
+        CSSRefinementResponse with the full refined CSS and changed selectors
+    """
+    if not request.current_css.strip():
+        raise HTTPException(status_code=400, detail="current_css must not be empty")
+    if len(request.feedback.strip()) < 3:
         raise HTTPException(
-            status_code=400,
-            detail="Description must be at least 10 characters long",
+            status_code=400, detail="Feedback must be at least 3 characters long"
         )
 
+    try:
+        css, explanation, changed = await claude_service.refine_css(
+            request.current_css, request.feedback
+        )
+    except UpstreamOverloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to refine CSS: {str(e)}"
+        )
+
+    return CSSRefinementResponse(
+        css=css,
+        explanation=explanation,
+        colors=_extract_colors(css),
+        changed_rules=changed,
+    )
+
+
+@router.post("/batch")
+async def design_batch(
+    batch: BatchDesignRequest,
+    claude_service: ClaudeService = Depends(get_claude_service),
+):
+    """
+    Generate designs for many text descriptions concurrently.
+
+    Requests run through ClaudeService with at most BATCH_MAX_CONCURRENCY
+    in flight. Results are streamed as NDJSON in completion order, one
+    BatchDesignItem per line, with per-item errors instead of failing the
+    whole batch.
+
+    Args:
+        batch: BatchDesignRequest with the text design requests
+
+    Returns:
+        application/x-ndjson response
+    """
+
+    async def lines() -> AsyncIterator[str]:
+        async for index, outcome in bounded_map(
+            batch.requests,
+            lambda request: _design_from_description(request, claude_service),
+            settings.batch_max_concurrency,
+        ):
+            if isinstance(outcome, HTTPException):
+                item = BatchDesignItem(index=index, error=outcome.detail)
+            elif isinstance(outcome, BaseException):
+                item = BatchDesignItem(index=index, error=str(outcome))
+            else:
+                item = BatchDesignItem(index=index, result=outcome)
+            yield item.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/from-image/stream")
+async def design_from_image_stream(
+    image: UploadFile = File(..., description="Inspiration image file"),
+    preferences: Optional[str] = Form(None, description="JSON string of DesignPreferences"),
+    claude_service: ClaudeService = Depends(get_claude_service),
+):
+    """
+    Stream CSS generated from an inspiration image as server-sent events.
+
+    Emits an ``explanation`` event once the image is analyzed, ``css`` delta
+    events as the stylesheet is generated, and a final ``done`` event whose
+    data is the complete CSSGenerationResponse.
+
+    Args:
+        image: Uploaded image file (JPEG, PNG, GIF, WebP)
+        preferences: Optional JSON string of design preferences
+
+    Returns:
+        text/event-stream response
+    """
+    with stage("upload_read"):
+        upload = await read_image_upload(
+            image, settings.max_upload_bytes, settings.upload_chunk_size
+        )
+    with stage("preferences_parse"):
+        user_preferences = _parse_preferences(preferences)
+
+    # Analyze before the stream starts so admission failures can still be a 503
+    # and undecodable images a 400
+    try:
+        analysis = await claude_service.analyze_inspiration_image(
+            upload.data, image_digest=upload.sha256
+        )
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    explanation = _explain_analysis(analysis)
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse(StreamEvent("explanation", {"delta": explanation}))
+
+        async for event in claude_service.stream_css_from_analysis(
+            analysis, user_preferences
+        ):
+            if event.type == "done":
+                event = StreamEvent(
+                    "done",
+                    CSSGenerationResponse(
+                        css=event.data["css"],
+                        explanation=explanation,
+                        colors=analysis.colors,
+                    ).model_dump(),
+                )
+            yield _sse(event)
+
+    return _event_stream(events())
+
+
+@router.post("/from-description/stream")
+async def design_from_description_stream(
+    request: TextDesignRequest,
+    claude_service: ClaudeService = Depends(get_claude_service),
+):
+    """
+    Stream CSS generated from a text description as server-sent events.
+
+    Emits ``explanation`` and ``css`` delta events as the model writes them,
+    then a final ``done`` event whose data is the complete
+    CSSGenerationResponse.
+
+    Args:
+        request: TextDesignRequest with description and preferences
+
+    Returns:
+        text/event-stream response
+    """
+    _validate_description(request)
+    preferences = request.preferences or DesignPreferences()
+
+    async def events() -> AsyncIterator[str]:
+        async for event in claude_service.stream_css_from_description(
+            request.description, preferences, request.current_css
+        ):
+            if event.type == "done":
+                css = event.data["css"]
+                event = StreamEvent(
+                    "done",
+                    CSSGenerationResponse(
+                        css=css,
+                        explanation=event.data["explanation"],
+                        colors=_extract_colors(css),
+                    ).model_dump(),
+                )
+            yield _sse(event)
+
+    return _event_stream(events())
+
+
+@router.get("/health")
+async def design_health(services: ServiceRegistry = Depends(get_services)):
+    """Health check for design endpoints, with cache and upstream limiter statistics."""
+    return {
+        "status": "healthy",
+        "endpoints": [
+            "/design/from-image",
+            "/design/from-description",
+            "/design/from-image/stream",
+            "/design/from-description/stream",
+            "/design/refine",
+            "/design/palette",
+            "/design/batch",
+        ],
+        "cache": services.cache.stats() if services.cache else None,
+        "upstream": {
+            **services.limiter.stats(),
+            **(services.claude.retrying.stats() if services.claude else {}),
+        },
+        "prompt_cache": services.claude.prompt_cache_stats() if services.claude else None,
+        "coalescing": (
+            services.claude.inflight.stats() if services.claude and services.claude.inflight else None
+        ),
+        "near_duplicates": (
+            services.near_duplicates.stats() if services.near_duplicates is not None else None
+        ),
+        "fallback_themes": theme_cache_stats(),
+    }
+
+
+# Helpers
+
+
+async def _design_from_description(
+    request: TextDesignRequest,
+    claude_service: ClaudeService,
+) -> CSSGenerationResponse:
+    """Validate a text design request and generate its CSS."""
+    _validate_description(request)
+
     # Use default preferences if not provided
     preferences = request.preferences or DesignPreferences()
 
@@ -116,28 +362,64 @@ async def design_from_description(
         css, explanation = await claude_service.generate_css_from_description(
             request.description, preferences, request.current_css
         )
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to generate CSS: {str(e)}"
         )
 
-    # Extract colors from CSS (simple regex - in production, use proper parser)
-    import re
-
-    color_pattern = r"#[0-9A-Fa-f]{6}"
-    colors = list(set(re.findall(color_pattern, css)))[:8]
-
     return CSSGenerationResponse(
         css=css,
         explanation=explanation,
-        colors=colors if colors else ["#FF006E", "#8338EC", "#3A86FF"],
+        colors=_extract_colors(css),
     )
 
 
-@router.get("/health")
-async def design_health():
-    """Health check for design endpoints."""
-    return {
-        "status": "healthy",
-        "endpoints": ["/design/from-image", "/design/from-description"],
-    }
+def _parse_preferences(preferences: Optional[str]) -> DesignPreferences:
+    """Parse the optional preferences form field."""
+    if not preferences:
+        return DesignPreferences()
+    try:
+        prefs_dict = json.loads(preferences)
+        return DesignPreferences(**prefs_dict)
+    except Exception as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid preferences JSON: {str(e)}"
+        )
+
+
+def _validate_description(request: TextDesignRequest) -> None:
+    if not request.description or len(request.description.strip()) < 10:
+        raise HTTPException(
+            status_code=400,
+            detail="Description must be at least 10 characters long",
+        )
+
+
+def _explain_analysis(analysis: DesignAnalysis) -> str:
+    """Human-readable explanation of an image analysis."""
+    explanation = f"Generated a {analysis.aesthetic} design with a {analysis.mood} mood. "
+    explanation += f"The color palette includes {', '.join(analysis.colors[:3])}. "
+    explanation += f"Layout style: {analysis.layout_style}."
+    return explanation
+
+
+def _extract_colors(css: str) -> List[str]:
+    """Palette colors of a stylesheet in order of use, or PixelBoxx defaults."""
+    with stage("color_extraction"):
+        colors = extract_colors(css, limit=8)
+    return colors if colors else ["#FF006E", "#8338EC", "#3A86FF"]
+
+
+def _sse(event: StreamEvent) -> str:
+    """Encode a stream event in server-sent events format."""
+    return f"event: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+
+def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
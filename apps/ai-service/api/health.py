@@ -2,9 +2,10 @@
 Health check endpoints.
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from datetime import datetime
-import os
+
+from config import get_settings
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -21,18 +22,26 @@ async def health_check():
 
 
 @router.get("/ready")
-async def readiness_check():
-    """Readiness check - verify all dependencies are available."""
-    api_key_set = bool(os.getenv("ANTHROPIC_API_KEY"))
-    mock_mode = os.getenv("ENABLE_MOCK_RESPONSES", "true").lower() == "true"
+async def readiness_check(request: Request):
+    """
+    Readiness check - verify all dependencies are available.
+
+    Readiness does not wait for the background warm-up (SDK imports, client
+    construction); requests that arrive before it finishes wait for it.
+    """
+    settings = get_settings()
+    api_key_set = bool(settings.anthropic_api_key)
+    mock_mode = settings.enable_mock_responses
 
     ready = api_key_set or mock_mode
+    services = getattr(request.app.state, "services", None)
 
     return {
         "ready": ready,
         "checks": {
             "anthropic_api_key": api_key_set,
             "mock_mode": mock_mode,
+            "warmed_up": services.is_warm if services else False,
         },
         "timestamp": datetime.utcnow().isoformat(),
     }
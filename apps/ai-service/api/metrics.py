@@ -0,0 +1,29 @@
+"""
+Prometheus metrics endpoint.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """
+    Metrics in Prometheus text exposition format.
+
+    With a shared metrics directory the values cover every worker; otherwise
+    only the worker serving the scrape.
+    """
+    services = getattr(request.app.state, "services", None)
+    shared = services.shared_metrics if services is not None else None
+    if shared is None:
+        body = REGISTRY.render()
+    else:
+        body = await asyncio.to_thread(shared.render, REGISTRY.snapshot())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
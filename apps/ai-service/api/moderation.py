@@ -0,0 +1,108 @@
+"""
+Content moderation API endpoints.
+"""
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+
+from models.moderation import (
+    BatchModerationRequest,
+    BatchModerationResponse,
+    BatchModerationResult,
+    ModerationResult,
+    TextModerationRequest,
+)
+from services.image_processing import ImageProcessingError
+from services.moderation import ModerationService
+from services.tracing import stage
+from api.dependencies import get_moderation_service
+from api.uploads import read_image_upload
+from config import get_settings
+
+router = APIRouter(prefix="/moderate", tags=["moderation"])
+settings = get_settings()
+
+
+@router.post("/text", response_model=ModerationResult)
+async def moderate_text(
+    request: TextModerationRequest,
+    moderation: ModerationService = Depends(get_moderation_service),
+):
+    """
+    Moderate one piece of user text (guestbook entry, bio, chat message).
+
+    Clear cases are decided by the local prefilter; the rest are batched with
+    other pending texts into one model call.
+
+    Args:
+        request: Text and where it appears
+
+    Returns:
+        ModerationResult with the action to take
+    """
+    return await moderation.moderate_text(request.content, request.context)
+
+
+@router.post("/image", response_model=ModerationResult)
+async def moderate_image(
+    image: UploadFile = File(..., description="Image to moderate"),
+    moderation: ModerationService = Depends(get_moderation_service),
+):
+    """
+    Moderate an uploaded image.
+
+    Copies of known-bad images are rejected by perceptual hash without a
+    model call; other images are checked by the model.
+
+    Args:
+        image: Uploaded image file (JPEG, PNG, GIF, WebP)
+
+    Returns:
+        ModerationResult with the action to take
+    """
+    with stage("upload_read"):
+        upload = await read_image_upload(
+            image, settings.max_upload_bytes, settings.upload_chunk_size
+        )
+
+    try:
+        return await moderation.moderate_image(upload.data, image_digest=upload.sha256)
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/batch", response_model=BatchModerationResponse)
+async def moderate_batch(
+    batch: BatchModerationRequest,
+    moderation: ModerationService = Depends(get_moderation_service),
+):
+    """
+    Moderate many texts in one request.
+
+    Every item goes through the local prefilter; the ones it cannot decide
+    share model calls of up to MODERATION_BATCH_SIZE texts each.
+
+    Args:
+        batch: Items with caller-chosen ids
+
+    Returns:
+        BatchModerationResponse with one result per item, in request order
+    """
+    results = await moderation.moderate_texts(
+        [(item.content, item.context) for item in batch.items]
+    )
+    return BatchModerationResponse(
+        results=[
+            BatchModerationResult(id=item.id, result=result)
+            for item, result in zip(batch.items, results)
+        ]
+    )
+
+
+@router.get("/health")
+async def moderation_health(moderation: ModerationService = Depends(get_moderation_service)):
+    """Health check for moderation endpoints, with prefilter and batching statistics."""
+    return {
+        "status": "healthy",
+        "endpoints": ["/moderate/text", "/moderate/image", "/moderate/batch"],
+        **moderation.stats(),
+    }
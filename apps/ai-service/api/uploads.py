@@ -0,0 +1,82 @@
+"""
+Validation and hashing of image uploads.
+
+The request body is bounded by ``BodySizeLimitMiddleware`` while it streams
+in; by the time a route runs, the multipart parser has already spooled the
+file, so these checks guard what the service accepts, not memory use.
+"""
+
+import hashlib
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+
+from services.image_processing import sniff_media_type
+
+
+@dataclass(frozen=True)
+class UploadedImage:
+    """An image upload read within limits."""
+    data: bytes
+    sha256: str
+    media_type: str
+
+
+async def read_image_upload(
+    upload: UploadFile,
+    max_bytes: int,
+    chunk_size: int = 64 * 1024,
+) -> UploadedImage:
+    """
+    Read a spooled image upload, checking its format and exact size.
+
+    The magic bytes are checked on the first chunk and the SHA-256 used as
+    the cache key is computed chunk by chunk, so the spooled file is not
+    copied again before hashing. The middleware limit allows for multipart
+    overhead; ``max_bytes`` applies to the file itself.
+
+    Args:
+        upload: Multipart file from the request
+        max_bytes: Largest accepted image size, in bytes
+        chunk_size: Bytes read per chunk
+
+    Returns:
+        UploadedImage with the data, its SHA-256 and sniffed media type
+
+    Raises:
+        HTTPException: 400 for non-images, 413 for oversized uploads
+    """
+    if not upload.content_type or not upload.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    media_type = None
+
+    try:
+        while chunk := await upload.read(chunk_size):
+            if media_type is None:
+                media_type = sniff_media_type(chunk)
+                if media_type is None:
+                    raise HTTPException(
+                        status_code=400,
+                        detail="Unsupported image format (expected JPEG, PNG, GIF or WebP)",
+                    )
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Image exceeds maximum size of {max_bytes} bytes",
+                )
+            digest.update(chunk)
+            chunks.append(chunk)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to read image: {str(e)}")
+
+    if media_type is None:
+        raise HTTPException(status_code=400, detail="Image file is empty")
+
+    return UploadedImage(data=b"".join(chunks), sha256=digest.hexdigest(), media_type=media_type)
@@ -0,0 +1,91 @@
+"""
+Per-request overhead of the middleware stack.
+
+Calls the ASGI app in-process (no sockets, no HTTP parsing) so the time per
+request is routing plus middleware: tracing, metrics, CORS, auth and the
+endpoint itself.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.asgi_overhead [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import List, Tuple
+
+API_KEY = "benchmark-key"
+os.environ["API_KEY"] = API_KEY
+
+from main import app  # noqa: E402
+
+CASES: List[Tuple[str, str, List[Tuple[bytes, bytes]]]] = [
+    ("GET /health", "/health", []),
+    ("authenticated 404", "/design/unknown", [(b"x-api-key", API_KEY.encode())]),
+    ("rejected (401)", "/design/unknown", [(b"x-api-key", b"wrong-key")]),
+    ("CORS GET /health", "/health", [(b"origin", b"http://localhost:3000")]),
+]
+
+
+async def call(path: str, headers: List[Tuple[bytes, bytes]]) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), *headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+        "app": app,
+    }
+    status = 0
+    sent_body = False
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run(requests: int) -> None:
+    for label, path, headers in CASES:
+        status = await call(path, headers)
+        for _ in range(200):  # warm up
+            await call(path, headers)
+        started = time.perf_counter()
+        for _ in range(requests):
+            await call(path, headers)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<20} {elapsed / requests * 1e6:>8.1f} µs/request  (status {status})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per case")
+    args = parser.parse_args()
+
+    import logging
+
+    logging.disable(logging.INFO)  # request logs would dominate the measurement
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Throughput benchmark for the CSS tokenizer, parser and sanitizer.
+
+Builds a large stylesheet by repeating the mock theme with varied colors and
+times each stage, plus the old regex color extraction for reference.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.css_parser [--kib 1024]
+"""
+
+import argparse
+import re
+import time
+from typing import Callable
+
+from config import Settings
+from models.design import DesignPreferences
+from services.claude import ClaudeService
+from services.css_parser import extract_colors, parse_stylesheet, sanitize_css, tokenize
+
+LEGACY_COLOR_PATTERN = re.compile(r"#[0-9A-Fa-f]{6}")
+
+
+def build_stylesheet(target_bytes: int) -> str:
+    """Mock-theme CSS repeated (with shifting colors) up to ``target_bytes``."""
+    service = ClaudeService(Settings(enable_mock_responses=True))
+    base = service._mock_css_generation(service._mock_image_analysis(), DesignPreferences())
+    parts = []
+    size = 0
+    i = 0
+    while size < target_bytes:
+        chunk = base.replace("#FF006E", f"#{i % 256:02X}006E").replace(".pixelpage", f".pixelpage.v{i}")
+        chunk += f"\n.widget.v{i} {{ color: rgb({i % 256}, 80, 200); border: 1px solid hsl({i % 360}, 80%, 50%); }}\n"
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    return "".join(parts)
+
+
+def bench(label: str, fn: Callable[[], object], size: int, repeat: int) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best * 1000:>9.1f} ms {size / best / 1e6:>8.1f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--kib", type=int, default=1024, help="Stylesheet size in KiB")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per stage (best is reported)")
+    args = parser.parse_args()
+
+    css = build_stylesheet(args.kib * 1024)
+    size = len(css.encode())
+    print(f"Stylesheet: {size / 1024:.0f} KiB, {css.count('{')} blocks")
+
+    bench("legacy regex colors", lambda: list(set(LEGACY_COLOR_PATTERN.findall(css)))[:8], size, args.repeat)
+    bench("tokenize", lambda: tokenize(css), size, args.repeat)
+    bench("parse", lambda: parse_stylesheet(css), size, args.repeat)
+    bench("parse + extract colors", lambda: extract_colors(css), size, args.repeat)
+    bench("parse + sanitize + serialize", lambda: sanitize_css(css), size, args.repeat)
+
+    typical = build_stylesheet(8 * 1024)
+    bench("sanitize 8 KiB response", lambda: sanitize_css(typical), len(typical), args.repeat * 20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Local fake of the Anthropic Messages API for load tests.
+
+Answers ``POST /v1/messages`` (streaming and non-streaming) with realistic
+payloads for the vision, CSS and description prompts after a configurable
+time-to-first-token and output token rate, and injects overload errors at a
+configurable rate. Point the service at it with ``ANTHROPIC_BASE_URL``.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.fake_anthropic [--port 9100] [--latency 0.5]
+        [--tokens-per-second 100] [--error-rate 0.0]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from models.design import DesignPreferences
+from services.themes import PRESET_PALETTES, render_theme
+
+ANALYSIS_REPLY = {
+    "colors": ["#FF71CE", "#01CDFE", "#05FFA1", "#B967FF", "#FFFB96"],
+    "aesthetic": "vaporwave with chrome accents",
+    "mood": "dreamy and nostalgic",
+    "layout_style": "centered cards on a gradient",
+    "typography_suggestions": "wide geometric sans-serif headings",
+    "animation_ideas": "slow floating avatar, shimmering borders",
+}
+
+# Rough characters per output token, for pacing and usage counts
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class FakeModelConfig:
+    """Behaviour of the fake server."""
+    latency: float = 0.5
+    tokens_per_second: float = 100.0
+    error_rate: float = 0.0
+    error_status: int = 529
+
+
+def reply_text(body: dict) -> str:
+    """Model output for a request, chosen from the shape of its prompt."""
+    messages = body.get("messages") or [{}]
+    content = messages[-1].get("content")
+    if isinstance(content, list) and any(block.get("type") == "image" for block in content):
+        return json.dumps(ANALYSIS_REPLY)
+
+    palette = random.choice(PRESET_PALETTES)
+    css = render_theme(palette, DesignPreferences(), title="fake model")
+    if "EXPLANATION" in json.dumps(body.get("system", "")) + json.dumps(content):
+        return (
+            "EXPLANATION: A neon theme with layered glows and a pixel grid.\n"
+            f"CSS:\n```css\n{css}```"
+        )
+    return f"Here is your stylesheet:\n\n```css\n{css}```"
+
+
+def create_app(config: FakeModelConfig):
+    """Build the ASGI application."""
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        if scope["method"] != "POST" or scope["path"] != "/v1/messages":
+            await _send_json(send, 404, {"type": "error", "error": {"type": "not_found_error"}})
+            return
+
+        body = json.loads(b"".join(chunks))
+        await asyncio.sleep(config.latency)
+        if random.random() < config.error_rate:
+            await _send_json(send, config.error_status, {
+                "type": "error",
+                "error": {"type": "overloaded_error", "message": "Overloaded (injected)"},
+            })
+            return
+
+        text = reply_text(body)
+        output_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        usage = {
+            "input_tokens": len(json.dumps(body)) // CHARS_PER_TOKEN,
+            "output_tokens": output_tokens,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+        }
+        if body.get("stream"):
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            })
+            async for event in _stream_events(body, text, usage, config):
+                await send({"type": "http.response.body", "body": event, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await asyncio.sleep(output_tokens / config.tokens_per_second)
+        await _send_json(send, 200, {
+            "id": "msg_fake",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        })
+
+    return app
+
+
+async def _send_json(send, status: int, payload: dict) -> None:
+    data = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())],
+    })
+    await send({"type": "http.response.body", "body": data})
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def _stream_events(
+    body: dict, text: str, usage: dict, config: FakeModelConfig
+) -> AsyncIterator[bytes]:
+    """Server-sent events for a streamed reply, paced at the configured token rate."""
+    yield _sse("message_start", {"type": "message_start", "message": {
+        "id": "msg_fake", "type": "message", "role": "assistant",
+        "model": body.get("model", "fake"), "content": [],
+        "stop_reason": None, "stop_sequence": None,
+        "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 0},
+    }})
+    yield _sse("content_block_start", {
+        "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+    })
+    # Ten tokens per event keeps the event count realistic without flooding
+    step = 10 * CHARS_PER_TOKEN
+    for start in range(0, len(text), step):
+        await asyncio.sleep(10 / config.tokens_per_second)
+        yield _sse("content_block_delta", {
+            "type": "content_block_delta", "index": 0,
+            "delta": {"type": "text_delta", "text": text[start:start + step]},
+        })
+    yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+    yield _sse("message_delta", {
+        "type": "message_delta",
+        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+        "usage": {"output_tokens": usage["output_tokens"]},
+    })
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="Output token rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that fail")
+    parser.add_argument("--error-status", type=int, default=529, help="Status of injected failures")
+    args = parser.parse_args()
+
+    config = FakeModelConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
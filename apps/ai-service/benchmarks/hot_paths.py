@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks for the per-response hot paths.
+
+Times the post-processing every model response goes through (code-fence
+stripping and sanitizing, explanation/CSS splitting, color extraction) and
+fallback theme rendering, on realistic model output. Save a baseline before a
+change and compare against it afterwards to catch regressions before deploy.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.hot_paths [--save baseline.json]
+    python -m benchmarks.hot_paths --compare baseline.json [--tolerance 0.2]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from typing import Callable, Dict
+
+from config import Settings
+from models.design import DesignPreferences
+from services.claude import ClaudeService
+from services.css_parser import extract_colors
+from services.themes import _render_theme, render_theme
+
+PREFERENCES = DesignPreferences(neon_intensity="high", pixel_density="heavy", animation_level="high")
+
+
+def build_cases() -> Dict[str, Callable[[], object]]:
+    service = ClaudeService(Settings(enable_mock_responses=True))
+    css = render_theme(["#F72585", "#7209B7", "#4CC9F0"], PREFERENCES, title="benchmark")
+    # A rule the sanitizer has to remove, as model output sometimes contains
+    css += "\nbody > iframe { position: fixed; background: url(https://example.com/x.png); }\n"
+    css_response = f"Here is your stylesheet:\n\n```css\n{css}```\nEnjoy!"
+    combined_response = f"EXPLANATION: Bold neon theme with a pixel grid.\nCSS:\n```css\n{css}```"
+    uncached_render = _render_theme.__wrapped__
+    colors = ("#F72585", "#7209B7", "#4CC9F0")
+
+    return {
+        "_clean_css": lambda: service._clean_css(css_response),
+        "_parse_explanation_and_css": lambda: service._parse_explanation_and_css(combined_response),
+        "extract_colors": lambda: extract_colors(css),
+        "render_theme (cached)": lambda: render_theme(colors, PREFERENCES),
+        "render_theme (uncached)": lambda: uncached_render(
+            colors, "benchmark", True, False, "high", "heavy", "high"
+        ),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int) -> float:
+    """Best-of-``repeat`` time per call, in microseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds (best is reported)")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file from --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    for name, fn in build_cases().items():
+        results[name] = micros = measure(fn, args.repeat)
+        line = f"{name:<28} {micros:>10.1f} µs"
+        if name in baseline:
+            change = micros / baseline[name] - 1
+            line += f"  {change:>+7.1%} vs baseline"
+            if change > args.tolerance:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print(f"\nSlower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
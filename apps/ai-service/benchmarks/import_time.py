@@ -0,0 +1,112 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import ``main``.
+
+Each run imports the app in a new subprocess under ``python -X importtime``
+and reports the median total, the slowest modules, and whether any module
+that should load lazily (the Anthropic SDK, httpx, Pillow) was imported.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.import_time [--runs 7] [--record import_times.jsonl]
+
+``--record`` appends one JSON line per run of the benchmark, tagged with the
+current git commit, so startup time can be tracked across commits.
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Must not be imported by `import main`; they load during background warm-up
+LAZY_MODULES = ("anthropic", "httpx", "PIL")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_once(module: str) -> Tuple[float, Dict[str, int], List[str]]:
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        Total import time in ms, self time in µs per module, and the lazy
+        modules that were imported anyway
+    """
+    check = f"import sys, {module}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    self_times: Dict[str, int] = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        self_times[name] = int(self_us)
+        if not indent:
+            total += int(cumulative_us)
+    eager = [name for name in result.stdout.strip().split(",") if name]
+    return total / 1000, self_times, eager
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters to start")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    parser.add_argument("--record", help="Append a JSON result line to this file")
+    args = parser.parse_args()
+
+    import_once(args.module)  # populate the bytecode cache of the tree
+    totals = []
+    self_times: Dict[str, List[int]] = {}
+    eager: List[str] = []
+    for _ in range(args.runs):
+        total, times, eager = import_once(args.module)
+        totals.append(total)
+        for name, value in times.items():
+            self_times.setdefault(name, []).append(value)
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: median {median:.0f} ms, min {min(totals):.0f} ms over {args.runs} runs")
+    print("\nSlowest modules (median self time):")
+    slowest = sorted(
+        ((statistics.median(values), name) for name, values in self_times.items()), reverse=True
+    )
+    for value, name in slowest[:args.top]:
+        print(f"  {value / 1000:>7.1f} ms  {name}")
+    print(f"\nLazy modules imported eagerly: {', '.join(eager) or 'none'}")
+
+    if args.record:
+        with open(args.record, "a") as f:
+            f.write(json.dumps({
+                "commit": git_commit(),
+                "module": args.module,
+                "median_ms": round(median, 1),
+                "min_ms": round(min(totals), 1),
+                "runs": args.runs,
+                "eager_lazy_modules": eager,
+            }) + "\n")
+
+    if eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+End-to-end load test against a local fake model server.
+
+Boots ``benchmarks.fake_anthropic`` and the service (through the production
+launcher, ``gunicorn.conf.py``) as subprocesses, then drives each endpoint at
+a fixed concurrency and reports throughput, latency percentiles, status codes
+and worker RSS. Every request carries a distinct description, or an image
+whose perceptual hash is far from every other one, so neither the result
+cache nor the near-duplicate index answers. The image phase also reports how
+many analyses were reused from a near-duplicate, which should be zero.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.load_test [--workers 2] [--concurrency 32]
+        [--requests 500] [--latency 0.5] [--tokens-per-second 100]
+        [--error-rate 0.0] [--endpoints health,description,image]
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from PIL import Image
+
+API_KEY = "load-test-key"
+
+
+@dataclass
+class PhaseResult:
+    """Measurements for one endpoint."""
+    endpoint: str
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    rss_mib: Dict[int, float] = field(default_factory=dict)
+
+    def report(self) -> str:
+        ordered = sorted(self.latencies)
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+        statuses = " ".join(f"{status}:{count}" for status, count in sorted(self.statuses.items()))
+        rss = " ".join(f"{value:.0f}" for value in self.rss_mib.values())
+        return (
+            f"{self.endpoint:<12} {len(ordered) / self.elapsed:>8.1f} rps"
+            f"  p50 {cuts[49] * 1000:>7.1f}  p95 {cuts[94] * 1000:>7.1f}  p99 {cuts[98] * 1000:>7.1f} ms"
+            f"  [{statuses}]  worker RSS MiB: {rss}"
+        )
+
+
+def unique_png(i: int) -> bytes:
+    """
+    A small PNG that is no near-duplicate of any other ``i``.
+
+    The image is a 9x8 grid of random colors seeded by ``i``, the grid the
+    difference hash samples, so each hash bit is a coin flip and two images
+    differ in about 32 of 64 bits. Solid or almost solid images would all
+    hash to about zero and match each other.
+    """
+    rng = random.Random(i)
+    grid = Image.new("RGB", (9, 8))
+    grid.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(72)])
+    image = grid.resize((108, 96), Image.Resampling.NEAREST)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def request_factory(endpoint: str, count: int) -> Callable[[httpx.AsyncClient, int], "asyncio.Future"]:
+    headers = {"X-API-Key": API_KEY}
+    if endpoint == "health":
+        return lambda client, i: client.get("/health")
+    if endpoint == "description":
+        return lambda client, i: client.post(
+            "/design/from-description",
+            headers=headers,
+            json={"description": f"retro arcade profile number {i} with neon signs and a starfield"},
+        )
+    if endpoint == "image":
+        images = [unique_png(i) for i in range(count)]
+        return lambda client, i: client.post(
+            "/design/from-image",
+            headers=headers,
+            files={"image": (f"inspiration-{i}.png", images[i], "image/png")},
+        )
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def near_duplicate_reuses(base_url: str) -> float:
+    """Image analyses served from the near-duplicate index, from /metrics."""
+    response = httpx.get(f"{base_url}/metrics", headers={"X-API-Key": API_KEY}, timeout=10.0)
+    response.raise_for_status()
+    match = re.search(r"^pixelboxx_near_duplicate_reuse_total(?:\{\})? (\S+)$", response.text, re.MULTILINE)
+    return float(match[1]) if match else 0.0
+
+
+def worker_rss_mib(master_pid: int) -> Dict[int, float]:
+    """Resident set size of each child of ``master_pid``, from /proc (Linux only)."""
+    rss: Dict[int, float] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        if int(fields.get("PPid", "0").strip()) == master_pid and "VmRSS" in fields:
+            rss[int(entry)] = int(fields["VmRSS"].split()[0]) / 1024
+    return rss
+
+
+async def run_phase(
+    base_url: str, endpoint: str, requests: int, concurrency: int, master_pid: int
+) -> PhaseResult:
+    make_request = request_factory(endpoint, requests)
+    result = PhaseResult(endpoint)
+    next_index = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        async def user() -> None:
+            for i in next_index:
+                started = time.perf_counter()
+                try:
+                    response = await make_request(client, i)
+                    result.statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    result.statuses[type(e).__name__] += 1
+                result.latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - started
+
+    result.rss_mib = worker_rss_mib(master_pid)
+    return result
+
+
+def wait_until_ready(url: str, timeout: float = 30.0, warm: bool = False) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(url, timeout=1.0)
+            if response.status_code < 500 and (not warm or response.json()["checks"]["warmed_up"]):
+                return
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def start(command: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    return subprocess.Popen(
+        command,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", type=int, default=2, help="Service worker processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint")
+    parser.add_argument("--endpoints", default="health,description,image")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake model time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="Fake model output rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of model calls that fail")
+    parser.add_argument("--port", type=int, default=9000, help="Service port")
+    parser.add_argument("--fake-port", type=int, default=9100, help="Fake model server port")
+    args = parser.parse_args()
+
+    fake = start([
+        sys.executable, "-m", "benchmarks.fake_anthropic",
+        "--port", str(args.fake_port),
+        "--latency", str(args.latency),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--error-rate", str(args.error_rate),
+    ])
+    service = start(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        env={
+            "PORT": str(args.port),
+            "HOST": "127.0.0.1",
+            "WEB_CONCURRENCY": str(args.workers),
+            "ANTHROPIC_API_KEY": "fake-key",
+            "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{args.fake_port}",
+            "ENABLE_MOCK_RESPONSES": "false",
+            "API_KEY": API_KEY,
+            "CACHE_DISK_PATH": "",
+            "LOG_LEVEL": "WARNING",
+        },
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.fake_port}/")
+        wait_until_ready(f"{base_url}/health/ready", warm=True)
+        print(
+            f"{args.workers} workers, {args.concurrency} clients, {args.requests} requests/endpoint, "
+            f"model latency {args.latency}s at {args.tokens_per_second:.0f} tok/s, "
+            f"error rate {args.error_rate:.0%}"
+        )
+        for endpoint in args.endpoints.split(","):
+            reused = near_duplicate_reuses(base_url)
+            result = asyncio.run(
+                run_phase(base_url, endpoint.strip(), args.requests, args.concurrency, service.pid)
+            )
+            print(result.report())
+            if endpoint.strip() == "image":
+                print(f"{'':<12} near-duplicate reuses: {near_duplicate_reuses(base_url) - reused:.0f}")
+    finally:
+        stop(service)
+        stop(fake)
+
+
+if __name__ == "__main__":
+    main()
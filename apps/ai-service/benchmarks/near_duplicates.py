@@ -0,0 +1,134 @@
+"""
+Near-duplicate index: lookup latency at scale and hash robustness.
+
+Builds a HashIndex of random 64-bit hashes and times searches that hit (a
+stored hash with a few bits flipped) and miss (a fresh random hash), then
+shows how far the hash of a test image moves under the edits users apply
+when re-sharing a picture.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.near_duplicates [--entries 1000000] [--distance 5]
+"""
+
+import argparse
+import io
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from services.image_processing import load_pillow
+from services.phash import HashIndex, dhash
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def flip_bits(value: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def time_searches(index: HashIndex, queries: List[int], distance: int) -> List[float]:
+    """Time per search, in microseconds."""
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, distance)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def index_memory(index: HashIndex) -> int:
+    """Bytes held by the index tables and buckets."""
+    total = 0
+    for table in index._tables:
+        total += sys.getsizeof(table)
+        for bucket in table.values():
+            total += sys.getsizeof(bucket) + sys.getsizeof(bucket[0]) + sys.getsizeof(bucket[1])
+    return total
+
+
+def test_image() -> bytes:
+    """A photo-like image: smooth gradient with a few shapes."""
+    Image = load_pillow()
+    from PIL import ImageDraw
+
+    image = Image.new("RGB", (800, 600))
+    pixels = image.load()
+    for y in range(600):
+        for x in range(800):
+            pixels[x, y] = (x * 255 // 800, y * 255 // 600, 128)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((120, 80, 420, 380), fill=(240, 60, 140))
+    draw.rectangle((480, 260, 740, 540), fill=(30, 30, 90))
+    return encode(image)
+
+
+def encode(image, fmt: str = "PNG", **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def transforms() -> Dict[str, Callable]:
+    Image = load_pillow()
+    from PIL import ImageEnhance
+
+    return {
+        "resize to 50%": lambda im: encode(im.resize((400, 300), Image.Resampling.LANCZOS)),
+        "JPEG quality 85": lambda im: encode(im, "JPEG", quality=85),
+        "JPEG quality 30": lambda im: encode(im, "JPEG", quality=30),
+        "crop 5% border": lambda im: encode(im.crop((40, 30, 760, 570))),
+        "brightness +20%": lambda im: encode(ImageEnhance.Brightness(im).enhance(1.2)),
+        "grayscale": lambda im: encode(im.convert("L")),
+        "mirrored (different)": lambda im: encode(im.transpose(Image.Transpose.FLIP_LEFT_RIGHT)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=1_000_000, help="Hashes in the index")
+    parser.add_argument("--distance", type=int, default=5, help="Search radius in bits")
+    parser.add_argument("--queries", type=int, default=2000, help="Searches per kind")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(args.entries)]
+
+    start = time.perf_counter()
+    index = HashIndex(hashes)
+    build = time.perf_counter() - start
+    memory = index_memory(index)
+    print(f"Built {len(index):,} entries in {build:.1f} s "
+          f"({build / len(index) * 1e6:.1f} µs/entry, {memory / 2**20:.0f} MiB)")
+
+    hits = [
+        flip_bits(rng.choice(hashes), rng.randint(0, args.distance), rng)
+        for _ in range(args.queries)
+    ]
+    misses = [rng.getrandbits(64) for _ in range(args.queries)]
+    for name, queries in (("hit", hits), ("miss", misses)):
+        samples = time_searches(index, queries, args.distance)
+        print(f"search {name:<5} r={args.distance}  "
+              f"mean {statistics.fmean(samples):7.1f} µs  "
+              f"p50 {percentile(samples, 0.5):7.1f} µs  "
+              f"p99 {percentile(samples, 0.99):7.1f} µs")
+
+    print(f"\nHash distance from the original (match at <= {args.distance}):")
+    Image = load_pillow()
+    original_bytes = test_image()
+    original = Image.open(io.BytesIO(original_bytes))
+    reference = dhash(original_bytes)
+    for name, transform in transforms().items():
+        distance = bin(reference ^ dhash(transform(original))).count("1")
+        print(f"  {name:<22} {distance:>2}  {'match' if distance <= args.distance else 'no match'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Token-count benchmark for prompt rendering.
+
+Compares the user-turn prompts ClaudeService builds today against the old
+pretty-printed rendering (``model_dump_json(indent=2)`` and verbatim CSS) for
+a few representative requests, and checks that the shared design prefix is
+long enough for the model to cache.
+
+Run from apps/ai-service:
+
+    python -m benchmarks.prompt_tokens
+
+Counts use the tokenizer bundled with the anthropic SDK when the optional
+``tokenizers`` package is installed. It only approximates current models, but
+the old/new ratio is what matters here. Without it, tokens are estimated as
+characters / 4.
+"""
+
+from typing import Callable, List, Optional, Tuple
+
+from config import Settings
+from models.design import DesignAnalysis, DesignPreferences
+from prompts.design_prompts import CSS_GENERATION_PROMPT, DESIGN_SYSTEM_PROMPT
+from services.claude import ClaudeService, prompt_cache_min_tokens
+
+ANALYSIS = DesignAnalysis(
+    colors=["#ff00ff", "#00ffff", "#1a0033", "#ffcc00", "#ff3366", "#0d0221"],
+    aesthetic="vaporwave cyberpunk",
+    mood="energetic and mysterious",
+    layout_style="asymmetric grid with a full-bleed hero",
+    typography_suggestions="bold geometric sans-serif headings, monospace body",
+    animation_ideas="scanline overlay, pulsing neon borders, glitch on hover",
+)
+
+CURRENT_CSS = """
+/* Base theme */
+.pixelpage {
+    --primary-color: #ff00ff;
+    --secondary-color: #00ffff;
+    background: linear-gradient(180deg, #1a0033 0%, #0d0221 100%);
+    font-family: 'Press Start 2P', monospace;
+}
+
+.profile-header {
+    text-shadow: 0 0 10px var(--primary-color), 0 0 20px var(--primary-color);
+    padding: 16px 24px;
+}
+
+.top-friends-item:hover {
+    transform: translateY(-4px);
+    box-shadow: 4px 4px 0 var(--secondary-color);
+}
+"""
+
+DESCRIPTION = "A dark synthwave theme with purple and teal neon, retro grid floor and chunky pixel borders"
+
+CASES: List[Tuple[str, DesignPreferences, Optional[str]]] = [
+    ("default preferences", DesignPreferences(), None),
+    ("custom preferences", DesignPreferences(animation_level="high", neon_intensity="high"), None),
+    ("with current CSS", DesignPreferences(dark_mode=False), CURRENT_CSS),
+]
+
+
+def legacy_css_prompt(
+    analysis: DesignAnalysis, preferences: DesignPreferences, current_css: Optional[str]
+) -> str:
+    """CSS generation prompt as rendered before compact serialization."""
+    prompt = CSS_GENERATION_PROMPT.format(
+        analysis=analysis.model_dump_json(indent=2),
+        preferences=preferences.model_dump_json(indent=2),
+    )
+    if current_css:
+        prompt += f"\n\nCurrent CSS to build upon:\n{current_css}"
+    return prompt
+
+
+def legacy_description_prompt(
+    description: str, preferences: DesignPreferences, current_css: Optional[str]
+) -> str:
+    """Description prompt as rendered before compact serialization."""
+    return f"""Generate CSS for a PixelBoxx profile based on this description:
+
+"{description}"
+
+User Preferences:
+{preferences.model_dump_json(indent=2)}
+
+{f'Current CSS to build upon:{current_css}' if current_css else ''}
+
+First, briefly explain your design choices in 2-3 sentences.
+Then output the CSS code.
+
+Format:
+EXPLANATION: [your explanation]
+CSS:
+[css code]
+"""
+
+
+def token_counter() -> Tuple[str, Callable[[str], int]]:
+    """Best available token counter and a label describing it."""
+    try:
+        from anthropic import Anthropic
+
+        client = Anthropic(api_key="unused")
+        client.count_tokens("warm up")
+        return "anthropic tokenizer", client.count_tokens
+    except ImportError:
+        return "estimate (chars / 4)", lambda text: max(1, len(text) // 4)
+
+
+def main() -> None:
+    label, count = token_counter()
+    settings = Settings(anthropic_api_key="unused", enable_mock_responses=False)
+    service = ClaudeService(settings)
+
+    print(f"Token counts ({label})")
+    print(f"{'case':<40} {'old':>6} {'new':>6} {'saved':>7}")
+    for name, preferences, current_css in CASES:
+        rows = [
+            (
+                f"analysis css / {name}",
+                legacy_css_prompt(ANALYSIS, preferences, current_css),
+                service._css_request(ANALYSIS, preferences, current_css),
+            ),
+            (
+                f"description / {name}",
+                legacy_description_prompt(DESCRIPTION, preferences, current_css),
+                service._description_request(DESCRIPTION, preferences, current_css),
+            ),
+        ]
+        for case, old_prompt, request in rows:
+            old = count(old_prompt)
+            new = count(request["messages"][0]["content"])
+            print(f"{case:<40} {old:>6} {new:>6} {1 - new / old:>6.0%}")
+
+    prefix = count(DESIGN_SYSTEM_PROMPT)
+    minimum = prompt_cache_min_tokens(settings.anthropic_model)
+    print(f"\nCached design prefix: {prefix} tokens "
+          f"({'cacheable' if prefix >= minimum else 'too short to cache'}, minimum {minimum})")
+
+
+if __name__ == "__main__":
+    main()
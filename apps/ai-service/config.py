@@ -0,0 +1,120 @@
+"""
+Service configuration.
+
+All environment-driven settings are parsed once per process here; the rest of
+the service reads them from the cached ``Settings`` instance.
+"""
+
+from functools import lru_cache
+from typing import List
+
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Environment configuration for the AI service."""
+
+    environment: str = "development"
+    host: str = "0.0.0.0"
+    port: int = 8000
+    log_level: str = "INFO"
+
+    # Production launcher (gunicorn.conf.py); 0 workers = one per available CPU
+    web_concurrency: int = 0
+    shutdown_grace_seconds: float = 75.0
+    # Directory where workers share metrics so /metrics covers all of them
+    # (gunicorn.conf.py creates one when unset); snapshot interval in seconds
+    metrics_dir: str = ""
+    metrics_publish_interval: float = 5.0
+
+    # Internal service authentication; API_KEYS holds extra comma-separated
+    # keys accepted alongside API_KEY while keys are rotated
+    api_key: str = ""
+    api_keys: str = ""
+    # Serve /metrics without a key (only where the port is private to the scraper)
+    metrics_public: bool = False
+
+    # CORS
+    allowed_origins: str = "http://localhost:3000"
+
+    # Anthropic
+    anthropic_api_key: str = ""
+    # Override the API endpoint, e.g. the local fake server in benchmarks/
+    anthropic_base_url: str = ""
+    anthropic_model: str = "claude-sonnet-4-5-20250929"
+    anthropic_max_connections: int = 100
+    anthropic_max_keepalive: int = 20
+    anthropic_timeout: float = 60.0
+    anthropic_prompt_caching: bool = True
+    prompt_max_css_chars: int = 12000
+
+    # Uploads
+    max_upload_bytes: int = 20 * 1024 * 1024
+    upload_chunk_size: int = 64 * 1024
+
+    # Batch generation
+    batch_max_concurrency: int = 8
+
+    # Vision preprocessing
+    image_max_edge: int = 1568
+    image_quality: int = 85
+    palette_sample_edge: int = 128
+
+    # Upstream admission control (adaptive, per worker)
+    upstream_max_in_flight: int = 32
+    upstream_min_in_flight: int = 2
+    upstream_queue_size: int = 64
+    upstream_queue_timeout: float = 10.0
+
+    # Upstream retries and hedging
+    upstream_max_attempts: int = 3
+    upstream_retry_base_delay: float = 0.5
+    upstream_retry_max_delay: float = 8.0
+    upstream_deadline: float = 60.0
+    upstream_hedging: bool = False
+    upstream_hedge_min_delay: float = 2.0
+
+    # Share one upstream call between identical concurrent requests
+    request_coalescing: bool = True
+
+    # Reuse the analysis of a perceptually near-identical image (per worker;
+    # NEAR_DUPLICATE_PATH persists entries across restarts)
+    near_duplicate_reuse: bool = True
+    near_duplicate_distance: int = 5
+    near_duplicate_max_entries: int = 1_000_000
+    near_duplicate_path: str = ""
+
+    # Content moderation: local prefilter lists, then batched model calls
+    moderation_model: str = "claude-haiku-4-5-20251001"
+    moderation_batch_size: int = 20
+    moderation_batch_delay: float = 0.05
+    moderation_local_approve_max_chars: int = 40
+    moderation_terms_path: str = ""
+    moderation_image_hashes_path: str = ""
+    moderation_image_distance: int = 6
+
+    # Result cache
+    cache_max_entries: int = 1024
+    cache_ttl_seconds: float = 86400.0
+    cache_disk_path: str = ""
+    cache_disk_max_entries: int = 100_000
+
+    # Feature flags
+    enable_mock_responses: bool = True
+
+    @property
+    def api_keys_list(self) -> List[str]:
+        """Every accepted internal API key, without duplicates."""
+        keys = [self.api_key, *self.api_keys.split(",")]
+        return list(dict.fromkeys(key.strip() for key in keys if key.strip()))
+
+    @property
+    def allowed_origins_list(self) -> List[str]:
+        """CORS origins as a list."""
+        return [origin.strip() for origin in self.allowed_origins.split(",") if origin.strip()]
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Return the process-wide settings instance."""
+    return Settings()
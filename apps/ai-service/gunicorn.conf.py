@@ -0,0 +1,86 @@
+"""
+Gunicorn configuration for production.
+
+Runs one Uvicorn worker per available CPU (or ``WEB_CONCURRENCY``) with the
+application imported once in the master and forked into the workers. Each
+worker builds its own service registry in the lifespan, so connection pools,
+limiters and the in-memory cache are per worker; set ``CACHE_DISK_PATH`` to
+share cached results between workers through the SQLite tier.
+
+On SIGTERM workers stop accepting connections, finish in-flight requests and
+drain outstanding model calls for up to ``SHUTDOWN_GRACE_SECONDS`` before the
+master kills them.
+
+Metrics are recorded per worker but a scrape reaches only one of them, so the
+workers share snapshots through ``METRICS_DIR`` (a fresh temporary directory
+unless set) and ``/metrics`` reports the sum over all workers.
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+
+import math
+import os
+import shutil
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set before the settings are read so the forked workers inherit it
+_temporary_metrics_dir = not os.environ.get("METRICS_DIR")
+if _temporary_metrics_dir:
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="pixelboxx-metrics-")
+
+from config import get_settings  # noqa: E402
+from services.metrics import MultiprocessMetrics  # noqa: E402
+
+settings = get_settings()
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity masks and cgroup v2 quotas."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.web_concurrency or available_cpus()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Requests can legitimately wait a full upstream deadline; only kill hung workers
+timeout = int(settings.upstream_deadline + settings.shutdown_grace_seconds)
+graceful_timeout = int(settings.shutdown_grace_seconds)
+keepalive = 75
+
+# Request logs come from TracingMiddleware
+accesslog = None
+errorlog = "-"
+loglevel = settings.log_level.lower()
+
+
+def on_starting(server):
+    # Totals from a previous run must not carry over
+    os.makedirs(settings.metrics_dir, exist_ok=True)
+    MultiprocessMetrics.clear(settings.metrics_dir)
+    server.log.info("Starting %d workers on %s", workers, bind)
+
+
+def worker_exit(server, worker):
+    server.log.info("Worker %s exited", worker.pid)
+
+
+def on_exit(server):
+    if _temporary_metrics_dir:
+        shutil.rmtree(settings.metrics_dir, ignore_errors=True)
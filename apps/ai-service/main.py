@@ -4,31 +4,51 @@ PixelBoxx AI Service - FastAPI application.
 Provides AI-powered design assistance and content moderation.
 """
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-import os
 from contextlib import asynccontextmanager
 
-from api import design, health
-
-# Load environment variables
+# Load environment variables before settings are read
 load_dotenv()
 
+import logging
+
+from config import get_settings
+from logging_config import configure_logging
+from api import design, health, metrics, moderation
+from services import ServiceRegistry
+from services.limiter import UpstreamOverloaded
+from middleware import APIKeyMiddleware, BodySizeLimitMiddleware, MetricsMiddleware, TracingMiddleware
+
+settings = get_settings()
+configure_logging(settings.log_level)
+logger = logging.getLogger("pixelboxx")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
-    print("Starting PixelBoxx AI Service...")
-    print(f"Environment: {os.getenv('ENVIRONMENT', 'development')}")
-    print(f"Mock Mode: {os.getenv('ENABLE_MOCK_RESPONSES', 'true')}")
+    logger.info(
+        "Starting PixelBoxx AI Service",
+        extra={
+            "environment": settings.environment,
+            "mock_mode": settings.enable_mock_responses,
+        },
+    )
+
+    # Shared services live for the whole process; tests may pre-seed a registry
+    services = getattr(app.state, "services", None) or ServiceRegistry(settings)
+    await services.startup()
+    app.state.services = services
 
     yield
 
     # Shutdown
-    print("Shutting down PixelBoxx AI Service...")
+    logger.info("Shutting down PixelBoxx AI Service")
+    await services.shutdown()
 
 
 # Initialize FastAPI app
@@ -41,42 +61,48 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# CORS Configuration
-allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+# Middleware is pure ASGI, configured once here; the last one added runs
+# first: tracing -> metrics -> CORS -> auth -> body limit -> routes
+
+# Reject oversized image uploads while they stream in (allow multipart overhead)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.max_upload_bytes + 64 * 1024,
+    path_prefixes=["/design/from-image", "/moderate/image"],
+)
+
+# Internal API key authentication (health checks and docs are open; metrics
+# reveal traffic and failure rates, so they need a key unless opted out)
+exempt_paths = ["/", "/health", "/health/ready", "/docs", "/redoc", "/openapi.json"]
+if settings.metrics_public:
+    exempt_paths.append("/metrics")
+app.add_middleware(
+    APIKeyMiddleware,
+    api_keys=settings.api_keys_list,
+    exempt_paths=exempt_paths,
+)
 
+# CORS Configuration (outside auth so preflights and 401s carry CORS headers)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=allowed_origins,
+    allow_origins=settings.allowed_origins_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Per-endpoint request metrics
+app.add_middleware(MetricsMiddleware)
 
-# Internal API Key Authentication Middleware
-@app.middleware("http")
-async def authenticate_request(request: Request, call_next):
-    """Verify internal API key for non-health endpoints."""
-    # Skip auth for health checks and docs
-    if request.url.path in ["/", "/health", "/health/ready", "/docs", "/redoc", "/openapi.json"]:
-        return await call_next(request)
-
-    # Check API key for other endpoints
-    api_key = os.getenv("API_KEY")
-    if api_key:
-        provided_key = request.headers.get("X-API-Key")
-        if provided_key != api_key:
-            return JSONResponse(
-                status_code=401,
-                content={"detail": "Invalid or missing API key"},
-            )
-
-    return await call_next(request)
+# Request IDs, Server-Timing and structured request logs
+app.add_middleware(TracingMiddleware)
 
 
 # Include routers
 app.include_router(health.router)
 app.include_router(design.router)
+app.include_router(moderation.router)
+app.include_router(metrics.router)
 
 
 # Root endpoint
@@ -92,11 +118,22 @@ async def root():
     }
 
 
+# Upstream admission control rejected the call - tell the client when to retry
+@app.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded_handler(request: Request, exc: UpstreamOverloaded):
+    """Fast 503 instead of queueing requests that would hit rate limits."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Handle unexpected exceptions."""
-    print(f"Unexpected error: {exc}")
+    logger.error("Unexpected error", exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -106,16 +143,14 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+# Development server; production runs `gunicorn -c gunicorn.conf.py main:app`
 if __name__ == "__main__":
     import uvicorn
 
-    port = int(os.getenv("PORT", 8000))
-    host = os.getenv("HOST", "0.0.0.0")
-
     uvicorn.run(
         "main:app",
-        host=host,
-        port=port,
-        reload=True,
+        host=settings.host,
+        port=settings.port,
+        reload=settings.environment == "development",
         log_level="info",
     )
@@ -0,0 +1,8 @@
+"""ASGI middleware."""
+
+from .auth import APIKeyMiddleware
+from .body_limit import BodySizeLimitMiddleware
+from .metrics import MetricsMiddleware
+from .tracing import TracingMiddleware
+
+__all__ = ["APIKeyMiddleware", "BodySizeLimitMiddleware", "MetricsMiddleware", "TracingMiddleware"]
@@ -0,0 +1,56 @@
+"""
+Internal API key authentication.
+
+Accepted keys are resolved once at startup. Several keys may be valid at the
+same time so they can be rotated without downtime: deploy the new key next to
+the old one, move the callers over, then drop the old key.
+"""
+
+import hmac
+from typing import Iterable
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+API_KEY_HEADER = b"x-api-key"
+
+
+class APIKeyMiddleware:
+    """Pure ASGI middleware rejecting requests without a valid ``X-API-Key``."""
+
+    def __init__(self, app: ASGIApp, api_keys: Iterable[str], exempt_paths: Iterable[str]):
+        """
+        Args:
+            app: Wrapped ASGI application
+            api_keys: Accepted keys; if empty, authentication is disabled
+            exempt_paths: Exact paths served without a key (health checks, docs)
+        """
+        self.app = app
+        self.api_keys = tuple(key.encode() for key in api_keys if key)
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.api_keys
+            or scope["path"] in self.exempt_paths
+            or self._authorized(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        response = JSONResponse(
+            status_code=401,
+            content={"detail": "Invalid or missing API key"},
+        )
+        await response(scope, receive, send)
+
+    def _authorized(self, scope: Scope) -> bool:
+        provided = next((value for name, value in scope["headers"] if name == API_KEY_HEADER), None)
+        if provided is None:
+            return False
+        # Compare against every key so timing does not reveal which one matched
+        matched = False
+        for key in self.api_keys:
+            matched |= hmac.compare_digest(provided, key)
+        return matched
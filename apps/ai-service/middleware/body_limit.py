@@ -0,0 +1,84 @@
+"""
+Request body size limit enforced while the body streams in.
+
+Requests whose declared Content-Length is too large are rejected before any
+of the body is read; chunked uploads are cut off as soon as they cross the
+limit, so an oversized upload never has to be buffered in full.
+"""
+
+from typing import Iterable
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware returning 413 for oversized request bodies."""
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefixes: Iterable[str]):
+        """
+        Args:
+            app: Wrapped ASGI application
+            max_bytes: Largest accepted request body, in bytes
+            path_prefixes: Only requests under these paths are limited
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_bytes:
+                    await self._reject(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            if too_large and not response_started:
+                # Body parsing may turn our exception into its own error
+                # response; drop it and answer 413 below instead.
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            if response_started:
+                raise
+
+        if too_large and not response_started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds {self.max_bytes} bytes"},
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
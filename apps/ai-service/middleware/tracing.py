@@ -0,0 +1,65 @@
+"""
+Request ID propagation, Server-Timing and request logging.
+"""
+
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.tracing import end_trace, resolve_request_id, start_trace
+
+logger = logging.getLogger("pixelboxx.request")
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware that starts a trace per request.
+
+    Accepts ``X-Request-ID`` from the caller (or generates one), echoes it on
+    the response with a ``Server-Timing`` header of the spans recorded so far,
+    and logs one structured line per completed request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                incoming = value.decode("latin-1")
+                break
+
+        trace, token = start_trace(resolve_request_id(incoming))
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = trace.request_id
+                headers.append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            logger.info(
+                "request completed",
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "duration_ms": round(trace.elapsed() * 1000, 2),
+                    "spans_ms": trace.span_summary(),
+                },
+            )
+            end_trace(token)
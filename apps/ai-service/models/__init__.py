@@ -1,17 +1,43 @@
 from .design import (
+    BatchDesignItem,
+    BatchDesignRequest,
     DesignPreferences,
     DesignAnalysis,
     CSSGenerationRequest,
     CSSGenerationResponse,
+    CSSRefinementRequest,
+    CSSRefinementResponse,
     ImageAnalysisRequest,
+    PaletteResponse,
+    PaletteSwatch,
     TextDesignRequest,
 )
+from .moderation import (
+    BatchModerationItem,
+    BatchModerationRequest,
+    BatchModerationResponse,
+    BatchModerationResult,
+    ModerationResult,
+    TextModerationRequest,
+)
 
 __all__ = [
+    "BatchDesignItem",
+    "BatchDesignRequest",
     "DesignPreferences",
     "DesignAnalysis",
     "CSSGenerationRequest",
     "CSSGenerationResponse",
+    "CSSRefinementRequest",
+    "CSSRefinementResponse",
     "ImageAnalysisRequest",
+    "PaletteResponse",
+    "PaletteSwatch",
     "TextDesignRequest",
+    "BatchModerationItem",
+    "BatchModerationRequest",
+    "BatchModerationResponse",
+    "BatchModerationResult",
+    "ModerationResult",
+    "TextModerationRequest",
 ]
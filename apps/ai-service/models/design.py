@@ -46,3 +46,42 @@ class CSSGenerationResponse(BaseModel):
     explanation: str = Field(description="Human-readable explanation of design choices")
     colors: List[str] = Field(description="Primary colors used in the design")
     preview_url: Optional[str] = Field(default=None, description="Optional preview image URL")
+
+
+class CSSRefinementRequest(BaseModel):
+    """Request for a small, targeted change to existing CSS."""
+    current_css: str = Field(description="Stylesheet to refine")
+    feedback: str = Field(description="What to change, e.g. 'make the header bluer'")
+
+
+class CSSRefinementResponse(CSSGenerationResponse):
+    """Refined CSS plus the rules that were touched."""
+    changed_rules: List[str] = Field(
+        default_factory=list, description="Selectors of rules added, changed or removed"
+    )
+
+
+class PaletteSwatch(BaseModel):
+    """One color of a locally extracted palette."""
+    color: str = Field(description="Hex color")
+    proportion: float = Field(description="Share of the image covered by this color (0-1)")
+
+
+class PaletteResponse(BaseModel):
+    """Palette extracted from an image without a model call."""
+    colors: List[str] = Field(description="Hex colors, most prominent first")
+    swatches: List[PaletteSwatch] = Field(description="Colors with their coverage")
+
+
+class BatchDesignRequest(BaseModel):
+    """Request for generating many designs from text descriptions."""
+    requests: List[TextDesignRequest] = Field(
+        min_length=1, max_length=100, description="Design requests to run"
+    )
+
+
+class BatchDesignItem(BaseModel):
+    """One line of the NDJSON batch response."""
+    index: int = Field(description="Position of the request in the batch")
+    result: Optional[CSSGenerationResponse] = None
+    error: Optional[str] = None
@@ -0,0 +1,47 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+ModerationAction = Literal["approve", "reject", "review"]
+
+
+class ModerationResult(BaseModel):
+    """Moderation verdict; mirrors the Nest API's ModerationResult contract."""
+    safe: bool = Field(description="Whether the content can be published as-is")
+    score: float = Field(ge=0.0, le=1.0, description="Safety score: 1 clearly fine, 0 clearly violating")
+    flags: List[str] = Field(default_factory=list, description="Policy categories that matched")
+    action: ModerationAction = Field(description="approve, reject or review (send to a human)")
+    reason: Optional[str] = Field(default=None, description="Short human-readable reason")
+    tier: Literal["local", "model", "fallback"] = Field(
+        default="local", description="Which tier decided: local prefilter, model, or fallback"
+    )
+
+
+class TextModerationRequest(BaseModel):
+    """Request for moderating one piece of user text."""
+    content: str = Field(max_length=10000, description="Text to moderate")
+    context: Optional[str] = Field(
+        default=None, max_length=64, description="Where the text appears, e.g. guestbook, bio, chat"
+    )
+
+
+class BatchModerationItem(TextModerationRequest):
+    """One text in a batch, with a caller-chosen id."""
+    id: str = Field(max_length=128, description="Caller's id for the item, echoed in the result")
+
+
+class BatchModerationRequest(BaseModel):
+    """Request for moderating many texts at once."""
+    items: List[BatchModerationItem] = Field(
+        min_length=1, max_length=500, description="Texts to moderate"
+    )
+
+
+class BatchModerationResult(BaseModel):
+    """Verdict for one item of a batch."""
+    id: str
+    result: ModerationResult
+
+
+class BatchModerationResponse(BaseModel):
+    """Verdicts for a batch, in request order."""
+    results: List[BatchModerationResult]
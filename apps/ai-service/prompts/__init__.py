@@ -1,13 +1,32 @@
 from .design_prompts import (
     DESIGN_SYSTEM_PROMPT,
+    CSS_OUTPUT_PROMPT,
     IMAGE_ANALYSIS_PROMPT,
     CSS_GENERATION_PROMPT,
+    DESCRIPTION_PROMPT,
+    CURRENT_CSS_SECTION,
     REFINEMENT_PROMPT,
 )
+from .moderation_prompts import (
+    MODERATION_SYSTEM_PROMPT,
+    TEXT_MODERATION_PROMPT,
+    IMAGE_MODERATION_PROMPT,
+)
+from .render import compact_css, minify_css, render_analysis, render_preferences
 
 __all__ = [
     "DESIGN_SYSTEM_PROMPT",
+    "CSS_OUTPUT_PROMPT",
     "IMAGE_ANALYSIS_PROMPT",
     "CSS_GENERATION_PROMPT",
+    "DESCRIPTION_PROMPT",
+    "CURRENT_CSS_SECTION",
     "REFINEMENT_PROMPT",
+    "MODERATION_SYSTEM_PROMPT",
+    "TEXT_MODERATION_PROMPT",
+    "IMAGE_MODERATION_PROMPT",
+    "compact_css",
+    "minify_css",
+    "render_analysis",
+    "render_preferences",
 ]
@@ -1,5 +1,11 @@
 """
 Design prompts for Claude AI to generate PixelBoxx profile CSS.
+
+``DESIGN_SYSTEM_PROMPT`` is the shared system prefix of every design call
+(vision, CSS, description, refinement) and carries the prompt-cache
+breakpoint, so it must stay identical across calls and longer than the
+model's minimum cacheable length. Call-specific instructions follow it in
+their own system block.
 """
 
 DESIGN_SYSTEM_PROMPT = """You are a creative web designer specializing in PixelBoxx profile customization.
@@ -57,7 +63,148 @@ DESIGN GUIDELINES:
    - Avoid expensive properties like filter in animations
    - Reasonable animation durations
 
-OUTPUT FORMAT:
+USER PREFERENCES:
+Requests list only the preferences that differ from these defaults:
+dark_mode=true, animation_level="medium", high_contrast=false, pixel_density="normal", neon_intensity="medium"
+"defaults" means all of the above apply.
+
+WHAT THE SANITIZER REMOVES:
+Every stylesheet is parsed and sanitized before it reaches the page. These are dropped, so never write them:
+- Selectors that do not start with one of the classes above, :not(), :has(), :is(), :where() and other functional pseudo-classes, and the ~ and + combinators
+- :root rules other than custom properties (--name: value)
+- position: fixed, behavior, -moz-binding, expression(), javascript: and remote url(); only data:image/... URLs are kept
+- @import, @font-face and any at-rule other than @media, @supports, @container and @keyframes
+
+REFERENCE STYLESHEET:
+This shows the expected structure and conventions: variables first, one block per component, keyframes near the rules that use them, media queries last. It is not a template. Choose colors, fonts, effects and layout for each request.
+
+.pixelpage {
+  --primary-color: #ff2bd6;
+  --secondary-color: #00e5ff;
+  --accent-color: #ffe600;
+  --bg-color: #0b0221;
+  --surface-color: #1a0b3d;
+  --text-color: #f4f0ff;
+  --glow-color: rgba(255, 43, 214, 0.6);
+  --border-width: 4px;
+  --animation-speed: 1;
+  background: linear-gradient(180deg, var(--bg-color) 0%, #150440 60%, #2a0a5e 100%);
+  color: var(--text-color);
+  font-family: "Press Start 2P", "VT323", monospace;
+  font-size: clamp(12px, 1.6vw, 16px);
+  line-height: 1.6;
+  padding: 16px;
+}
+
+.profile-header {
+  padding: 32px 24px;
+  text-align: center;
+  background: var(--surface-color);
+  box-shadow: 0 0 0 var(--border-width) var(--primary-color), 8px 8px 0 var(--border-width) var(--secondary-color);
+}
+
+.profile-header h1 {
+  font-size: clamp(20px, 4vw, 40px);
+  text-shadow: 0 0 4px var(--glow-color), 0 0 12px var(--glow-color), 0 0 24px var(--primary-color);
+  animation: neon-flicker calc(4s / var(--animation-speed)) infinite;
+}
+
+@keyframes neon-flicker {
+  0%, 100% { opacity: 1; }
+  92% { opacity: 1; }
+  94% { opacity: 0.6; }
+  96% { opacity: 1; }
+}
+
+.profile-avatar {
+  width: 128px;
+  height: 128px;
+  image-rendering: pixelated;
+  border: var(--border-width) solid var(--secondary-color);
+  box-shadow: 0 0 16px var(--secondary-color);
+  animation: float calc(6s / var(--animation-speed)) ease-in-out infinite;
+}
+
+@keyframes float {
+  0%, 100% { transform: translateY(0); }
+  50% { transform: translateY(-8px); }
+}
+
+.profile-bio,
+.widget,
+.music-player,
+.guestbook {
+  margin-top: 24px;
+  padding: 16px;
+  background: var(--surface-color);
+  border: var(--border-width) solid var(--primary-color);
+  box-shadow: 4px 4px 0 var(--secondary-color);
+}
+
+.top-friends {
+  display: grid;
+  grid-template-columns: repeat(auto-fill, minmax(96px, 1fr));
+  gap: 16px;
+  margin-top: 24px;
+}
+
+.top-friends-item {
+  padding: 8px;
+  text-align: center;
+  background: var(--surface-color);
+  border: 2px solid var(--secondary-color);
+  transition: transform 0.2s steps(4), box-shadow 0.2s steps(4);
+}
+
+.top-friends-item:hover {
+  transform: translate(-4px, -4px);
+  box-shadow: 4px 4px 0 var(--accent-color);
+}
+
+.photo-gallery {
+  display: grid;
+  grid-template-columns: repeat(auto-fill, minmax(140px, 1fr));
+  gap: 8px;
+}
+
+.photo-gallery-item {
+  image-rendering: pixelated;
+  border: 2px solid var(--primary-color);
+}
+
+.guestbook-entry {
+  padding: 8px 0;
+  border-bottom: 2px dashed var(--secondary-color);
+}
+
+.profile-badge {
+  display: inline-block;
+  padding: 4px 8px;
+  color: var(--bg-color);
+  background: var(--accent-color);
+  box-shadow: 2px 2px 0 var(--primary-color);
+}
+
+@media (prefers-reduced-motion: reduce) {
+  .profile-header h1,
+  .profile-avatar {
+    animation: none;
+  }
+}
+
+@media (max-width: 600px) {
+  .pixelpage {
+    padding: 8px;
+  }
+  .profile-avatar {
+    width: 96px;
+    height: 96px;
+  }
+}
+"""
+
+# Output rules for the CSS calls, sent after the shared DESIGN_SYSTEM_PROMPT
+CSS_OUTPUT_PROMPT = """OUTPUT FORMAT:
 Return ONLY valid CSS code. No explanations, no markdown code blocks, just pure CSS.
 The CSS will be sanitized and injected into a sandboxed profile page.
 """
@@ -107,9 +254,30 @@ Requirements:
 Output ONLY the CSS code, no explanations or markdown.
 """
 
+DESCRIPTION_PROMPT = """Generate CSS for a PixelBoxx profile based on this description:
+
+"{description}"
+
+User Preferences:
+{preferences}
+{current_css}
+First, briefly explain your design choices in 2-3 sentences.
+Then output the CSS code.
+
+Format:
+EXPLANATION: [your explanation]
+CSS:
+[css code]
+"""
+
+CURRENT_CSS_SECTION = """
+Current CSS to build upon:
+{current_css}
+"""
+
 REFINEMENT_PROMPT = """Refine the existing CSS based on user feedback.
 
-Current CSS:
+Current CSS (only the rules relevant to the feedback):
 {current_css}
 
 User Feedback:
@@ -121,5 +289,16 @@ Make the requested changes while:
 3. Not breaking the layout or responsiveness
 4. Using only allowed CSS selectors
 
-Output ONLY the updated CSS code.
+Return a patch, not the whole stylesheet:
+- Output only the rules you add or change, each with its complete declaration block
+- Reuse the exact selector to replace an existing rule
+- Keep rules that sit inside @media (or another at-rule) inside the same at-rule
+- To remove a rule, output its selector with an empty block, e.g. .widget {{}}
+
+First, briefly explain your changes in one or two sentences.
+
+Format:
+EXPLANATION: [your explanation]
+CSS:
+[changed rules only]
 """
@@ -0,0 +1,113 @@
+"""
+Compact, deterministic rendering of request data into prompts.
+
+Pretty-printed JSON pads every prompt with indentation and restates default
+preferences on every call. These helpers emit the smallest text that carries
+the same information, always in the same order, so equal inputs render to
+equal prompts (and equal cache keys).
+"""
+
+import json
+import re
+from typing import Optional
+
+from models.design import DesignAnalysis, DesignPreferences
+
+# Strings are kept verbatim, comments dropped, whitespace around punctuation
+# removed and any other whitespace run collapsed to one space. Whitespace
+# before ":" is kept because ".a :hover" and ".a:hover" differ.
+_CSS_TOKEN = re.compile(
+    r"""(?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""
+    r"|(?P<comment>/\*.*?\*/)"
+    r"|\s*(?P<punct>[{};,>])\s*"
+    r"|(?P<colon>:)\s+"
+    r"|(?P<space>\s+)",
+    re.DOTALL,
+)
+
+TRUNCATION_MARKER = "/* truncated */"
+
+
+def render_analysis(analysis: DesignAnalysis) -> str:
+    """
+    Render a design analysis as single-line JSON.
+
+    Args:
+        analysis: Analysis to render
+
+    Returns:
+        Compact JSON with keys in model field order
+    """
+    return json.dumps(analysis.model_dump(), separators=(",", ":"), ensure_ascii=False)
+
+
+def render_preferences(preferences: DesignPreferences) -> str:
+    """
+    Render only the preferences that differ from their defaults.
+
+    The defaults themselves are stated once in ``DESIGN_SYSTEM_PROMPT``.
+
+    Args:
+        preferences: User preferences
+
+    Returns:
+        ``key=value`` pairs in field order, or ``defaults`` if none differ
+    """
+    overrides = preferences.model_dump(exclude_defaults=True)
+    if not overrides:
+        return "defaults"
+    return ", ".join(
+        f"{name}={json.dumps(overrides[name])}"
+        for name in DesignPreferences.model_fields
+        if name in overrides
+    )
+
+
+def minify_css(css: str) -> str:
+    """
+    Strip comments and insignificant whitespace from CSS.
+
+    Args:
+        css: Stylesheet text
+
+    Returns:
+        Equivalent CSS on a single line
+    """
+
+    def replace(match: re.Match) -> str:
+        kind = match.lastgroup
+        if kind == "string":
+            return match.group("string")
+        if kind == "comment":
+            return ""
+        if kind == "punct":
+            return match.group("punct")
+        if kind == "colon":
+            return ":"
+        return " "
+
+    return _CSS_TOKEN.sub(replace, css).strip()
+
+
+def compact_css(css: Optional[str], max_chars: int) -> Optional[str]:
+    """
+    Minify CSS for a prompt and cut it to ``max_chars`` at a rule boundary.
+
+    Args:
+        css: Stylesheet text, or None
+        max_chars: Maximum length of the returned CSS
+
+    Returns:
+        Minified (and possibly truncated) CSS, or None if there is none
+    """
+    if not css:
+        return None
+    css = minify_css(css)
+    if not css:
+        return None
+    if len(css) <= max_chars:
+        return css
+
+    budget = max(0, max_chars - len(TRUNCATION_MARKER))
+    cut = css.rfind("}", 0, budget)
+    return css[: cut + 1] + TRUNCATION_MARKER if cut != -1 else TRUNCATION_MARKER
@@ -1,3 +1,5 @@
-from .claude import ClaudeService
+from .claude import ClaudeService, create_http_client
+from .moderation import ModerationService
+from .registry import ServiceRegistry
 
-__all__ = ["ClaudeService"]
+__all__ = ["ClaudeService", "ModerationService", "ServiceRegistry", "create_http_client"]
@@ -0,0 +1,48 @@
+"""
+Bounded-concurrency scheduling for batch work.
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Sequence, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def bounded_map(
+    items: Sequence[T],
+    worker: Callable[[T], Awaitable[R]],
+    limit: int,
+) -> AsyncIterator[Tuple[int, Union[R, BaseException]]]:
+    """
+    Run ``worker`` over ``items`` with at most ``limit`` calls in flight.
+
+    Results are yielded in completion order as ``(index, result)`` pairs; a
+    failing item yields its exception instead of aborting the batch. If the
+    consumer stops iterating (e.g. the client disconnects), unfinished work
+    is cancelled.
+
+    Args:
+        items: Inputs to process
+        worker: Async function applied to each input
+        limit: Maximum concurrent worker calls
+
+    Yields:
+        Tuples of (input index, result or exception)
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(index: int, item: T) -> Tuple[int, Union[R, BaseException]]:
+        async with semaphore:
+            try:
+                return index, await worker(item)
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,213 @@
+"""
+Content-addressed result cache for model responses.
+
+Entries are keyed by a hash of the request content (image bytes or normalized
+description, preferences and model name). Values must be JSON-serializable so
+they can be persisted to the optional on-disk tier.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from services.metrics import CACHE_LOOKUPS
+
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Build a stable cache key from arbitrary JSON-serializable parts.
+
+    Args:
+        parts: Values identifying the request (kind, model, content hash, ...)
+
+    Returns:
+        Hex SHA-256 digest of the canonical JSON encoding of ``parts``
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def normalize_description(description: str) -> str:
+    """Collapse whitespace and case so trivially different descriptions share a key."""
+    return " ".join(description.split()).casefold()
+
+
+# Disk inserts between sweeps of expired rows and the row cap
+DISK_PURGE_INTERVAL = 100
+
+
+class _DiskTier:
+    """SQLite-backed persistent tier; every method blocks and runs off-loop."""
+
+    def __init__(self, path: str, max_rows: int):
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        # WAL lets every worker process read while one of them writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)"
+        )
+        self._inserts = 0
+        with self._lock:
+            self._purge()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= time.time():
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return expires_at, json.loads(value)
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        encoded = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, encoded, expires_at),
+            )
+            self._inserts += 1
+            # Sweeping on every insert would count the table each time; the
+            # cap may be overshot by up to DISK_PURGE_INTERVAL rows meanwhile
+            if self._inserts >= DISK_PURGE_INTERVAL:
+                self._purge()
+            else:
+                self._conn.commit()
+
+    def _purge(self) -> None:
+        """Delete expired rows, then the rows expiring soonest beyond the cap; needs the lock."""
+        self._inserts = 0
+        self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        (rows,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        if rows > self.max_rows:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY expires_at LIMIT ?)",
+                (rows - self.max_rows,),
+            )
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    In-memory LRU + TTL cache with an optional SQLite tier that survives restarts.
+
+    The disk tier is swept for expired rows when it is opened and every
+    ``DISK_PURGE_INTERVAL`` inserts, and is capped at ``disk_max_entries``
+    rows, dropping the rows expiring soonest first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 86400.0,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ):
+        """
+        Args:
+            max_entries: Maximum entries held in memory before LRU eviction
+            ttl_seconds: Lifetime of an entry in both tiers
+            disk_path: Optional SQLite file for the persistent tier
+            disk_max_entries: Rows kept on disk; beyond it the rows expiring
+                soonest are deleted along with expired ones
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._disk = _DiskTier(disk_path, disk_max_entries) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value, promoting disk hits into memory.
+
+        Args:
+            key: Cache key from ``make_cache_key``
+
+        Returns:
+            Cached value, or None on miss/expiry
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(result="hit")
+                return value
+            del self._entries[key]
+
+        if self._disk is not None:
+            stored = await asyncio.to_thread(self._disk.get, key)
+            if stored is not None:
+                expires_at, value = stored
+                self._remember(key, value, expires_at)
+                self.hits += 1
+                self.disk_hits += 1
+                CACHE_LOOKUPS.inc(result="disk_hit")
+                return value
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        Store a value in memory and, if configured, on disk.
+
+        Args:
+            key: Cache key from ``make_cache_key``
+            value: JSON-serializable value
+        """
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, value, expires_at)
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "persistent": self._disk is not None,
+        }
+
+    def close(self) -> None:
+        """Close the persistent tier, if any."""
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
@@ -1,94 +1,185 @@
 """
 Claude API wrapper for PixelBoxx AI features.
+
+``httpx`` and the Anthropic SDK are imported when a client is first created,
+not at import time; the service registry preloads them off the event loop.
 """
 
-import os
+import asyncio
 import json
 import base64
-from typing import Dict, Optional
-from anthropic import Anthropic
+import hashlib
+import logging
+import re
+import secrets
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional
+from contextlib import asynccontextmanager, nullcontext
+from config import Settings
+from services.cache import ResultCache, make_cache_key, normalize_description
+from services.css_parser import Stylesheet, parse_stylesheet, sanitize_css
+from services.css_rules import merge_rules, relevant_rules
+from services.image_processing import ImageProcessingError, PreparedImage, prepare_image
+from services.palette import extract_palette_async
+from services.metrics import (
+    CSS_REMOVED,
+    FALLBACKS,
+    MODERATION_ISOLATED,
+    NEAR_DUPLICATE_REUSED,
+    UPSTREAM_DURATION,
+    UPSTREAM_TOKENS,
+)
+from services.near_duplicates import NearDuplicateIndex, Signature
+from services.phash import image_signature_async
+from services.tracing import span, stage
+from services.limiter import OVERLOAD_STATUS_CODES, AdaptiveLimiter, UpstreamOverloaded
+from services.retry import RetryingCaller, RetryPolicy
+from services.singleflight import SingleFlight
+from services.streaming import CSSStreamParser, StreamEvent, extract_css
+from services.themes import description_palette, render_theme
 from models.design import DesignAnalysis, DesignPreferences
+from models.moderation import ModerationResult
+from prompts.moderation_prompts import (
+    MODERATION_SYSTEM_PROMPT,
+    TEXT_MODERATION_PROMPT,
+    IMAGE_MODERATION_PROMPT,
+)
 from prompts.design_prompts import (
     DESIGN_SYSTEM_PROMPT,
+    CSS_OUTPUT_PROMPT,
     IMAGE_ANALYSIS_PROMPT,
     CSS_GENERATION_PROMPT,
+    DESCRIPTION_PROMPT,
+    CURRENT_CSS_SECTION,
+    REFINEMENT_PROMPT,
 )
+from prompts.render import compact_css, render_analysis, render_preferences
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def create_http_client(settings: Settings) -> "httpx.AsyncClient":
+    """
+    Create the pooled HTTP client shared by all Claude calls in this process.
+
+    Connection limits and timeouts come from settings so a single worker can
+    keep many upstream calls in flight over warm connections.
+
+    Args:
+        settings: Service configuration
+
+    Returns:
+        httpx.AsyncClient configured for the Anthropic API
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.anthropic_max_connections,
+            max_keepalive_connections=settings.anthropic_max_keepalive,
+        ),
+        timeout=httpx.Timeout(settings.anthropic_timeout, connect=5.0),
+    )
+
+
+logger = logging.getLogger(__name__)
+
+# Shortest prompt prefix each model caches, in tokens; the API ignores
+# breakpoints on shorter prefixes. Matched by substring, first hit wins.
+PROMPT_CACHE_MIN_TOKENS = (("haiku-4-5", 4096), ("opus-4-5", 4096), ("haiku", 2048))
+DEFAULT_PROMPT_CACHE_MIN_TOKENS = 1024
+# Prompt text rarely averages more than 4 characters per token, so
+# len // CHARS_PER_TOKEN underestimates: a breakpoint is only set where the
+# prefix really is long enough
+CHARS_PER_TOKEN = 4
+
+# Colors in an analysis palette
+PALETTE_SIZE = 8
+HEX_COLOR = re.compile(r"^#[0-9A-Fa-f]{6}$")
+
+
+def prompt_cache_min_tokens(model: str) -> int:
+    """Minimum cacheable prompt prefix for a model, in tokens."""
+    for family, tokens in PROMPT_CACHE_MIN_TOKENS:
+        if family in model:
+            return tokens
+    return DEFAULT_PROMPT_CACHE_MIN_TOKENS
 
 
 class ClaudeService:
     """Wrapper for Claude API interactions."""
 
-    def __init__(self):
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        self.mock_mode = os.getenv("ENABLE_MOCK_RESPONSES", "true").lower() == "true"
+    def __init__(
+        self,
+        settings: Settings,
+        http_client: Optional["httpx.AsyncClient"] = None,
+        cache: Optional[ResultCache] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+    ):
+        api_key = settings.anthropic_api_key
+        self.mock_mode = settings.enable_mock_responses
 
         if not api_key and not self.mock_mode:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
 
-        self.client = Anthropic(api_key=api_key) if api_key else None
-        self.model = "claude-sonnet-4-5-20250929"
+        self.client = None
+        if api_key:
+            from anthropic import AsyncAnthropic
 
-    async def analyze_inspiration_image(self, image_bytes: bytes) -> DesignAnalysis:
+            # Retries are handled by our own policy, not the SDK's
+            self.client = AsyncAnthropic(
+                api_key=api_key,
+                base_url=settings.anthropic_base_url or None,
+                http_client=http_client,
+                max_retries=0,
+            )
+        self.model = settings.anthropic_model
+        self.moderation_model = settings.moderation_model
+        self.prompt_caching = settings.anthropic_prompt_caching
+        self.prompt_max_css_chars = settings.prompt_max_css_chars
+        self.token_totals: Dict[str, int] = {}
+        self.image_max_edge = settings.image_max_edge
+        self.image_quality = settings.image_quality
+        self.palette_sample_edge = settings.palette_sample_edge
+        self.cache = cache
+        self.near_duplicates = near_duplicates
+        self.limiter = limiter
+        self.inflight = SingleFlight() if settings.request_coalescing else None
+        self.retrying = RetryingCaller(retry_policy or RetryPolicy())
+
+    async def analyze_inspiration_image(
+        self,
+        image_bytes: bytes,
+        image_digest: Optional[str] = None,
+    ) -> DesignAnalysis:
         """
         Analyze an inspiration image and extract design elements.
 
         Args:
             image_bytes: Raw image data
+            image_digest: Optional precomputed SHA-256 hex digest of image_bytes
 
         Returns:
             DesignAnalysis with extracted design elements
+
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
         """
         if self.mock_mode or not self.client:
-            return self._mock_image_analysis()
+            return await self._fallback_image_analysis(image_bytes)
 
         try:
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-
-            # Determine image type (default to jpeg)
-            image_type = "image/jpeg"
-            if image_bytes.startswith(b'\x89PNG'):
-                image_type = "image/png"
-            elif image_bytes.startswith(b'GIF'):
-                image_type = "image/gif"
-            elif image_bytes.startswith(b'\xff\xd8'):
-                image_type = "image/jpeg"
-
-            # Call Claude with vision
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": image_type,
-                                    "data": image_base64,
-                                },
-                            },
-                            {
-                                "type": "text",
-                                "text": IMAGE_ANALYSIS_PROMPT,
-                            },
-                        ],
-                    }
-                ],
-            )
-
-            # Parse JSON response
-            analysis_text = response.content[0].text
-            analysis_data = json.loads(analysis_text)
-
-            return DesignAnalysis(**analysis_data)
-
+            return await self._cached_analyze_image(image_bytes, image_digest)
+        except (UpstreamOverloaded, ImageProcessingError):
+            raise  # a bad upload is the client's error, not an upstream failure
         except Exception as e:
-            print(f"Error analyzing image: {e}")
-            # Fallback to mock response on error
-            return self._mock_image_analysis()
+            logger.warning("Image analysis failed, using mock fallback", extra={"error": repr(e)})
+            FALLBACKS.inc(call="vision")
+            # Fallback to mock response (with the image's real palette) on error
+            return await self._fallback_image_analysis(image_bytes)
 
     async def generate_css_from_analysis(
         self,
@@ -111,38 +202,63 @@ class ClaudeService:
             return self._mock_css_generation(analysis, preferences)
 
         try:
-            # Build the prompt
-            prompt = CSS_GENERATION_PROMPT.format(
-                analysis=analysis.model_dump_json(indent=2),
-                preferences=preferences.model_dump_json(indent=2),
-            )
+            return await self._cached_generate_css(analysis, preferences, current_css)
+        except UpstreamOverloaded:
+            raise
+        except Exception as e:
+            logger.warning("CSS generation failed, using mock fallback", extra={"error": repr(e)})
+            FALLBACKS.inc(call="css")
+            return self._mock_css_generation(analysis, preferences)
 
-            if current_css:
-                prompt += f"\n\nCurrent CSS to build upon:\n{current_css}"
-
-            # Call Claude for CSS generation
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=DESIGN_SYSTEM_PROMPT,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-            )
+    async def design_from_image(
+        self,
+        image_bytes: bytes,
+        preferences: DesignPreferences,
+        image_digest: Optional[str] = None,
+    ) -> tuple[DesignAnalysis, str]:
+        """
+        Analyze an inspiration image and generate CSS for it, using the cache.
 
-            css = response.content[0].text
+        The cache is two-level: the analysis is keyed by image content alone,
+        since it does not depend on preferences, and the CSS is keyed by the
+        analysis plus preferences. Changing preferences for the same image
+        therefore skips the vision call. Mock fallbacks are never cached.
 
-            # Clean up the CSS (remove markdown code blocks if present)
-            css = self._clean_css(css)
+        Args:
+            image_bytes: Raw image data
+            preferences: User design preferences
+            image_digest: Optional precomputed SHA-256 hex digest of image_bytes
 
-            return css
+        Returns:
+            Tuple of (design analysis, generated CSS)
+
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
+        """
+        if self.mock_mode or not self.client:
+            analysis = await self._fallback_image_analysis(image_bytes)
+            return analysis, self._mock_css_generation(analysis, preferences)
+
+        try:
+            analysis = await self._cached_analyze_image(image_bytes, image_digest)
+        except (UpstreamOverloaded, ImageProcessingError):
+            raise  # a bad upload is the client's error, not an upstream failure
+        except Exception as e:
+            logger.warning("Image analysis failed, using mock fallback", extra={"error": repr(e)})
+            FALLBACKS.inc(call="vision")
+            analysis = await self._fallback_image_analysis(image_bytes)
+            return analysis, self._mock_css_generation(analysis, preferences)
 
+        try:
+            css = await self._cached_generate_css(analysis, preferences)
+        except UpstreamOverloaded:
+            raise
         except Exception as e:
-            print(f"Error generating CSS: {e}")
-            return self._mock_css_generation(analysis, preferences)
+            logger.warning("CSS generation failed, using mock fallback", extra={"error": repr(e)})
+            FALLBACKS.inc(call="css")
+            return analysis, self._mock_css_generation(analysis, preferences)
+
+        return analysis, css
 
     async def generate_css_from_description(
         self,
@@ -164,62 +280,827 @@ class ClaudeService:
         if self.mock_mode or not self.client:
             return self._mock_css_from_description(description, preferences)
 
+        key = self._description_key(description, preferences, current_css)
+
+        async def load() -> tuple[str, str]:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                return cached["css"], cached["explanation"]
+            css, explanation = await self._generate_css_from_description(
+                description, preferences, current_css
+            )
+            await self._cache_set(key, {"css": css, "explanation": explanation})
+            return css, explanation
+
+        try:
+            return await self._coalesce("description", key, load)
+        except UpstreamOverloaded:
+            raise
+        except Exception as e:
+            logger.warning(
+                "CSS generation from description failed, using mock fallback",
+                extra={"error": repr(e)},
+            )
+            FALLBACKS.inc(call="description")
+            return self._mock_css_from_description(description, preferences)
+
+    async def refine_css(
+        self,
+        current_css: str,
+        feedback: str,
+    ) -> tuple[str, str, List[str]]:
+        """
+        Apply a small edit to existing CSS by asking for a patch of changed rules.
+
+        Only the rules relevant to the feedback are sent; the returned rules are
+        merged back into the full stylesheet.
+
+        Args:
+            current_css: Stylesheet to refine
+            feedback: What the user wants changed
+
+        Returns:
+            Tuple of (refined CSS, explanation, keys of changed rules)
+        """
+        with stage("css_parse"):
+            rules = parse_stylesheet(current_css).rules
+            context = Stylesheet(relevant_rules(rules, feedback)).serialize()
+
+        if self.mock_mode or not self.client:
+            return self._mock_refinement(current_css)
+
+        key = make_cache_key(
+            "refine",
+            self.model,
+            compact_css(context, self.prompt_max_css_chars),
+            normalize_description(feedback),
+        )
+
+        async def load() -> tuple[str, str]:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                return cached["patch"], cached["explanation"]
+            patch, explanation = await self._refine_css(context, feedback)
+            await self._cache_set(key, {"patch": patch, "explanation": explanation})
+            return patch, explanation
+
         try:
-            prompt = f"""Generate CSS for a PixelBoxx profile based on this description:
+            patch, explanation = await self._coalesce("refine", key, load)
+        except UpstreamOverloaded:
+            raise
+        except Exception as e:
+            logger.warning("CSS refinement failed, returning CSS unchanged", extra={"error": repr(e)})
+            FALLBACKS.inc(call="refine")
+            return self._mock_refinement(current_css)
 
-"{description}"
+        with stage("css_merge"):
+            merged, changed = merge_rules(rules, parse_stylesheet(patch).rules)
+            refined = Stylesheet(merged).serialize()
+        return self._sanitize_css(refined), explanation, changed
 
-User Preferences:
-{preferences.model_dump_json(indent=2)}
+    async def stream_css_from_analysis(
+        self,
+        analysis: DesignAnalysis,
+        preferences: DesignPreferences,
+        current_css: Optional[str] = None,
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Stream CSS generated from a design analysis.
 
-{f'Current CSS to build upon:{current_css}' if current_css else ''}
+        Args:
+            analysis: Design analysis from image or description
+            preferences: User design preferences
+            current_css: Optional existing CSS to build upon
 
-First, briefly explain your design choices in 2-3 sentences.
-Then output the CSS code.
+        Yields:
+            ``css`` delta events followed by a final ``done`` event
+        """
+        if self.mock_mode or not self.client:
+            css = self._mock_css_generation(analysis, preferences)
+            yield StreamEvent("css", {"delta": css})
+            yield StreamEvent("done", {"css": css, "explanation": None})
+            return
+
+        key = self._analysis_css_key(analysis, preferences, current_css)
+        cached = await self._cache_get(key) or await self._join_in_flight("css", key)
+        if cached is not None:
+            yield StreamEvent("css", {"delta": cached})
+            yield StreamEvent("done", {"css": cached, "explanation": None})
+            return
+
+        async for event in self._stream_design(
+            "css",
+            self._css_request(analysis, preferences, current_css),
+            expect_explanation=False,
+            fallback=lambda: (self._mock_css_generation(analysis, preferences), None),
+        ):
+            if event.type == "done" and not event.data.get("fallback"):
+                await self._cache_set(key, event.data["css"])
+            yield event
+
+    async def stream_css_from_description(
+        self,
+        description: str,
+        preferences: DesignPreferences,
+        current_css: Optional[str] = None,
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Stream CSS and an explanation generated from a text description.
 
-Format:
-EXPLANATION: [your explanation]
-CSS:
-[css code]
-"""
+        Args:
+            description: Natural language description of desired design
+            preferences: User design preferences
+            current_css: Optional existing CSS to build upon
+
+        Yields:
+            ``explanation`` and ``css`` delta events followed by ``done``
+        """
+        if self.mock_mode or not self.client:
+            css, explanation = self._mock_css_from_description(description, preferences)
+            yield StreamEvent("explanation", {"delta": explanation})
+            yield StreamEvent("css", {"delta": css})
+            yield StreamEvent("done", {"css": css, "explanation": explanation})
+            return
+
+        key = self._description_key(description, preferences, current_css)
+        cached = await self._cache_get(key)
+        if cached is None:
+            joined = await self._join_in_flight("description", key)
+            if joined is not None:
+                cached = {"css": joined[0], "explanation": joined[1]}
+        if cached is not None:
+            yield StreamEvent("explanation", {"delta": cached["explanation"]})
+            yield StreamEvent("css", {"delta": cached["css"]})
+            yield StreamEvent("done", cached)
+            return
+
+        def fallback() -> tuple[str, str]:
+            return self._mock_css_from_description(description, preferences)
+
+        async for event in self._stream_design(
+            "description",
+            self._description_request(description, preferences, current_css),
+            expect_explanation=True,
+            fallback=fallback,
+        ):
+            if event.type == "done" and not event.data.get("fallback"):
+                await self._cache_set(
+                    key,
+                    {"css": event.data["css"], "explanation": event.data["explanation"]},
+                )
+            yield event
+
+    async def _cached_analyze_image(
+        self,
+        image_bytes: bytes,
+        image_digest: Optional[str] = None,
+    ) -> DesignAnalysis:
+        """
+        Image analysis through the cache, keyed by image content and model.
 
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=DESIGN_SYSTEM_PROMPT,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
+        On a miss, an analysis cached for a near-identical image (same
+        picture re-saved, resized or recompressed) is reused before falling
+        back to the vision call.
+        """
+        if image_digest is None:
+            image_digest = hashlib.sha256(image_bytes).hexdigest()
+        key = make_cache_key("image-analysis", self.model, image_digest)
+
+        async def load() -> DesignAnalysis:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                return DesignAnalysis(**cached)
+
+            signature = await self._image_signature(image_bytes)
+            if signature is not None:
+                reused = await self._near_duplicate_analysis(signature)
+                if reused is not None:
+                    await self._cache_set(key, reused.model_dump())
+                    return reused
+
+            # Downscale and re-encode off the event loop before the vision call
+            with stage("image_preprocess"):
+                prepared = await prepare_image(
+                    image_bytes, self.image_max_edge, self.image_quality
+                )
+            analysis = await self._analyze_image(prepared)
+            analysis = await self._complete_palette(analysis, prepared.data)
+            await self._cache_set(key, analysis.model_dump())
+            if signature is not None:
+                await self.near_duplicates.add(signature, image_digest)
+            return analysis
+
+        return await self._coalesce("vision", key, load)
+
+    async def _image_signature(self, image_bytes: bytes) -> Optional[Signature]:
+        """Perceptual signature for the near-duplicate index, or None if unused or undecodable."""
+        if self.near_duplicates is None:
+            return None
+        with stage("image_signature"):
+            try:
+                return await image_signature_async(image_bytes)
+            except ImageProcessingError:
+                return None
+
+    async def _near_duplicate_analysis(self, signature: Signature) -> Optional[DesignAnalysis]:
+        """Cached analysis of a near-identical image analyzed before, or None."""
+        with stage("near_duplicate_lookup"):
+            digests = self.near_duplicates.candidates(signature)
+        for digest in digests:
+            cached = await self._cache_get(make_cache_key("image-analysis", self.model, digest))
+            if cached is not None:
+                NEAR_DUPLICATE_REUSED.inc()
+                return DesignAnalysis(**cached)
+        # Every match has expired or been evicted; analyze this image instead
+        return None
+
+    async def _local_palette(self, image_bytes: bytes) -> List[str]:
+        """Dominant colors computed locally, or [] if the image cannot be decoded."""
+        with stage("palette_extract"):
+            try:
+                swatches = await extract_palette_async(
+                    image_bytes, PALETTE_SIZE, self.palette_sample_edge
+                )
+            except ImageProcessingError:
+                return []
+        return [swatch.color for swatch in swatches]
+
+    async def _complete_palette(self, analysis: DesignAnalysis, image_bytes: bytes) -> DesignAnalysis:
+        """Top up a model palette that has fewer than three usable hex colors."""
+        colors = [c.upper() for c in analysis.colors if HEX_COLOR.match(c)]
+        if len(colors) >= 3:
+            return analysis
+        for color in await self._local_palette(image_bytes):
+            if color not in colors and len(colors) < PALETTE_SIZE:
+                colors.append(color)
+        return analysis.model_copy(update={"colors": colors})
+
+    async def _fallback_image_analysis(self, image_bytes: bytes) -> DesignAnalysis:
+        """
+        Mock analysis carrying the image's locally extracted palette.
+
+        Raises:
+            ImageProcessingError: If the image cannot be decoded, so mock mode
+                rejects the same uploads the vision path does
+        """
+        analysis = self._mock_image_analysis()
+        with stage("palette_extract"):
+            swatches = await extract_palette_async(
+                image_bytes, PALETTE_SIZE, self.palette_sample_edge
             )
+        colors = [swatch.color for swatch in swatches]
+        return analysis.model_copy(update={"colors": colors}) if colors else analysis
+
+    async def _cached_generate_css(
+        self,
+        analysis: DesignAnalysis,
+        preferences: DesignPreferences,
+        current_css: Optional[str] = None,
+    ) -> str:
+        """CSS generation through the cache, keyed by analysis, preferences and model."""
+        key = self._analysis_css_key(analysis, preferences, current_css)
+
+        async def load() -> str:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                return cached
+            css = await self._generate_css(analysis, preferences, current_css)
+            await self._cache_set(key, css)
+            return css
+
+        return await self._coalesce("css", key, load)
+
+    def _analysis_css_key(
+        self,
+        analysis: DesignAnalysis,
+        preferences: DesignPreferences,
+        current_css: Optional[str],
+    ) -> str:
+        return make_cache_key(
+            "analysis-css",
+            self.model,
+            render_analysis(analysis),
+            render_preferences(preferences),
+            compact_css(current_css, self.prompt_max_css_chars),
+        )
+
+    def _description_key(
+        self,
+        description: str,
+        preferences: DesignPreferences,
+        current_css: Optional[str],
+    ) -> str:
+        return make_cache_key(
+            "description-design",
+            self.model,
+            normalize_description(description),
+            render_preferences(preferences),
+            compact_css(current_css, self.prompt_max_css_chars),
+        )
+
+    async def _coalesce(self, call: str, key: str, load: Callable[[], Any]) -> Any:
+        """
+        Run a cache-or-upstream ``load`` once for identical concurrent requests.
+
+        Keyed by the result cache key, so requests that would share a cache
+        entry also share the call that fills it. Followers get the leader's
+        result or exception, and each applies its own fallback.
+        """
+        if self.inflight is None:
+            return await load()
+        return await self.inflight.do(key, load, call=call)
+
+    async def _join_in_flight(self, call: str, key: str) -> Optional[Any]:
+        """Result of an identical non-streaming call in flight, or None."""
+        pending = self.inflight.join(key, call) if self.inflight else None
+        if pending is None:
+            return None
+        with stage("coalesced_wait"):
+            try:
+                return await pending
+            except UpstreamOverloaded:
+                raise
+            except Exception:
+                return None  # the shared call failed; stream our own attempt
+
+    async def _cache_get(self, key: str) -> Optional[Any]:
+        if self.cache is None:
+            return None
+        return await self.cache.get(key)
+
+    async def _cache_set(self, key: str, value: Any) -> None:
+        if self.cache is not None:
+            await self.cache.set(key, value)
+
+    # Upstream calls - these raise on failure; callers decide on fallbacks
+
+    async def _analyze_image(self, image: PreparedImage) -> DesignAnalysis:
+        """Call Claude vision and parse the analysis JSON."""
+        # Encode image to base64
+        image_base64 = base64.b64encode(image.data).decode("utf-8")
+
+        # Call Claude with vision
+        response = await self._create_message(
+            "vision", self._image_request(image.media_type, image_base64)
+        )
+
+        # Parse JSON response
+        with stage("response_parse"):
+            analysis_text = response.content[0].text
+            analysis_data = json.loads(analysis_text)
+            return DesignAnalysis(**analysis_data)
+
+    async def _generate_css(
+        self,
+        analysis: DesignAnalysis,
+        preferences: DesignPreferences,
+        current_css: Optional[str] = None,
+    ) -> str:
+        """Call Claude to turn an analysis into CSS."""
+        response = await self._create_message(
+            "css", self._css_request(analysis, preferences, current_css)
+        )
+
+        css = response.content[0].text
+
+        # Clean up the CSS (remove markdown code blocks if present)
+        with stage("response_parse"):
+            return self._clean_css(css)
+
+    async def _refine_css(self, context: str, feedback: str) -> tuple[str, str]:
+        """Call Claude for a patch of changed rules and an explanation."""
+        response = await self._create_message("refine", self._refinement_request(context, feedback))
+
+        with stage("response_parse"):
+            explanation, patch = self._parse_explanation_and_css(response.content[0].text)
+        return patch, explanation
+
+    async def _generate_css_from_description(
+        self,
+        description: str,
+        preferences: DesignPreferences,
+        current_css: Optional[str] = None,
+    ) -> tuple[str, str]:
+        """Call Claude to generate CSS and an explanation from a description."""
+        response = await self._create_message(
+            "description", self._description_request(description, preferences, current_css)
+        )
 
-            content = response.content[0].text
+        content = response.content[0].text
 
-            # Parse explanation and CSS
+        # Parse explanation and CSS
+        with stage("response_parse"):
             explanation, css = self._parse_explanation_and_css(content)
 
-            return css, explanation
+        return css, explanation
 
-        except Exception as e:
-            print(f"Error generating CSS from description: {e}")
-            return self._mock_css_from_description(description, preferences)
+    async def moderate_texts(
+        self, items: List[tuple[Optional[str], str]]
+    ) -> List[Optional[ModerationResult]]:
+        """
+        Moderate many texts in one call to the moderation model.
 
-    def _clean_css(self, css: str) -> str:
-        """Remove markdown code blocks and clean CSS."""
-        # Remove markdown code blocks
-        if "```css" in css:
-            css = css.split("```css")[1].split("```")[0]
-        elif "```" in css:
-            css = css.split("```")[1].split("```")[0]
+        Each item gets a random id for the call. If the answer does not hold
+        exactly one verdict per id, one item may have steered the others, so
+        every item is moderated again in a call of its own.
+
+        Args:
+            items: (context, text) pairs
+
+        Returns:
+            One verdict per item, in order; None where no usable verdict came back
+        """
+        ids = [secrets.token_hex(4) for _ in items]
+        response = await self._create_message(
+            "moderation_text", self._text_moderation_request(list(zip(ids, items)))
+        )
+
+        with stage("response_parse"):
+            try:
+                by_id = self._verdicts_by_id(self._parse_json(response.content[0].text, "[", "]"), ids)
+            except ValueError:
+                by_id = None
+        if by_id is not None:
+            return [self._parse_verdict(by_id[item_id]) for item_id in ids]
+        if len(items) == 1:
+            return [None]
+
+        logger.warning("Inconsistent moderation batch, moderating items alone", extra={"items": len(items)})
+        MODERATION_ISOLATED.inc(len(items), reason="inconsistent_batch")
+        singles = await asyncio.gather(
+            *(self.moderate_texts([item]) for item in items), return_exceptions=True
+        )
+        return [None if isinstance(single, Exception) else single[0] for single in singles]
+
+    @staticmethod
+    def _verdicts_by_id(verdicts: Any, ids: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Map verdicts to item ids; None unless there is exactly one per id and nothing else."""
+        if not isinstance(verdicts, list) or len(verdicts) != len(ids):
+            return None
+        by_id = {
+            str(verdict.get("id")): verdict for verdict in verdicts if isinstance(verdict, dict)
+        }
+        return by_id if set(by_id) == set(ids) else None
+
+    async def moderate_image(self, image_bytes: bytes) -> ModerationResult:
+        """Moderate one image with the moderation model."""
+        with stage("image_preprocess"):
+            prepared = await prepare_image(image_bytes, self.image_max_edge, self.image_quality)
+        image_base64 = base64.b64encode(prepared.data).decode("utf-8")
+
+        response = await self._create_message(
+            "moderation_image", self._image_moderation_request(prepared.media_type, image_base64)
+        )
 
-        return css.strip()
+        with stage("response_parse"):
+            return self._parse_verdict(self._parse_json(response.content[0].text, "{", "}"))
+
+    async def _create_message(self, call: str, request: Dict[str, Any]) -> Any:
+        """Send a Messages API call under the retry policy."""
+        return await self.retrying.call(lambda: self._attempt_message(call, request), label=call)
+
+    async def _attempt_message(self, call: str, request: Dict[str, Any]) -> Any:
+        """One Messages API attempt through the admission limiter."""
+        async with self._upstream_slot(call):
+            response = await self.client.messages.create(**request)
+        self._record_usage(call, response.usage)
+        return response
+
+    def _record_usage(self, call: str, usage: Any) -> None:
+        """Add a response's token usage to the metrics."""
+        for token_type in (
+            "input_tokens",
+            "output_tokens",
+            "cache_read_input_tokens",
+            "cache_creation_input_tokens",
+        ):
+            count = getattr(usage, token_type, None)
+            if count:
+                UPSTREAM_TOKENS.inc(count, call=call, type=token_type)
+                self.token_totals[token_type] = self.token_totals.get(token_type, 0) + count
+
+    def prompt_cache_stats(self) -> Dict[str, Any]:
+        """Prompt-cache token totals and the share of input served from cache."""
+        read = self.token_totals.get("cache_read_input_tokens", 0)
+        written = self.token_totals.get("cache_creation_input_tokens", 0)
+        uncached = self.token_totals.get("input_tokens", 0)
+        total_input = read + written + uncached
+        return {
+            "enabled": self.prompt_caching,
+            "cache_read_tokens": read,
+            "cache_write_tokens": written,
+            "uncached_input_tokens": uncached,
+            "read_ratio": round(read / total_input, 4) if total_input else 0.0,
+        }
+
+    @asynccontextmanager
+    async def _upstream_slot(self, call: str) -> AsyncIterator[None]:
+        """
+        Hold a limiter slot for one upstream attempt, timing it and feeding
+        its outcome back into the limiter's AIMD control.
+        """
+        from anthropic import APIStatusError
+
+        limiter = self.limiter
+        async with limiter.slot() if limiter else nullcontext():
+            with span(f"upstream_{call}"):
+                started = time.perf_counter()
+                try:
+                    yield
+                except APIStatusError as e:
+                    UPSTREAM_DURATION.observe(
+                        time.perf_counter() - started, call=call, outcome=str(e.status_code)
+                    )
+                    if limiter and e.status_code in OVERLOAD_STATUS_CODES:
+                        limiter.on_overload()
+                    raise
+                except BaseException:
+                    UPSTREAM_DURATION.observe(
+                        time.perf_counter() - started, call=call, outcome="error"
+                    )
+                    raise
+                UPSTREAM_DURATION.observe(time.perf_counter() - started, call=call, outcome="ok")
+                if limiter:
+                    limiter.on_success()
+
+    async def _stream_design(
+        self,
+        call: str,
+        request: Dict[str, Any],
+        expect_explanation: bool,
+        fallback: Callable[[], tuple[str, Optional[str]]],
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Stream a CSS response, parsing explanation and CSS as text arrives.
+
+        The closing ``done`` event carries the CSS and explanation produced by
+        the batch parsers over the full text. Transient failures before any
+        output are retried under the retry policy; if retries are exhausted,
+        the mock fallback is streamed instead (flagged with ``fallback: True``).
+        Failures mid-stream end with an ``error`` event.
+        """
+        parser = CSSStreamParser(expect_explanation=expect_explanation)
+        chunks: List[str] = []
+        emitted = False
+        deadline_at = time.monotonic() + self.retrying.policy.deadline
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                async with self._upstream_slot(call):
+                    async with self.client.messages.stream(**request) as stream:
+                        async for text in stream.text_stream:
+                            chunks.append(text)
+                            for event in parser.feed(text):
+                                emitted = True
+                                yield event
+                        final_message = await stream.get_final_message()
+                self._record_usage(call, final_message.usage)
+                break
+            except UpstreamOverloaded as e:
+                yield StreamEvent("error", {"detail": str(e), "retry_after": e.retry_after})
+                return
+            except Exception as e:
+                # Retry only while nothing has reached the client yet
+                delay = None if emitted else self.retrying.next_delay(e, attempt, deadline_at)
+                if delay is not None:
+                    chunks.clear()
+                    parser = CSSStreamParser(expect_explanation=expect_explanation)
+                    await asyncio.sleep(delay)
+                    continue
+                logger.warning("CSS stream failed", extra={"error": repr(e), "call": call})
+                if emitted:
+                    yield StreamEvent("error", {"detail": "Upstream stream interrupted"})
+                    return
+                FALLBACKS.inc(call=call)
+                css, explanation = fallback()
+                if explanation:
+                    yield StreamEvent("explanation", {"delta": explanation})
+                yield StreamEvent("css", {"delta": css})
+                yield StreamEvent(
+                    "done", {"css": css, "explanation": explanation, "fallback": True}
+                )
+                return
+
+        for event in parser.finish():
+            yield event
+
+        content = "".join(chunks)
+        with stage("response_parse"):
+            if expect_explanation:
+                explanation, css = self._parse_explanation_and_css(content)
+            else:
+                explanation, css = None, self._clean_css(content)
+        yield StreamEvent("done", {"css": css, "explanation": explanation})
+
+    # Request builders - shared by the blocking and streaming paths
+    #
+    # Static prompt text goes first and carries a prompt-cache breakpoint, so
+    # the provider can reuse it across calls; per-request data (the image,
+    # analysis, preferences, description) always comes after it. All design
+    # calls share DESIGN_SYSTEM_PROMPT as their prefix, so one cache entry
+    # serves vision, CSS, description and refinement calls alike.
+
+    def _system(self, model: str, prefix: str, *instructions: str) -> List[Dict[str, Any]]:
+        """
+        System blocks: a prefix identical on every call, then call-specific text.
+
+        The prefix gets a prompt-cache breakpoint only if it reaches the
+        model's minimum cacheable length.
+        """
+        block: Dict[str, Any] = {"type": "text", "text": prefix}
+        if self.prompt_caching and len(prefix) // CHARS_PER_TOKEN >= prompt_cache_min_tokens(model):
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block, *({"type": "text", "text": text} for text in instructions)]
+
+    def _image_request(self, media_type: str, image_base64: str) -> Dict[str, Any]:
+        """Messages API parameters for the vision analysis call."""
+        return {
+            "model": self.model,
+            "max_tokens": 1024,
+            "system": self._system(self.model, DESIGN_SYSTEM_PROMPT, IMAGE_ANALYSIS_PROMPT),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": media_type,
+                                "data": image_base64,
+                            },
+                        },
+                    ],
+                }
+            ],
+        }
+
+    def _css_request(
+        self,
+        analysis: DesignAnalysis,
+        preferences: DesignPreferences,
+        current_css: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Messages API parameters for CSS generation from an analysis."""
+        prompt = CSS_GENERATION_PROMPT.format(
+            analysis=render_analysis(analysis),
+            preferences=render_preferences(preferences),
+        )
+
+        current_css = compact_css(current_css, self.prompt_max_css_chars)
+        if current_css:
+            prompt += CURRENT_CSS_SECTION.format(current_css=current_css)
+
+        return {
+            "model": self.model,
+            "max_tokens": 4096,
+            "system": self._system(self.model, DESIGN_SYSTEM_PROMPT, CSS_OUTPUT_PROMPT),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+        }
+
+    def _description_request(
+        self,
+        description: str,
+        preferences: DesignPreferences,
+        current_css: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Messages API parameters for CSS generation from a description."""
+        current_css = compact_css(current_css, self.prompt_max_css_chars)
+        prompt = DESCRIPTION_PROMPT.format(
+            description=description.strip(),
+            preferences=render_preferences(preferences),
+            current_css=CURRENT_CSS_SECTION.format(current_css=current_css) if current_css else "",
+        )
+
+        return {
+            "model": self.model,
+            "max_tokens": 4096,
+            "system": self._system(self.model, DESIGN_SYSTEM_PROMPT, CSS_OUTPUT_PROMPT),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+        }
+
+    def _refinement_request(self, context: str, feedback: str) -> Dict[str, Any]:
+        """Messages API parameters for a rule-level CSS refinement."""
+        prompt = REFINEMENT_PROMPT.format(
+            current_css=compact_css(context, self.prompt_max_css_chars) or "(empty)",
+            feedback=feedback.strip(),
+        )
+
+        return {
+            "model": self.model,
+            "max_tokens": 2048,
+            "system": self._system(self.model, DESIGN_SYSTEM_PROMPT, CSS_OUTPUT_PROMPT),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+        }
+
+    def _text_moderation_request(
+        self, items: List[tuple[str, tuple[Optional[str], str]]]
+    ) -> Dict[str, Any]:
+        """Messages API parameters for a batch of (id, (context, text)) items."""
+        lines = "\n".join(
+            json.dumps({"id": item_id, "context": context or "unknown", "text": text}, ensure_ascii=False)
+            for item_id, (context, text) in items
+        )
+
+        return {
+            "model": self.moderation_model,
+            "max_tokens": 256 + 64 * len(items),
+            "system": self._system(self.moderation_model, MODERATION_SYSTEM_PROMPT),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": TEXT_MODERATION_PROMPT.format(items=lines),
+                }
+            ],
+        }
+
+    def _image_moderation_request(self, media_type: str, image_base64: str) -> Dict[str, Any]:
+        """Messages API parameters for image moderation."""
+        return {
+            "model": self.moderation_model,
+            "max_tokens": 256,
+            "system": self._system(self.moderation_model, MODERATION_SYSTEM_PROMPT),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": media_type,
+                                "data": image_base64,
+                            },
+                        },
+                        {"type": "text", "text": IMAGE_MODERATION_PROMPT},
+                    ],
+                }
+            ],
+        }
+
+    def _parse_json(self, content: str, opener: str, closer: str) -> Any:
+        """Parse the outermost JSON array or object in a response, ignoring code fences."""
+        start, end = content.find(opener), content.rfind(closer)
+        if start < 0 or end < start:
+            raise ValueError("No JSON found in model response")
+        return json.loads(content[start:end + 1])
+
+    def _parse_verdict(self, data: Dict[str, Any]) -> ModerationResult:
+        """Turn a model verdict into a ModerationResult; anything malformed becomes review."""
+        action = data.get("action")
+        if action not in ("approve", "reject", "review"):
+            action = "review"
+        flags = data.get("flags")
+        flags = [str(flag).strip().lower() for flag in flags if flag] if isinstance(flags, list) else []
+        try:
+            score = min(1.0, max(0.0, float(data.get("score", 0.5))))
+        except (TypeError, ValueError):
+            score = 0.5
+        reason = data.get("reason")
+        return ModerationResult(
+            safe=action == "approve",
+            score=score,
+            flags=flags,
+            action=action,
+            reason=str(reason)[:500] if reason else None,
+            tier="model",
+        )
+
+    def _clean_css(self, css: str) -> str:
+        """Remove markdown code blocks and sanitize model-generated CSS."""
+        # Same extraction as the streaming parser, so previews match the result
+        return self._sanitize_css(extract_css(css))
+
+    def _sanitize_css(self, css: str) -> str:
+        """Keep only profile-scoped rules and safe declarations."""
+        with stage("css_sanitize"):
+            result = sanitize_css(css)
+        if result.removed:
+            CSS_REMOVED.inc(len(result.removed))
+            logger.info("Removed disallowed CSS", extra={"removed": result.removed[:20]})
+        return result.css
 
     def _parse_explanation_and_css(self, content: str) -> tuple[str, str]:
         """Parse explanation and CSS from combined response."""
         if "EXPLANATION:" in content and "CSS:" in content:
-            parts = content.split("CSS:")
+            parts = content.split("CSS:", 1)
             explanation = parts[0].replace("EXPLANATION:", "").strip()
             css = self._clean_css(parts[1])
         else:
@@ -245,157 +1126,16 @@ CSS:
     def _mock_css_generation(
         self, analysis: DesignAnalysis, preferences: DesignPreferences
     ) -> str:
-        """Mock CSS generation response."""
-        primary = analysis.colors[0] if analysis.colors else "#FF006E"
-        secondary = analysis.colors[1] if len(analysis.colors) > 1 else "#8338EC"
-        accent = analysis.colors[2] if len(analysis.colors) > 2 else "#3A86FF"
-
-        animation_keyframes = ""
-        if preferences.animation_level != "none":
-            animation_keyframes = """
-@keyframes glow-pulse {
-  0%, 100% { filter: drop-shadow(0 0 8px var(--glow-color)); }
-  50% { filter: drop-shadow(0 0 16px var(--glow-color)); }
-}
-
-@keyframes float {
-  0%, 100% { transform: translateY(0px); }
-  50% { transform: translateY(-10px); }
-}
-"""
-
-        return f"""/* PixelBoxx Profile - {analysis.aesthetic} */
-:root {{
-  --primary-color: {primary};
-  --secondary-color: {secondary};
-  --accent-color: {accent};
-  --glow-color: {primary};
-  --bg-dark: #0a0e27;
-  --text-light: #ffffff;
-  --border-width: 4px;
-  --pixel-size: 8px;
-}}
-
-.pixelpage {{
-  background: linear-gradient(135deg, var(--bg-dark) 0%, #1a1f3a 100%);
-  color: var(--text-light);
-  font-family: 'Courier New', monospace;
-  padding: var(--pixel-size);
-  image-rendering: pixelated;
-}}
-
-.profile-header {{
-  background: linear-gradient(90deg, var(--primary-color) 0%, var(--secondary-color) 100%);
-  padding: calc(var(--pixel-size) * 4);
-  position: relative;
-  box-shadow:
-    0 0 0 var(--border-width) var(--accent-color),
-    0 var(--pixel-size) 0 var(--border-width) rgba(0,0,0,0.3);
-  text-align: center;
-  {f'animation: glow-pulse 3s ease-in-out infinite;' if preferences.animation_level == 'high' else ''}
-}}
-
-.profile-avatar {{
-  border: var(--border-width) solid var(--accent-color);
-  box-shadow:
-    0 0 20px var(--glow-color),
-    inset 0 0 20px rgba(0,0,0,0.3);
-  image-rendering: pixelated;
-  border-radius: 0;
-}}
-
-.profile-bio {{
-  background: rgba(0, 0, 0, 0.6);
-  border: var(--border-width) solid var(--primary-color);
-  padding: calc(var(--pixel-size) * 3);
-  margin: calc(var(--pixel-size) * 2) 0;
-  box-shadow:
-    0 0 0 2px var(--accent-color),
-    0 var(--pixel-size) 20px rgba(0,0,0,0.5);
-  line-height: 1.6;
-}}
-
-.top-friends {{
-  display: grid;
-  grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-  gap: var(--pixel-size);
-  margin: calc(var(--pixel-size) * 2) 0;
-}}
-
-.top-friends-item {{
-  background: rgba(0, 0, 0, 0.7);
-  border: 2px solid var(--secondary-color);
-  padding: var(--pixel-size);
-  text-align: center;
-  transition: transform 0.3s ease, box-shadow 0.3s ease;
-}}
-
-.top-friends-item:hover {{
-  transform: translateY(-4px);
-  box-shadow:
-    0 0 20px var(--secondary-color),
-    0 var(--pixel-size) 0 var(--secondary-color);
-}}
-
-.photo-gallery {{
-  display: grid;
-  grid-template-columns: repeat(auto-fill, minmax(200px, 1fr));
-  gap: calc(var(--pixel-size) * 2);
-  margin: calc(var(--pixel-size) * 2) 0;
-}}
-
-.photo-gallery-item {{
-  border: var(--border-width) solid var(--accent-color);
-  box-shadow: 0 0 15px rgba(0,0,0,0.5);
-  transition: transform 0.3s ease;
-  image-rendering: pixelated;
-}}
-
-.photo-gallery-item:hover {{
-  transform: scale(1.05);
-  box-shadow: 0 0 25px var(--glow-color);
-}}
-
-.guestbook {{
-  background: rgba(0, 0, 0, 0.5);
-  border: var(--border-width) solid var(--primary-color);
-  padding: calc(var(--pixel-size) * 2);
-  margin: calc(var(--pixel-size) * 2) 0;
-}}
-
-.guestbook-entry {{
-  background: rgba(255, 255, 255, 0.05);
-  border-left: 4px solid var(--accent-color);
-  padding: var(--pixel-size);
-  margin: var(--pixel-size) 0;
-}}
-
-.music-player {{
-  background: linear-gradient(135deg, var(--primary-color) 0%, var(--secondary-color) 100%);
-  border: var(--border-width) solid var(--accent-color);
-  padding: calc(var(--pixel-size) * 2);
-  text-align: center;
-  box-shadow:
-    0 0 30px var(--glow-color),
-    inset 0 0 20px rgba(0,0,0,0.3);
-}}
-
-{animation_keyframes}
-
-@media (max-width: 768px) {{
-  .pixelpage {{
-    padding: calc(var(--pixel-size) / 2);
-  }}
-
-  .top-friends {{
-    grid-template-columns: repeat(2, 1fr);
-  }}
-
-  .photo-gallery {{
-    grid-template-columns: repeat(2, 1fr);
-  }}
-}}
-"""
+        """Mock CSS generation response, rendered from the precompiled theme."""
+        return render_theme(analysis.colors, preferences, title=analysis.aesthetic)
+
+    def _mock_refinement(self, current_css: str) -> tuple[str, str, List[str]]:
+        """Mock refinement that leaves the stylesheet as it is."""
+        return (
+            current_css,
+            "Mock mode: refinement is not applied without the Claude API, so your CSS is unchanged.",
+            [],
+        )
 
     def _mock_css_from_description(
         self, description: str, preferences: DesignPreferences
@@ -403,8 +1143,6 @@ CSS:
         """Mock CSS generation from description."""
         explanation = f"Created a design inspired by your description: '{description[:100]}...'. The design uses a pixel art aesthetic with neon accents and smooth animations."
 
-        # Use mock analysis with description-inspired tweaks
-        mock_analysis = self._mock_image_analysis()
-        css = self._mock_css_generation(mock_analysis, preferences)
+        css = render_theme(description_palette(description), preferences)
 
         return css, explanation
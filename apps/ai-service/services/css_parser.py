@@ -0,0 +1,566 @@
+"""
+CSS tokenizer, parser and sanitizer for model-generated stylesheets.
+
+One compiled regex scans the text in a single pass into structural tokens
+(``{``, ``}``, ``;``, strings, ``url()`` and runs of plain text); a small
+recursive parser turns those into style rules, at-rules and declarations.
+Declaration values stay as text and are examined with precompiled regexes,
+which keeps the per-token work in Python low enough to run on every response.
+
+The tree is used to pull the palette out of a stylesheet in order of use, to
+keep only selectors scoped to the PixelBoxx profile classes, and to drop
+constructs that could escape the profile sandbox (imports, remote URLs,
+legacy script hooks, fixed overlays).
+"""
+
+import colorsys
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# Classes a stylesheet may scope its selectors to (see DESIGN_SYSTEM_PROMPT)
+ALLOWED_CLASSES = frozenset({
+    "pixelpage",
+    "profile-header",
+    "profile-avatar",
+    "profile-bio",
+    "top-friends",
+    "top-friends-item",
+    "music-player",
+    "photo-gallery",
+    "photo-gallery-item",
+    "guestbook",
+    "guestbook-entry",
+    "widget",
+    "profile-badge",
+})
+
+# Selectors allowed without a profile class; rules on them may only set
+# custom properties, since anything else would style the host page
+ALLOWED_ROOT_SELECTORS = frozenset({":root"})
+
+# At-rules whose block holds rules; these are also the only at-rules kept
+GROUP_AT_RULES = frozenset({"media", "supports", "container", "keyframes", "-webkit-keyframes"})
+
+BLOCKED_PROPERTIES = frozenset({"behavior", "-moz-binding", "-ms-behavior"})
+BLOCKED_VALUES = {"position": frozenset({"fixed"})}
+
+_TOKEN = re.compile(
+    r"""
+      (?P<comment>/\*.*?(?:\*/|\Z))
+    | (?P<string>"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?)
+    | (?P<url>url\(\s*(?:"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|[^)"'\s]*)\s*\))
+    | (?P<punct>[{};])
+    | (?P<text>(?:[^{};"'/u]|/(?!\*)|u(?!rl\())+)
+    """,
+    re.VERBOSE | re.DOTALL | re.IGNORECASE,
+)
+
+_AT_RULE = re.compile(r"@(-?[A-Za-z_][\w-]*)\s*(.*)", re.DOTALL)
+_DECLARATION = re.compile(r"\s*(--[\w-]*|-?[A-Za-z_][\w-]*)\s*:(.*)", re.DOTALL)
+_IMPORTANT = re.compile(r"\s*!\s*important\s*$", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+_COLOR = re.compile(
+    r"""
+      (?P<skip>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\))
+    | (?<![\w-])\#(?P<hex>[0-9A-Fa-f]{3,8})(?![\w-])
+    | (?<![\w-])(?P<space>rgb|hsl)a?\((?P<args>[^()]*)\)
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+_COLOR_ARGS = re.compile(r"[\s,/]+")
+
+_URL = re.compile(r"""url\(\s*(?:"([^"]*)"|'([^']*)'|([^)]*?))\s*\)""", re.IGNORECASE)
+_SAFE_DATA_URL = re.compile(r"data:image/(?:png|gif|jpeg|webp)[;,]", re.IGNORECASE)
+_UNSAFE_VALUE = re.compile(r"expression\s*\(|-moz-binding|image-set\s*\(|javascript:|<", re.IGNORECASE)
+
+# Hex escapes (``\75`` is "u") and literal escapes (``\r`` is "r")
+_ESCAPE = re.compile(r"\\(?:([0-9A-Fa-f]{1,6})[ \t\n\f]?|\r\n|(.))", re.DOTALL)
+_VAR = re.compile(r"var\(", re.IGNORECASE)
+
+_SCOPE_CLASS = re.compile(r"\.(-?[A-Za-z_][\w-]*)")
+# Reach outside the scoping class: functional pseudo-classes (:not(), :has(),
+# :is(), :where(), ...), sibling combinators and escapes
+_UNSCOPED_SELECTOR = re.compile(r":[\w-]+\(|[~+\\]")
+
+
+class Token(NamedTuple):
+    kind: str
+    value: str
+
+
+@dataclass
+class Declaration:
+    """``name: value [!important]``."""
+    name: str
+    value: str
+    important: bool = False
+
+    def serialize(self) -> str:
+        important = " !important" if self.important else ""
+        return f"{self.name}: {self.value}{important};"
+
+
+@dataclass
+class StyleRule:
+    """Selector list with a declaration block."""
+    selectors: List[str]
+    declarations: List[Declaration] = field(default_factory=list)
+
+    def serialize(self, indent: str = "") -> str:
+        body = "".join(f"{indent}  {d.serialize()}\n" for d in self.declarations)
+        return f"{indent}{', '.join(self.selectors)} {{\n{body}{indent}}}"
+
+
+@dataclass
+class AtRule:
+    """``@name prelude;`` or ``@name prelude { ... }``."""
+    name: str
+    prelude: str
+    rules: Optional[List["Node"]] = None
+    declarations: Optional[List[Declaration]] = None
+
+    def serialize(self, indent: str = "") -> str:
+        head = f"{indent}@{self.name} {self.prelude}".rstrip()
+        if self.rules is not None:
+            inner = "\n".join(rule.serialize(indent + "  ") for rule in self.rules)
+            return f"{head} {{\n{inner}\n{indent}}}"
+        if self.declarations is not None:
+            body = "".join(f"{indent}  {d.serialize()}\n" for d in self.declarations)
+            return f"{head} {{\n{body}{indent}}}"
+        return f"{head};"
+
+
+Node = Union[StyleRule, AtRule]
+
+
+@dataclass
+class Stylesheet:
+    rules: List[Node]
+
+    def serialize(self) -> str:
+        return "\n\n".join(rule.serialize() for rule in self.rules)
+
+    def declarations(self) -> Iterator[Declaration]:
+        """Every declaration, in source order."""
+        stack = [iter(self.rules)]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+            elif isinstance(node, StyleRule):
+                yield from node.declarations
+            elif node.declarations is not None:
+                yield from node.declarations
+            elif node.rules is not None:
+                stack.append(iter(node.rules))
+
+
+@dataclass
+class SanitizedCSS:
+    """Result of ``sanitize_css``."""
+    css: str
+    removed: List[str]
+
+
+def tokenize(css: str) -> List[Token]:
+    """
+    Scan CSS into structural tokens in one pass.
+
+    Comments are dropped; everything else is a ``punct`` (``{``, ``}``,
+    ``;``), ``string``, ``url`` or ``text`` token.
+
+    Args:
+        css: Stylesheet text
+
+    Returns:
+        Tokens in source order
+    """
+    return [
+        Token(match.lastgroup, match.group())
+        for match in _TOKEN.finditer(css)
+        if match.lastgroup != "comment"
+    ]
+
+
+def complete_rules_end(css: str) -> int:
+    """
+    Offset just past the last complete top-level block in ``css``.
+
+    Braces inside strings, ``url()`` and comments are ignored. Text up to
+    this offset can be parsed and sanitized on its own, which lets a stream
+    be processed rule by rule.
+
+    Args:
+        css: Stylesheet text, possibly cut off mid-rule
+
+    Returns:
+        End offset of the last closed top-level block, or 0 if there is none
+    """
+    depth = 0
+    end = 0
+    for match in _TOKEN.finditer(css):
+        if match.lastgroup != "punct":
+            continue
+        value = match.group()
+        if value == "{":
+            depth += 1
+        elif value == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                end = match.end()
+    return end
+
+
+def parse_stylesheet(css: str) -> Stylesheet:
+    """
+    Parse CSS into a Stylesheet.
+
+    Parsing is forgiving: unbalanced blocks end at end of input, and stray
+    text or braces between rules are skipped.
+
+    Args:
+        css: Stylesheet text
+
+    Returns:
+        Parsed stylesheet
+    """
+    rules, _ = _Parser(tokenize(css)).rule_list(0, top_level=True)
+    return Stylesheet(rules)
+
+
+def extract_colors(css: Union[str, Stylesheet], limit: int = 8) -> List[str]:
+    """
+    Palette colors in order of first use.
+
+    Hex colors (3, 4, 6 or 8 digits), ``rgb()``/``rgba()`` and
+    ``hsl()``/``hsla()`` in any declaration, custom properties included, are
+    normalized to ``#RRGGBB``; alpha is ignored. Colors computed from
+    ``var()`` or ``calc()`` are skipped.
+
+    Args:
+        css: Stylesheet text or an already parsed Stylesheet
+        limit: Maximum number of colors to return
+
+    Returns:
+        Up to ``limit`` distinct colors
+    """
+    sheet = parse_stylesheet(css) if isinstance(css, str) else css
+    colors: List[str] = []
+    seen = set()
+    for declaration in sheet.declarations():
+        for match in _COLOR.finditer(declaration.value):
+            if match.lastgroup == "skip":
+                continue
+            if match.group("hex"):
+                color = _hex_color(match.group("hex"))
+            else:
+                color = _functional_color(match.group("space").lower(), match.group("args"))
+            if color and color not in seen:
+                seen.add(color)
+                colors.append(color)
+                if len(colors) >= limit:
+                    return colors
+    return colors
+
+
+def sanitize_stylesheet(sheet: Stylesheet) -> List[str]:
+    """
+    Remove disallowed rules, selectors and declarations in place.
+
+    Args:
+        sheet: Parsed stylesheet
+
+    Returns:
+        Short descriptions of what was removed
+    """
+    removed: List[str] = []
+    sheet.rules = _sanitize_rules(sheet.rules, removed, in_keyframes=False)
+    return removed
+
+
+def sanitize_css(css: str) -> SanitizedCSS:
+    """
+    Parse, sanitize and re-serialize a stylesheet.
+
+    Args:
+        css: Stylesheet text
+
+    Returns:
+        SanitizedCSS with the cleaned stylesheet and what was removed
+    """
+    sheet = parse_stylesheet(css)
+    removed = sanitize_stylesheet(sheet)
+    return SanitizedCSS(sheet.serialize(), removed)
+
+
+def is_allowed_selector(selector: str) -> bool:
+    """
+    Whether a selector is scoped to a PixelBoxx profile class.
+
+    The selector must start with an allowed class, so it only matches that
+    element and its descendants. Functional pseudo-classes and sibling
+    combinators are rejected: ``body:not(.pixelpage)``, ``div:has(.pixelpage)``
+    and ``.pixelpage ~ *`` all match elements outside the profile.
+    """
+    selector = selector.strip()
+    if selector in ALLOWED_ROOT_SELECTORS:
+        return True
+    if _UNSCOPED_SELECTOR.search(selector):
+        return False
+    match = _SCOPE_CLASS.match(selector)
+    return match is not None and match.group(1) in ALLOWED_CLASSES
+
+
+class _Parser:
+    """Recursive-descent parser over a token list."""
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+
+    def rule_list(self, i: int, top_level: bool = False) -> Tuple[List[Node], int]:
+        """Parse rules until the closing ``}`` (or end); return them and the index after."""
+        tokens = self.tokens
+        rules: List[Node] = []
+        while i < len(tokens):
+            kind, value = tokens[i]
+            if value == "}" and kind == "punct":
+                if not top_level:
+                    return rules, i + 1
+                i += 1  # stray closing brace
+            elif (value == ";" and kind == "punct") or (kind == "text" and value.isspace()):
+                i += 1
+            else:
+                node, i = self.rule(i)
+                if node is not None:
+                    rules.append(node)
+        return rules, i
+
+    def rule(self, i: int) -> Tuple[Optional[Node], int]:
+        prelude, i = self.until(i)
+        if i >= len(self.tokens):
+            return None, i
+        at_rule = _AT_RULE.match(prelude)
+        stop = self.tokens[i].value
+        if stop != "{":
+            # Statement at-rule, or junk before the next rule (e.g. a stray code fence)
+            node = AtRule(at_rule.group(1).lower(), at_rule.group(2)) if at_rule else None
+            return node, i + 1 if stop == ";" else i
+
+        if at_rule is None:
+            declarations, i = self.declaration_list(i + 1)
+            selectors = [s.strip() for s in prelude.split(",")]
+            return StyleRule([s for s in selectors if s], declarations), i
+
+        name = at_rule.group(1).lower()
+        if name in GROUP_AT_RULES:
+            rules, i = self.rule_list(i + 1)
+            return AtRule(name, at_rule.group(2), rules=rules), i
+        declarations, i = self.declaration_list(i + 1)
+        return AtRule(name, at_rule.group(2), declarations=declarations), i
+
+    def declaration_list(self, i: int) -> Tuple[List[Declaration], int]:
+        tokens = self.tokens
+        declarations: List[Declaration] = []
+        while i < len(tokens):
+            kind, value = tokens[i]
+            if kind == "punct" and value == "}":
+                return declarations, i + 1
+            if kind == "punct" and value == ";":
+                i += 1
+                continue
+            text, i = self.until(i)
+            if i < len(tokens) and tokens[i].value == "{":
+                i = self.skip_block(i)  # nested rules are not supported
+                continue
+            declaration = _declaration(text)
+            if declaration is not None:
+                declarations.append(declaration)
+        return declarations, i
+
+    def until(self, i: int) -> Tuple[str, int]:
+        """Text up to the next ``{``, ``}`` or ``;``, whitespace collapsed outside strings."""
+        tokens = self.tokens
+        parts = []
+        while i < len(tokens):
+            kind, value = tokens[i]
+            if kind == "punct":
+                break
+            parts.append(_WHITESPACE.sub(" ", value) if kind == "text" else value)
+            i += 1
+        return "".join(parts).strip(), i
+
+    def skip_block(self, i: int) -> int:
+        """Index after the block opened at ``i``."""
+        depth = 0
+        tokens = self.tokens
+        while i < len(tokens):
+            kind, value = tokens[i]
+            if kind == "punct" and value == "{":
+                depth += 1
+            elif kind == "punct" and value == "}":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return i
+
+
+def _declaration(text: str) -> Optional[Declaration]:
+    match = _DECLARATION.match(text)
+    if match is None:
+        return None
+    name, value = match.groups()
+    important = _IMPORTANT.search(value)
+    if important:
+        value = value[: important.start()]
+    value = value.strip()
+    if not value:
+        return None
+    # Custom property names are case-sensitive; standard properties are not
+    return Declaration(name if name.startswith("--") else name.lower(), value, bool(important))
+
+
+def _sanitize_rules(rules: List[Node], removed: List[str], in_keyframes: bool) -> List[Node]:
+    kept: List[Node] = []
+    for rule in rules:
+        if isinstance(rule, AtRule):
+            if rule.name not in GROUP_AT_RULES or rule.rules is None:
+                removed.append(f"@{rule.name}")
+                continue
+            rule.rules = _sanitize_rules(
+                rule.rules, removed, in_keyframes=rule.name.endswith("keyframes")
+            )
+            kept.append(rule)
+            continue
+
+        if not in_keyframes:
+            allowed = [s for s in rule.selectors if is_allowed_selector(s)]
+            removed.extend(f"selector {s}" for s in rule.selectors if s not in allowed)
+            if not allowed:
+                continue
+            rule.selectors = _scope_root_rule(rule, allowed, removed)
+        rule.declarations = [d for d in rule.declarations if _allowed_declaration(d, removed)]
+        kept.append(rule)
+    return kept
+
+
+def _scope_root_rule(rule: StyleRule, selectors: List[str], removed: List[str]) -> List[str]:
+    """
+    Keep ``:root`` rules to custom properties.
+
+    A rule on root selectors alone loses its other declarations; a rule that
+    also has profile selectors loses its root selectors instead, unless it
+    only sets custom properties.
+    """
+    roots = [s for s in selectors if s.strip() in ALLOWED_ROOT_SELECTORS]
+    if not roots or all(d.name.startswith("--") for d in rule.declarations):
+        return selectors
+    if len(roots) < len(selectors):
+        removed.extend(f"selector {s} (only custom properties)" for s in roots)
+        return [s for s in selectors if s not in roots]
+    kept = []
+    for declaration in rule.declarations:
+        if declaration.name.startswith("--"):
+            kept.append(declaration)
+        else:
+            removed.append(f"{declaration.name} (root)")
+    rule.declarations = kept
+    return selectors
+
+
+def _allowed_declaration(declaration: Declaration, removed: List[str]) -> bool:
+    reason = _blocked_reason(declaration)
+    if reason:
+        removed.append(f"{declaration.name} ({reason})")
+        return False
+    return True
+
+
+def _blocked_reason(declaration: Declaration) -> Optional[str]:
+    if declaration.name in BLOCKED_PROPERTIES:
+        return "property"
+    # Match what the browser will see: "\\75 rl(" is "url(", "f\\69xed" is "fixed"
+    value = _unescape(declaration.value)
+    blocked_values = BLOCKED_VALUES.get(declaration.name, ())
+    if value.strip().lower() in blocked_values or (blocked_values and _VAR.search(value)):
+        return "value"
+    if _UNSAFE_VALUE.search(value):
+        return "script"
+    for match in _COLOR.finditer(value):
+        if match.group("space"):
+            numbers = _color_numbers(match.group("space").lower(), match.group("args"))
+            if numbers is not None and not all(math.isfinite(n) for n in numbers):
+                return "color"
+    for match in _URL.finditer(value):
+        target = next(group for group in match.groups() if group is not None)
+        if not _SAFE_DATA_URL.match(target.strip()):
+            return "url"
+    return None
+
+
+def _unescape(value: str) -> str:
+    """
+    Decode CSS escapes: hex escapes (with their optional trailing space),
+    escaped newlines, and backslash-escaped literal characters.
+    """
+    if "\\" not in value:
+        return value
+    return _ESCAPE.sub(_decode_escape, value)
+
+
+def _decode_escape(match: "re.Match[str]") -> str:
+    digits, literal = match.groups()
+    if digits is None:
+        return literal if literal not in (None, "\n", "\f") else ""
+    codepoint = int(digits, 16)
+    if codepoint == 0 or codepoint > 0x10FFFF or 0xD800 <= codepoint <= 0xDFFF:
+        return "\ufffd"
+    return chr(codepoint)
+
+
+def _functional_color(space: str, args_text: str) -> Optional[str]:
+    numbers = _color_numbers(space, args_text)
+    if numbers is None or not all(math.isfinite(n) for n in numbers):
+        return None
+    if space == "rgb":
+        channels = numbers
+    else:
+        hue, saturation, lightness = numbers
+        channels = [c * 255 for c in colorsys.hls_to_rgb(hue % 360 / 360, lightness, saturation)]
+    return "#" + "".join(f"{min(255, max(0, round(c))):02X}" for c in channels)
+
+
+def _color_numbers(space: str, args_text: str) -> Optional[List[float]]:
+    """
+    The three numbers of an ``rgb()`` (0-255 scale) or ``hsl()`` (degrees and
+    fractions) color; None if they do not parse. ``nan`` and ``inf`` parse as
+    floats, so callers check the result with ``math.isfinite``.
+    """
+    args = [a for a in _COLOR_ARGS.split(args_text.strip()) if a]
+    if len(args) < 3:
+        return None
+    try:
+        if space == "rgb":
+            return [float(a[:-1]) * 2.55 if a.endswith("%") else float(a) for a in args[:3]]
+        return [_angle(args[0])] + [float(a.rstrip("%")) / 100 for a in args[1:3]]
+    except (ValueError, OverflowError):
+        return None
+
+
+def _angle(value: str) -> float:
+    lowered = value.lower()
+    for unit, scale in (("deg", 1.0), ("grad", 0.9), ("rad", 57.29577951308232), ("turn", 360.0)):
+        if lowered.endswith(unit):
+            return float(lowered[: -len(unit)]) * scale
+    return float(lowered)
+
+
+def _hex_color(digits: str) -> Optional[str]:
+    if len(digits) not in (3, 4, 6, 8):
+        return None
+    if len(digits) <= 4:
+        digits = "".join(c * 2 for c in digits[:3])
+    return "#" + digits[:6].upper()
@@ -0,0 +1,200 @@
+"""
+Rule selection and patch merging for incremental refinement.
+
+Works on the tree built by ``css_parser.parse_stylesheet``, so refinement,
+sanitizing and palette extraction share one grammar. Rules are matched by a
+key built from their normalized selector list or at-rule prelude.
+Conditional group rules (``@media``, ``@supports``, ``@container``) keep
+their nested rules so a patch can target a rule inside them; ``@keyframes``
+are replaced as a whole, since a patch restates every stop.
+"""
+
+import re
+from dataclasses import replace
+from typing import Dict, List, Optional, Set, Tuple
+
+from services.css_parser import ALLOWED_ROOT_SELECTORS, GROUP_AT_RULES, AtRule, Node, StyleRule
+
+# Feedback words that point at a PixelBoxx profile selector
+SELECTOR_HINTS: Dict[str, Tuple[str, ...]] = {
+    ".profile-header": ("header", "hero", "banner", "title", "heading"),
+    ".profile-avatar": ("avatar", "profile picture", "pfp"),
+    ".profile-bio": ("bio", "about"),
+    ".top-friends": ("friend",),
+    ".music-player": ("music", "player", "song"),
+    ".photo-gallery": ("photo", "gallery", "picture"),
+    ".guestbook": ("guestbook", "comment"),
+    ".widget": ("widget",),
+    ".profile-badge": ("badge", "achievement"),
+    ".pixelpage": ("background", "page", "font", "overall", "everything", "whole"),
+}
+
+# Selectors that style the page as a whole (custom properties, base font);
+# the sanitizer accepts nothing else outside the profile classes
+ROOT_SELECTORS = ALLOWED_ROOT_SELECTORS | {".pixelpage"}
+
+_SELECTOR_SPACING = re.compile(r"\s*([>+~])\s*")
+_PRELUDE_SPACING = re.compile(r"\s*([,:])\s*")
+
+
+def rule_key(rule: Node) -> str:
+    """
+    Key identifying a rule across two stylesheets.
+
+    Whitespace that does not change meaning is removed, so ``.a > .b, .c``
+    matches ``.a>.b,.c`` and ``@media (max-width: 600px)`` matches
+    ``@media (max-width:600px)``.
+    """
+    if isinstance(rule, StyleRule):
+        # In selectors ".a :hover" != ".a:hover", so only combinators are squeezed
+        return ",".join(_SELECTOR_SPACING.sub(r"\1", selector) for selector in rule.selectors)
+    prelude = _PRELUDE_SPACING.sub(r"\1", rule.prelude.strip())
+    return f"@{rule.name} {prelude}".rstrip()
+
+
+def relevant_rules(rules: List[Node], feedback: str) -> List[Node]:
+    """
+    Pick the rules a piece of feedback is likely about.
+
+    Rules whose selectors match a profile area mentioned in the feedback are
+    kept, along with page-level rules (custom properties, ``.pixelpage``) and
+    any ``@keyframes`` the kept rules animate with. If nothing in the feedback
+    points at a specific area, every rule is returned.
+
+    Args:
+        rules: Parsed stylesheet rules
+        feedback: User's refinement request
+
+    Returns:
+        Subset of rules, in source order, followed by referenced keyframes
+    """
+    text = feedback.lower()
+    targets = {
+        selector
+        for selector, words in SELECTOR_HINTS.items()
+        if selector in text or selector.lstrip(".") in text or any(w in text for w in words)
+    }
+    if not targets:
+        return list(rules)
+
+    selected = _select(rules, targets)
+    animations = _animation_names(selected)
+    keyframes = [
+        rule
+        for rule in rules
+        if _is_keyframes(rule) and rule.prelude.strip().strip("\"'") in animations
+    ]
+    return selected + keyframes
+
+
+def merge_rules(base: List[Node], patch: List[Node]) -> Tuple[List[Node], List[str]]:
+    """
+    Apply a patch stylesheet to a base stylesheet.
+
+    A patch rule replaces the base rule with the same key (the last one,
+    which wins the cascade), or is appended if there is none. Patches to
+    conditional group rules merge into the matching group. An empty block
+    deletes the rule. Neither input is modified.
+
+    Args:
+        base: Rules of the current stylesheet
+        patch: Rules returned by the model
+
+    Returns:
+        Merged rules and the keys of rules that were added, changed or removed
+    """
+    merged: List[Optional[Node]] = list(base)
+    index = {rule_key(rule): position for position, rule in enumerate(merged)}
+    changed: List[str] = []
+
+    for rule in patch:
+        key = rule_key(rule)
+        position = index.get(key)
+        current = merged[position] if position is not None else None
+
+        if _is_empty(rule):
+            if position is not None:
+                merged[position] = None
+                del index[key]
+                changed.append(key)
+            continue
+
+        if _is_conditional(rule) and current is not None and _is_conditional(current):
+            children, changed_children = merge_rules(current.rules, rule.rules)
+            merged[position] = replace(current, rules=children)
+            changed.extend(f"{key} {child}" for child in changed_children)
+            continue
+
+        if position is not None:
+            merged[position] = rule
+        else:
+            index[key] = len(merged)
+            merged.append(rule)
+        changed.append(key)
+
+    return [rule for rule in merged if rule is not None], changed
+
+
+def _select(rules: List[Node], targets: Set[str]) -> List[Node]:
+    selected: List[Node] = []
+    for rule in rules:
+        if _is_conditional(rule):
+            children = _select(rule.rules, targets)
+            if children:
+                selected.append(replace(rule, rules=children))
+        elif isinstance(rule, StyleRule) and _matches(rule, targets):
+            selected.append(rule)
+    return selected
+
+
+def _matches(rule: StyleRule, targets: Set[str]) -> bool:
+    if any(selector in ROOT_SELECTORS for selector in rule.selectors):
+        return True
+    if any(declaration.name.startswith("--") for declaration in rule.declarations):
+        return True
+    # .pixelpage prefixes most selectors, so it only matches on its own
+    return any(
+        target in selector
+        for target in targets - {".pixelpage"}
+        for selector in rule.selectors
+    )
+
+
+def _animation_names(rules: List[Node]) -> Set[str]:
+    names: Set[str] = set()
+    for rule in rules:
+        if isinstance(rule, AtRule):
+            if rule.rules is not None and not _is_keyframes(rule):
+                names |= _animation_names(rule.rules)
+            continue
+        for declaration in rule.declarations:
+            if declaration.name in ("animation", "animation-name"):
+                names.update(
+                    name.strip("\"'") for name in declaration.value.replace(",", " ").split()
+                )
+    return names
+
+
+def _is_keyframes(rule: Node) -> bool:
+    return isinstance(rule, AtRule) and rule.name.endswith("keyframes")
+
+
+def _is_conditional(rule: Node) -> bool:
+    """Group rule whose nested rules merge one by one (not ``@keyframes``)."""
+    return (
+        isinstance(rule, AtRule)
+        and rule.name in GROUP_AT_RULES
+        and rule.rules is not None
+        and not _is_keyframes(rule)
+    )
+
+
+def _is_empty(rule: Node) -> bool:
+    """Whether the block is empty, which a patch uses to delete a rule."""
+    if isinstance(rule, StyleRule):
+        return not rule.declarations
+    if rule.rules is not None:
+        return not rule.rules
+    if rule.declarations is not None:
+        return not rule.declarations
+    return False
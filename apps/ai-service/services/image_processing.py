@@ -0,0 +1,125 @@
+"""
+Image preprocessing for the vision call.
+
+Uploads are decoded, orientation-corrected, downscaled so the long edge fits
+the model's useful resolution, stripped of metadata and re-encoded compactly
+before being base64-encoded for Claude. Pillow is imported on first use so
+it stays off the startup path.
+"""
+
+import asyncio
+import io
+from dataclasses import dataclass
+from typing import Optional
+
+# Refuse to decode anything larger than this many pixels (decompression bombs)
+MAX_IMAGE_PIXELS = 64_000_000
+
+
+class ImageProcessingError(ValueError):
+    """Raised when an upload cannot be decoded as an image."""
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """Re-encoded image ready to send to the vision model."""
+    data: bytes
+    media_type: str
+    width: int
+    height: int
+
+
+def load_pillow():
+    """Import Pillow (cached after the first call) with the decoder limits applied."""
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    return Image
+
+
+def sniff_media_type(image_bytes: bytes) -> Optional[str]:
+    """
+    Detect the image media type from magic bytes.
+
+    Args:
+        image_bytes: Raw image data (the first few bytes are enough)
+
+    Returns:
+        Media type string, or None if the format is not recognized
+    """
+    if image_bytes.startswith(b"\x89PNG"):
+        return "image/png"
+    if image_bytes.startswith(b"GIF8"):
+        return "image/gif"
+    if image_bytes.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def preprocess_image(
+    image_bytes: bytes,
+    max_edge: int = 1568,
+    quality: int = 85,
+) -> PreparedImage:
+    """
+    Decode, downscale, strip metadata and re-encode an image.
+
+    Opaque images become JPEG; images with transparency become WebP so the
+    alpha channel survives. Animated images keep only their first frame.
+
+    Args:
+        image_bytes: Raw uploaded image data
+        max_edge: Maximum length of the longest edge in pixels
+        quality: Encoder quality for lossy output
+
+    Returns:
+        PreparedImage with the re-encoded bytes and media type
+
+    Raises:
+        ImageProcessingError: If the image cannot be decoded, including data
+            that is truncated or corrupt past the header
+    """
+    Image = load_pillow()
+    from PIL import ImageOps
+
+    # Pillow decodes lazily, so a bad body only fails in convert()/thumbnail()
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        # Let the JPEG decoder downscale by a power of two while decoding
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        # Saving a fresh image without exif/icc/info drops all metadata
+        output = io.BytesIO()
+        if has_alpha:
+            image.save(output, format="WEBP", quality=quality, method=4)
+            media_type = "image/webp"
+        else:
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+            media_type = "image/jpeg"
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageProcessingError(f"Unsupported or corrupt image: {e}") from e
+
+    return PreparedImage(
+        data=output.getvalue(),
+        media_type=media_type,
+        width=image.width,
+        height=image.height,
+    )
+
+
+async def prepare_image(
+    image_bytes: bytes,
+    max_edge: int = 1568,
+    quality: int = 85,
+) -> PreparedImage:
+    """Run ``preprocess_image`` in a worker thread so decoding never blocks the loop."""
+    return await asyncio.to_thread(preprocess_image, image_bytes, max_edge, quality)
@@ -0,0 +1,170 @@
+"""
+Adaptive admission control for upstream model calls.
+
+An AIMD (additive-increase, multiplicative-decrease) limiter caps how many
+Claude calls a worker has in flight. Callers over the limit wait in a bounded
+queue; when the queue is full or the wait times out, ``UpstreamOverloaded`` is
+raised so the API can answer 503 immediately instead of piling up requests
+that are doomed to hit rate limits.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Any, Optional
+
+# Upstream statuses that mean "slow down" rather than "request is broken"
+OVERLOAD_STATUS_CODES = frozenset({429, 503, 529})
+
+
+class UpstreamOverloaded(Exception):
+    """Raised when an upstream call cannot be admitted in time."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Concurrency limiter with a bounded wait queue and AIMD limit tuning."""
+
+    def __init__(
+        self,
+        max_limit: int = 32,
+        min_limit: int = 2,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+    ):
+        """
+        Args:
+            max_limit: Upper bound (and starting value) for in-flight calls
+            min_limit: Lower bound the limit never shrinks below
+            max_queue: Maximum callers waiting for a slot
+            queue_timeout: Seconds a caller may wait before giving up
+            decrease_factor: Multiplier applied to the limit on overload
+            decrease_cooldown: Minimum seconds between two decreases, so one
+                burst of 429s only shrinks the limit once
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self._idle: Optional[asyncio.Event] = None
+
+    @property
+    def retry_after(self) -> int:
+        """Suggested Retry-After seconds for rejected callers."""
+        return max(1, math.ceil(self.queue_timeout))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one in-flight slot for the duration of the block.
+
+        Raises:
+            UpstreamOverloaded: If the queue is full or the wait times out
+        """
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def on_success(self) -> None:
+        """Additive increase: grow the limit by about one per window of successes."""
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def on_overload(self) -> None:
+        """Multiplicative decrease after a rate-limit/overload response."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Wait for every in-flight call to finish, e.g. during graceful shutdown.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if the limiter became idle, False if calls were still running
+        """
+        if self.in_flight == 0:
+            return True
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limit, load and rejection counters."""
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+        }
+
+    async def _acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise UpstreamOverloaded("Upstream queue is full", self.retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return  # a slot was handed over just as we timed out
+            waiter.cancel()
+            self._remove_waiter(waiter)
+            self.rejected += 1
+            raise UpstreamOverloaded("Timed out waiting for upstream capacity", self.retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # give the handed-over slot to the next waiter
+            else:
+                waiter.cancel()
+                self._remove_waiter(waiter)
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0 and not self._waiters and self._idle is not None:
+            self._idle.set()
+            self._idle = None
+        # Hand freed slots straight to waiters, in arrival order
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _remove_waiter(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
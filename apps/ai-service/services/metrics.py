@@ -0,0 +1,418 @@
+"""
+Prometheus-style metrics.
+
+A deliberately small, dependency-free registry: counters, gauges and
+histograms keyed by label values, rendered in the Prometheus text exposition
+format by ``GET /metrics``. Recording is a dict lookup plus a bisect, cheap
+enough to leave on in production.
+
+Values live in the worker process. Under a multi-worker server each scrape
+reaches one worker, so ``MultiprocessMetrics`` shares them: every worker
+writes a snapshot of its registry to a common directory, and ``/metrics``
+renders the sum over all workers. Counters and histograms of workers that
+have exited are kept, so totals never go backwards; gauges only count live
+workers.
+"""
+
+import glob
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Metric name -> [[label values, value], ...]; histogram values are [counts, sum]
+Snapshot = Dict[str, List[list]]
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self, state: Optional[Dict[LabelValues, Any]] = None) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ] + self._samples(self._state() if state is None else state)
+
+    def _state(self) -> Dict[LabelValues, Any]:
+        """Current values by label values."""
+        raise NotImplementedError
+
+    def _merge(self, states: List[Dict[LabelValues, Any]]) -> Dict[LabelValues, Any]:
+        """Combine the states of several workers."""
+        merged: Dict[LabelValues, Any] = {}
+        for state in states:
+            for key, value in state.items():
+                merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def _samples(self, state: Dict[LabelValues, Any]) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in state.items()
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _state(self) -> Dict[LabelValues, float]:
+        return dict(self._values)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback at scrape time."""
+
+    type_name = "gauge"
+
+    def __init__(self, *args, aggregate: str = "sum", **kwargs):
+        """
+        Args:
+            aggregate: How live workers' values combine: ``sum`` for amounts
+                (in-flight requests), ``mean`` for ratios
+        """
+        super().__init__(*args, **kwargs)
+        self.aggregate = aggregate
+        self._values: Dict[LabelValues, float] = {}
+        self._callbacks: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels: str) -> None:
+        """Read the value from ``fn`` whenever metrics are rendered."""
+        self._callbacks[self._key(labels)] = fn
+
+    def _state(self) -> Dict[LabelValues, float]:
+        values = dict(self._values)
+        for key, fn in self._callbacks.items():
+            values[key] = fn()
+        return values
+
+    def _merge(self, states: List[Dict[LabelValues, float]]) -> Dict[LabelValues, float]:
+        merged = super()._merge(states)
+        if self.aggregate == "mean":
+            for key in merged:
+                merged[key] /= sum(1 for state in states if key in state)
+        return merged
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values."""
+
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall-clock duration of the block, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _state(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        return {key: (list(counts), self._sums[key]) for key, counts in self._counts.items()}
+
+    def _merge(
+        self, states: List[Dict[LabelValues, Tuple[List[int], float]]]
+    ) -> Dict[LabelValues, Tuple[List[int], float]]:
+        merged: Dict[LabelValues, Tuple[List[int], float]] = {}
+        for state in states:
+            for key, (counts, total) in state.items():
+                if key in merged:
+                    merged_counts, merged_total = merged[key]
+                    counts = [a + b for a, b in zip(merged_counts, counts)]
+                    total += merged_total
+                merged[key] = (list(counts), total)
+        return merged
+
+    def _samples(self, state: Dict[LabelValues, Tuple[List[int], float]]) -> List[str]:
+        lines = []
+        for key, (counts, total) in state.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        aggregate: str = "sum",
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, aggregate=aggregate))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self, snapshots: Optional[List[Snapshot]] = None) -> str:
+        """
+        All metrics in Prometheus text exposition format.
+
+        Args:
+            snapshots: Snapshots of several workers to render merged, instead
+                of this process's values
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            if snapshots is None:
+                lines.extend(metric.render())
+                continue
+            states = [
+                {tuple(key): _decode(metric, value) for key, value in snapshot[metric.name]}
+                for snapshot in snapshots
+                if metric.name in snapshot
+            ]
+            lines.extend(metric.render(metric._merge(states)))
+        return "\n".join(lines) + "\n"
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """Metric registered under ``name``, if any."""
+        return next((metric for metric in self._metrics if metric.name == name), None)
+
+    def snapshot(self, gauges: bool = True) -> Snapshot:
+        """
+        Current values as JSON-serializable data.
+
+        Args:
+            gauges: Include gauges (leave them out for a worker that is exiting)
+        """
+        return {
+            metric.name: [[list(key), value] for key, value in metric._state().items()]
+            for metric in self._metrics
+            if gauges or not isinstance(metric, Gauge)
+        }
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+def _decode(metric: _Metric, value: Any) -> Any:
+    if isinstance(metric, Histogram):
+        counts, total = value
+        return list(counts), total
+    return value
+
+
+class MultiprocessMetrics:
+    """
+    Metrics shared by the worker processes of one server through a directory.
+
+    Each worker writes its snapshot to ``metrics-<pid>.json``; rendering
+    reads every snapshot in the directory. The directory must be emptied
+    (``clear``) when the server starts, or totals carry over between runs.
+    """
+
+    def __init__(self, directory: str, registry: Optional["MetricsRegistry"] = None):
+        """
+        Args:
+            directory: Directory shared by all workers of the server
+            registry: Registry to publish (default: the process-wide one)
+        """
+        self.directory = directory
+        self.registry = registry or REGISTRY
+        self.pid = os.getpid()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def clear(directory: str) -> None:
+        """Remove snapshots left by a previous run."""
+        for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+            os.remove(path)
+
+    def write(self, snapshot: Snapshot) -> None:
+        """Replace this worker's snapshot file. Blocking; run it in a thread."""
+        path = os.path.join(self.directory, f"metrics-{self.pid}.json")
+        temp = f"{path}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(temp, path)
+
+    def render(self, snapshot: Snapshot) -> str:
+        """
+        Write this worker's snapshot, then render all workers merged.
+
+        Blocking; run it in a thread. Take ``snapshot`` on the event loop
+        (``registry.snapshot()``) so values are not read mid-update.
+        """
+        self.write(snapshot)
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # removed or replaced while listing
+            pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+            if pid != self.pid and not _process_alive(pid):
+                # Exited: keep its counters and histograms, drop its gauges
+                data = {
+                    name: values for name, values in data.items()
+                    if not isinstance(self.registry.get(name), Gauge)
+                }
+            snapshots.append(data)
+        return self.registry.render(snapshots)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "pixelboxx_http_requests_total", "HTTP requests by endpoint and status", ["method", "path", "status"]
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "pixelboxx_http_request_duration_seconds", "HTTP request latency by endpoint", ["method", "path"]
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "pixelboxx_http_requests_in_flight", "HTTP requests currently being served"
+)
+STAGE_DURATION = REGISTRY.histogram(
+    "pixelboxx_design_stage_duration_seconds", "Time spent per design pipeline stage", ["stage"]
+)
+UPSTREAM_DURATION = REGISTRY.histogram(
+    "pixelboxx_upstream_request_duration_seconds", "Claude API call latency", ["call", "outcome"]
+)
+UPSTREAM_TOKENS = REGISTRY.counter(
+    "pixelboxx_upstream_tokens_total", "Claude token usage from response usage", ["call", "type"]
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "pixelboxx_upstream_in_flight", "Claude calls currently admitted by the limiter"
+)
+UPSTREAM_LIMIT = REGISTRY.gauge(
+    "pixelboxx_upstream_concurrency_limit", "Current adaptive upstream concurrency limit"
+)
+FALLBACKS = REGISTRY.counter(
+    "pixelboxx_mock_fallbacks_total", "Responses served from mock output after upstream failure", ["call"]
+)
+CSS_REMOVED = REGISTRY.counter(
+    "pixelboxx_css_removed_total", "Disallowed selectors, at-rules and declarations stripped from model CSS"
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "pixelboxx_cache_lookups_total", "Result cache lookups by result", ["result"]
+)
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "pixelboxx_cache_hit_ratio", "Result cache hit ratio since start", aggregate="mean"
+)
+PROMPT_CACHE_READ_RATIO = REGISTRY.gauge(
+    "pixelboxx_prompt_cache_read_ratio",
+    "Share of Claude input tokens read from the prompt cache",
+    aggregate="mean",
+)
+COALESCED = REGISTRY.counter(
+    "pixelboxx_coalesced_requests_total", "Requests that joined an identical in-flight upstream call", ["call"]
+)
+MODERATION_DECISIONS = REGISTRY.counter(
+    "pixelboxx_moderation_decisions_total", "Moderation verdicts by content kind, deciding tier and action", ["kind", "tier", "action"]
+)
+MODERATION_BATCH_SIZE = REGISTRY.histogram(
+    "pixelboxx_moderation_batch_size", "Texts per moderation model call", buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+MODERATION_ISOLATED = REGISTRY.counter(
+    "pixelboxx_moderation_isolated_total", "Escalated texts moderated in a call of their own instead of a shared batch", ["reason"]
+)
+NEAR_DUPLICATE_REUSED = REGISTRY.counter(
+    "pixelboxx_near_duplicate_reuse_total", "Image analyses reused from a near-identical earlier image"
+)
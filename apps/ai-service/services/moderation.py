@@ -0,0 +1,396 @@
+"""
+Tiered content moderation.
+
+The local tier decides the clear cases in microseconds: a multi-pattern term
+filter for text and a perceptual-hash lookup of known-bad images. Only what
+it cannot decide reaches the model tier; the local tier only approves short
+texts without hits. Escalated texts are micro-batched, so texts arriving
+within a few milliseconds of each other (from one batch request or many
+single ones) share one model call. Texts that read like instructions to the
+model are moderated alone, so they cannot sway other users' verdicts. If the
+model is not available or fails, undecided items go to human review; they are
+never approved by default.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+from config import Settings
+from models.moderation import ModerationResult
+from services.cache import ResultCache, make_cache_key
+from services.claude import ClaudeService
+from services.metrics import (
+    FALLBACKS,
+    MODERATION_BATCH_SIZE,
+    MODERATION_DECISIONS,
+    MODERATION_ISOLATED,
+)
+from services.phash import HashIndex, dhash_async, load_hashes
+from services.text_filter import DEFAULT_TERMS, FilterResult, TextFilter, load_terms
+from services.tracing import stage
+
+logger = logging.getLogger(__name__)
+
+# Text that addresses the moderator or mimics its output format; such items
+# get a model call of their own instead of sharing a batch with other users
+_INSTRUCTION_LIKE = re.compile(
+    r"\b(?:ignore|disregard|instructions?|prompt|moderat\w*|verdicts?|approved?|rejected?|json)\b|[{}\[\]]",
+    re.IGNORECASE,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Groups items submitted close together into one call.
+
+    A batch is processed once it holds ``max_size`` items or ``max_delay``
+    seconds after its first item arrived, whichever comes first. Items
+    submitted under a key already waiting in the current batch share its
+    result.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[List[T]], Awaitable[List[R]]],
+        max_size: int = 20,
+        max_delay: float = 0.05,
+    ):
+        """
+        Args:
+            process: Handles a batch, returning one result per item in order
+            max_size: Most items per batch
+            max_delay: Longest an item waits for the batch to fill, in seconds
+        """
+        self.process = process
+        self.max_size = max(1, max_size)
+        self.max_delay = max_delay
+        self.batches = 0
+        self.items = 0
+        self._pending: Dict[str, Tuple[T, asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, key: str, item: T) -> R:
+        """
+        Add an item to the current batch and wait for its result.
+
+        Args:
+            key: Identity of the item; duplicates in a batch are processed once
+            item: Input for ``process``
+
+        Returns:
+            The item's result
+
+        Raises:
+            Exception: Whatever ``process`` raised for the batch
+        """
+        pending = self._pending.get(key)
+        if pending is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = (item, future)
+            if len(self._pending) >= self.max_size:
+                self.flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        else:
+            future = pending[1]
+        # A caller that goes away must not cancel the result for the others
+        return await asyncio.shield(future)
+
+    def flush(self) -> None:
+        """Start processing the current batch now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = list(self._pending.values()), {}
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def close(self) -> None:
+        """Process anything still waiting and wait for running batches."""
+        self.flush()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        """Batch counts since start."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        MODERATION_BATCH_SIZE.observe(len(batch))
+        try:
+            results = await self.process([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()  # the waiter may be gone; don't log it as unretrieved
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+@dataclass(frozen=True)
+class _TextItem:
+    """An escalated text waiting for the model."""
+    content: str
+    context: Optional[str]
+
+
+class ModerationService:
+    """Local prefilter first, batched model calls for the rest."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        claude: Optional[ClaudeService] = None,
+        cache: Optional[ResultCache] = None,
+        text_filter: Optional[TextFilter] = None,
+        known_bad_images: Optional[HashIndex] = None,
+    ):
+        """
+        Args:
+            settings: Service configuration
+            claude: Client for the model tier; without one (or in mock mode)
+                undecided items go to review
+            cache: Optional result cache for model verdicts
+            text_filter: Local term filter (default: built-in terms)
+            known_bad_images: Perceptual hashes of images to reject on sight
+        """
+        self.claude = claude
+        self.cache = cache
+        self.model = settings.moderation_model
+        self.use_model = claude is not None and not claude.mock_mode and claude.client is not None
+        self.text_filter = text_filter or TextFilter(
+            approve_max_chars=settings.moderation_local_approve_max_chars
+        )
+        self.known_bad_images = known_bad_images or HashIndex()
+        self.image_distance = settings.moderation_image_distance
+        self.batcher: MicroBatcher[_TextItem, Optional[ModerationResult]] = MicroBatcher(
+            self._moderate_batch,
+            max_size=settings.moderation_batch_size,
+            max_delay=settings.moderation_batch_delay,
+        )
+
+    @classmethod
+    def load(
+        cls,
+        settings: Settings,
+        claude: Optional[ClaudeService] = None,
+        cache: Optional[ResultCache] = None,
+    ) -> "ModerationService":
+        """
+        Build the service with the term and image-hash lists from settings.
+
+        Reads files, so call it off the event loop.
+        """
+        terms = list(DEFAULT_TERMS)
+        if settings.moderation_terms_path:
+            terms += load_terms(settings.moderation_terms_path)
+        hashes = (
+            load_hashes(settings.moderation_image_hashes_path)
+            if settings.moderation_image_hashes_path
+            else []
+        )
+        service = cls(
+            settings,
+            claude=claude,
+            cache=cache,
+            text_filter=TextFilter(
+                terms, approve_max_chars=settings.moderation_local_approve_max_chars
+            ),
+            known_bad_images=HashIndex(hashes),
+        )
+        logger.info(
+            "Moderation lists loaded",
+            extra={"terms": service.text_filter.size, "image_hashes": len(service.known_bad_images)},
+        )
+        return service
+
+    async def moderate_text(self, content: str, context: Optional[str] = None) -> ModerationResult:
+        """
+        Moderate one text.
+
+        Args:
+            content: User text
+            context: Where it appears (guestbook, bio, chat, ...)
+
+        Returns:
+            ModerationResult from the tier that decided
+        """
+        with stage("moderation_prefilter"):
+            verdict = self.text_filter.check(content)
+        if verdict.action == "escalate":
+            result = await self._escalate_text(content, context, verdict)
+        else:
+            result = self._local_text_result(verdict)
+        MODERATION_DECISIONS.inc(kind="text", tier=result.tier, action=result.action)
+        return result
+
+    async def moderate_texts(
+        self, items: List[Tuple[str, Optional[str]]]
+    ) -> List[ModerationResult]:
+        """
+        Moderate many texts; the escalated ones share model calls.
+
+        Args:
+            items: (content, context) pairs
+
+        Returns:
+            One ModerationResult per item, in order
+        """
+        return list(
+            await asyncio.gather(*(self.moderate_text(content, context) for content, context in items))
+        )
+
+    async def moderate_image(
+        self, image_bytes: bytes, image_digest: Optional[str] = None
+    ) -> ModerationResult:
+        """
+        Moderate one image.
+
+        Args:
+            image_bytes: Encoded image data
+            image_digest: Optional precomputed SHA-256 hex digest of image_bytes
+
+        Returns:
+            ModerationResult from the tier that decided
+
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
+        """
+        with stage("moderation_prefilter"):
+            value = await dhash_async(image_bytes)
+            match = self.known_bad_images.nearest(value, self.image_distance)
+
+        if match is not None:
+            result = ModerationResult(
+                safe=False,
+                score=0.0,
+                flags=["known_bad_image"],
+                action="reject",
+                reason="Matches a known prohibited image",
+                tier="local",
+            )
+        elif not self.use_model:
+            # No local signal and no model to ask: keep the mock-mode behaviour
+            result = ModerationResult(safe=True, score=1.0, action="approve", tier="local")
+        else:
+            result = await self._model_image_result(image_bytes, image_digest)
+        MODERATION_DECISIONS.inc(kind="image", tier=result.tier, action=result.action)
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        """Prefilter list sizes and batching statistics."""
+        return {
+            "model_tier": self.use_model,
+            "terms": self.text_filter.size,
+            "image_hashes": len(self.known_bad_images),
+            "batching": self.batcher.stats(),
+        }
+
+    async def close(self) -> None:
+        """Finish batches that are still collecting or running."""
+        await self.batcher.close()
+
+    def _local_text_result(self, verdict: FilterResult) -> ModerationResult:
+        if verdict.action == "reject":
+            return ModerationResult(
+                safe=False,
+                score=0.0,
+                flags=verdict.flags,
+                action="reject",
+                reason=f"Blocked terms ({', '.join(verdict.flags)})",
+                tier="local",
+            )
+        return ModerationResult(safe=True, score=1.0, action="approve", tier="local")
+
+    async def _escalate_text(
+        self, content: str, context: Optional[str], verdict: FilterResult
+    ) -> ModerationResult:
+        """Ask the model about a text the prefilter could not decide."""
+        if not self.use_model:
+            if not verdict.flags:
+                # Nothing flagged and no model to ask: keep the mock-mode behaviour
+                return ModerationResult(safe=True, score=1.0, action="approve", tier="local")
+            return self._review(verdict.flags, "Flagged by the prefilter", tier="local")
+
+        key = make_cache_key("moderation-text", self.model, content, context or "")
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return ModerationResult(**cached)
+
+        try:
+            with stage("moderation_model"):
+                if _INSTRUCTION_LIKE.search(content):
+                    MODERATION_ISOLATED.inc(reason="instruction_like")
+                    MODERATION_BATCH_SIZE.observe(1)
+                    result = (await self.claude.moderate_texts([(context, content)]))[0]
+                else:
+                    result = await self.batcher.submit(key, _TextItem(content, context))
+        except Exception as e:
+            logger.warning("Text moderation failed, sending to review", extra={"error": repr(e)})
+            FALLBACKS.inc(call="moderation_text")
+            return self._review(verdict.flags, "Model unavailable", tier="fallback")
+        if result is None:
+            return self._review(verdict.flags, "No model verdict", tier="fallback")
+
+        # Keep what the prefilter saw so reviewers have the full picture
+        result = result.model_copy(update={"flags": list(dict.fromkeys(verdict.flags + result.flags))})
+        await self._cache_set(key, result.model_dump())
+        return result
+
+    async def _model_image_result(
+        self, image_bytes: bytes, image_digest: Optional[str]
+    ) -> ModerationResult:
+        if image_digest is None:
+            image_digest = hashlib.sha256(image_bytes).hexdigest()
+        key = make_cache_key("moderation-image", self.model, image_digest)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return ModerationResult(**cached)
+
+        try:
+            with stage("moderation_model"):
+                result = await self.claude.moderate_image(image_bytes)
+        except Exception as e:
+            logger.warning("Image moderation failed, sending to review", extra={"error": repr(e)})
+            FALLBACKS.inc(call="moderation_image")
+            return self._review([], "Model unavailable", tier="fallback")
+        await self._cache_set(key, result.model_dump())
+        return result
+
+    async def _moderate_batch(self, items: List[_TextItem]) -> List[Optional[ModerationResult]]:
+        return await self.claude.moderate_texts([(item.context, item.content) for item in items])
+
+    def _review(self, flags: List[str], reason: str, tier: str) -> ModerationResult:
+        return ModerationResult(
+            safe=False, score=0.5, flags=flags, action="review", reason=reason, tier=tier
+        )
+
+    async def _cache_get(self, key: str) -> Optional[dict]:
+        if self.cache is None:
+            return None
+        return await self.cache.get(key)
+
+    async def _cache_set(self, key: str, value: dict) -> None:
+        if self.cache is not None:
+            await self.cache.set(key, value)
@@ -0,0 +1,176 @@
+"""
+Near-duplicate lookup for inspiration images.
+
+The result cache is keyed by the exact image bytes, so the same meme or
+wallpaper re-saved, resized or recompressed by another user misses it. This
+index maps the perceptual signature (dHash plus mean color) of every analyzed
+image to the image's SHA-256. An upload within a few hash bits and a similar
+mean color of a stored image reuses that image's cached analysis instead of
+making a new vision call.
+
+Entries can be appended to a file so the index survives restarts; every
+worker appends its own entries and loads the whole file, in the background,
+when it starts.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from services.phash import HashIndex
+
+logger = logging.getLogger(__name__)
+
+Signature = Tuple[int, Tuple[int, int, int]]
+
+# hash, mean color, image SHA-256
+_RECORD = struct.Struct("<Q3s32s")
+
+# Largest per-channel difference in mean color for two images to match
+MAX_COLOR_DISTANCE = 24
+
+# Matches checked against the result cache per lookup
+MAX_CANDIDATES = 8
+
+
+class NearDuplicateIndex:
+    """Perceptual signatures of analyzed images, searchable by Hamming distance."""
+
+    def __init__(
+        self,
+        max_distance: int = 5,
+        max_entries: int = 1_000_000,
+        path: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_distance: Most differing hash bits for two images to match
+            max_entries: Capacity; once full, new images are not added
+            path: Optional append-only file persisting entries across restarts
+        """
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.path = path
+        self.lookups = 0
+        self.matches = 0
+        self._hashes = HashIndex()
+        self._colors = bytearray()
+        self._digests = bytearray()
+        self._file = open(path, "ab", buffering=0) if path else None
+        self._loading: Optional[list] = None
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def candidates(self, signature: Signature, limit: int = MAX_CANDIDATES) -> List[str]:
+        """
+        Find previously added near-identical images.
+
+        The index outlives the result cache, so the closest image's analysis
+        may be gone while a farther one's is still cached; callers try the
+        candidates in order.
+
+        Args:
+            signature: (hash, mean color) from ``image_signature``
+            limit: Most candidates to return
+
+        Returns:
+            Hex SHA-256 digests of matching images, closest first, without repeats
+        """
+        value, color = signature
+        self.lookups += 1
+        found: List[str] = []
+        for _, entry in self._hashes.search(value, self.max_distance):
+            stored = self._colors[3 * entry:3 * entry + 3]
+            if max(abs(a - b) for a, b in zip(stored, color)) > MAX_COLOR_DISTANCE:
+                continue
+            digest = self._digests[32 * entry:32 * entry + 32].hex()
+            if digest not in found:
+                found.append(digest)
+                if len(found) >= limit:
+                    break
+        if found:
+            self.matches += 1
+        return found
+
+    async def add(self, signature: Signature, image_digest: str) -> bool:
+        """
+        Remember an analyzed image.
+
+        Args:
+            signature: (hash, mean color) from ``image_signature``
+            image_digest: Hex SHA-256 of the image bytes
+
+        Returns:
+            False if the index is full and the image was not added
+        """
+        if len(self) >= self.max_entries:
+            return False
+        value, color = signature
+        digest = bytes.fromhex(image_digest)
+        self._append(value, bytes(color), digest)
+        if self._loading is not None:
+            self._loading.append((value, bytes(color), digest))
+        if self._file is not None:
+            record = _RECORD.pack(value, bytes(color), digest)
+            await asyncio.to_thread(self._file.write, record)
+        return True
+
+    async def load(self) -> None:
+        """Read the entries persisted in ``path``, off the event loop."""
+        if not self.path:
+            return
+        self._loading = []
+        try:
+            loaded = await asyncio.to_thread(self._read, self.path)
+        except OSError as e:
+            logger.warning("Could not load near-duplicate index", extra={"error": repr(e)})
+            return
+        finally:
+            added, self._loading = self._loading, None
+        # Keep what was added meanwhile (the file read may have missed it)
+        self._hashes, self._colors, self._digests = loaded
+        for value, color, digest in added:
+            self._append(value, color, digest)
+        logger.info("Near-duplicate index loaded", extra={"entries": len(self)})
+
+    def stats(self) -> Dict[str, object]:
+        """Index size and lookup counters since start."""
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+    def close(self) -> None:
+        """Close the persistence file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, value: int, color: bytes, digest: bytes) -> None:
+        self._hashes.add(value)
+        self._colors += color
+        self._digests += digest
+
+    def _read(self, path: str) -> Tuple[HashIndex, bytearray, bytearray]:
+        """Build index structures from the file, keeping the newest entries."""
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            records = f.tell() // _RECORD.size  # ignore a torn final record
+            skip = max(0, records - self.max_entries)
+            f.seek(skip * _RECORD.size)
+            data = f.read((records - skip) * _RECORD.size)
+
+        hashes = HashIndex()
+        colors = bytearray()
+        digests = bytearray()
+        for value, color, digest in _RECORD.iter_unpack(data):
+            hashes.add(value)
+            colors += color
+            digests += digest
+        return hashes, colors, digests
@@ -0,0 +1,107 @@
+"""
+Local color palette extraction.
+
+Images are decoded at reduced size and quantized with Pillow's median-cut
+quantizer (implemented in C), so a palette takes milliseconds and needs no
+model call. Used by ``/design/palette``, to fill in colors the vision model
+left out, and as the palette of the fallback analysis when upstream fails.
+"""
+
+import asyncio
+import io
+from dataclasses import dataclass
+from typing import List
+
+from services.image_processing import ImageProcessingError, load_pillow
+
+# Swatches closer than this (squared RGB distance) are merged into one
+_MERGE_DISTANCE = 24 ** 2
+
+# Swatches covering less of the image than this are edge/anti-aliasing noise
+_MIN_PROPORTION = 0.01
+
+
+@dataclass(frozen=True)
+class Swatch:
+    """One palette color and the share of the image it covers."""
+    color: str
+    proportion: float
+
+
+def extract_palette(
+    image_bytes: bytes,
+    max_colors: int = 8,
+    sample_edge: int = 128,
+) -> List[Swatch]:
+    """
+    Quantize an image to its dominant colors.
+
+    Fully or mostly transparent pixels are ignored, near-identical colors are
+    merged and colors covering under 1% of the image are dropped. Animated
+    images use their first frame.
+
+    Args:
+        image_bytes: Encoded image data
+        max_colors: Maximum number of swatches to return
+        sample_edge: Long edge, in pixels, the image is reduced to first
+
+    Returns:
+        Swatches ordered from most to least prominent
+
+    Raises:
+        ImageProcessingError: If the image cannot be decoded
+    """
+    Image = load_pillow()
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.draft("RGB", (sample_edge, sample_edge))
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageProcessingError(f"Unsupported or corrupt image: {e}") from e
+
+    image.thumbnail((sample_edge, sample_edge), Image.Resampling.BOX)
+    mask = None
+    if has_alpha:
+        mask = image.getchannel("A").point(lambda alpha: 255 if alpha >= 128 else 0)
+        image = image.convert("RGB")
+
+    # Over-quantize slightly so merging near-duplicates still leaves max_colors
+    quantized = image.quantize(colors=min(256, max_colors * 2), method=Image.Quantize.MEDIANCUT)
+    counts = quantized.histogram(mask=mask)
+    palette = quantized.getpalette() or []
+
+    ranked = sorted(
+        ((count, tuple(palette[3 * i:3 * i + 3])) for i, count in enumerate(counts) if count),
+        reverse=True,
+    )
+    total = sum(count for count, _ in ranked)
+    if not total:
+        return []
+
+    merged: List[List] = []  # [count, rgb]
+    for count, rgb in ranked:
+        for entry in merged:
+            if sum((a - b) ** 2 for a, b in zip(entry[1], rgb)) < _MERGE_DISTANCE:
+                entry[0] += count
+                break
+        else:
+            merged.append([count, rgb])
+    merged.sort(key=lambda entry: entry[0], reverse=True)
+
+    return [
+        Swatch(color="#{:02X}{:02X}{:02X}".format(*rgb), proportion=round(count / total, 4))
+        for rank, (count, rgb) in enumerate(merged[:max_colors])
+        if rank == 0 or count / total >= _MIN_PROPORTION
+    ]
+
+
+async def extract_palette_async(
+    image_bytes: bytes,
+    max_colors: int = 8,
+    sample_edge: int = 128,
+) -> List[Swatch]:
+    """Run ``extract_palette`` in a worker thread so decoding never blocks the loop."""
+    return await asyncio.to_thread(extract_palette, image_bytes, max_colors, sample_edge)
@@ -0,0 +1,222 @@
+"""
+Process-wide service registry.
+
+Long-lived resources (HTTP connection pool, Claude client, moderation lists)
+are created once in the application lifespan and shared by every request
+handled by the worker.
+The heavy part (importing ``httpx``, the Anthropic SDK and Pillow, building
+the client) runs as a background warm-up so the worker starts answering
+health probes immediately; API requests wait for it via ``ready()``.
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import TYPE_CHECKING, Optional
+
+from config import Settings
+from services.cache import ResultCache
+from services.claude import ClaudeService, create_http_client
+from services.limiter import AdaptiveLimiter
+from services.moderation import ModerationService
+from services.near_duplicates import NearDuplicateIndex
+from services import metrics
+from services.retry import RetryPolicy
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Imported off the event loop during warm-up instead of at module import
+WARM_UP_MODULES = ("httpx", "anthropic", "PIL.Image", "PIL.ImageOps")
+
+
+def preload_modules(names=WARM_UP_MODULES) -> None:
+    """Import modules so first use does not pay for it."""
+    for name in names:
+        importlib.import_module(name)
+
+
+class ServiceRegistry:
+    """Owns the lifecycle of shared services for one worker process."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        claude: Optional[ClaudeService] = None,
+        http_client: Optional["httpx.AsyncClient"] = None,
+    ):
+        """
+        Args:
+            settings: Parsed service configuration
+            claude: Optional pre-built ClaudeService (e.g. a stub in tests)
+            http_client: Optional pre-built HTTP client for upstream calls
+        """
+        self.settings = settings
+        self.http_client = http_client
+        self.claude = claude
+        self.cache: Optional[ResultCache] = None
+        self.moderation: Optional[ModerationService] = None
+        self.near_duplicates: Optional[NearDuplicateIndex] = None
+        self.limiter = AdaptiveLimiter(
+            max_limit=settings.upstream_max_in_flight,
+            min_limit=settings.upstream_min_in_flight,
+            max_queue=settings.upstream_queue_size,
+            queue_timeout=settings.upstream_queue_timeout,
+        )
+        self._owns_http_client = http_client is None
+        self._owns_claude = claude is None
+        self.shared_metrics = (
+            metrics.MultiprocessMetrics(settings.metrics_dir) if settings.metrics_dir else None
+        )
+        self._warm_up: Optional[asyncio.Task] = None
+        self._near_duplicates_load: Optional[asyncio.Task] = None
+        self._metrics_publisher: Optional[asyncio.Task] = None
+
+    @property
+    def is_warm(self) -> bool:
+        """Whether the background warm-up has finished successfully."""
+        return (
+            self._warm_up is not None
+            and self._warm_up.done()
+            and not self._warm_up.cancelled()
+            and self._warm_up.exception() is None
+        )
+
+    async def startup(self) -> None:
+        """
+        Create cheap shared resources and start the background warm-up.
+
+        Raises:
+            ValueError: If no API key is configured outside mock mode
+        """
+        # Fail fast on bad config rather than inside the background task
+        settings = self.settings
+        if self._owns_claude and not (settings.anthropic_api_key or settings.enable_mock_responses):
+            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+
+        if self.cache is None:
+            self.cache = ResultCache(
+                max_entries=settings.cache_max_entries,
+                ttl_seconds=settings.cache_ttl_seconds,
+                disk_path=settings.cache_disk_path or None,
+                disk_max_entries=settings.cache_disk_max_entries,
+            )
+        if settings.near_duplicate_reuse and self.near_duplicates is None:
+            self.near_duplicates = NearDuplicateIndex(
+                max_distance=settings.near_duplicate_distance,
+                max_entries=settings.near_duplicate_max_entries,
+                path=settings.near_duplicate_path or None,
+            )
+            # A large index takes seconds to load; serve without it meanwhile
+            self._near_duplicates_load = asyncio.create_task(self.near_duplicates.load())
+        self._warm_up = asyncio.create_task(self._warm_up_services())
+        self._bind_metrics()
+        if self.shared_metrics is not None and self._metrics_publisher is None:
+            self._metrics_publisher = asyncio.create_task(self._publish_metrics())
+
+    async def ready(self) -> None:
+        """
+        Wait for the warm-up to finish.
+
+        Raises:
+            Exception: Whatever made the warm-up fail
+        """
+        if self._warm_up is not None:
+            await asyncio.shield(self._warm_up)
+
+    async def _warm_up_services(self) -> None:
+        """
+        Import heavy modules in a thread, then build the HTTP pool and Claude
+        client, and load the moderation lists in a thread.
+        """
+        started = time.perf_counter()
+        await asyncio.to_thread(preload_modules)
+        if self._owns_http_client:
+            self.http_client = create_http_client(self.settings)
+        if self._owns_claude:
+            self.claude = ClaudeService(
+                self.settings,
+                http_client=self.http_client,
+                cache=self.cache,
+                limiter=self.limiter,
+                retry_policy=RetryPolicy(
+                    max_attempts=self.settings.upstream_max_attempts,
+                    base_delay=self.settings.upstream_retry_base_delay,
+                    max_delay=self.settings.upstream_retry_max_delay,
+                    deadline=self.settings.upstream_deadline,
+                    hedge=self.settings.upstream_hedging,
+                    hedge_min_delay=self.settings.upstream_hedge_min_delay,
+                ),
+                near_duplicates=self.near_duplicates,
+            )
+        self.moderation = await asyncio.to_thread(
+            ModerationService.load, self.settings, self.claude, self.cache
+        )
+
+        logger.info(
+            "Services warmed up",
+            extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)},
+        )
+
+    async def shutdown(self) -> None:
+        """Drain in-flight upstream calls, then release shared resources."""
+        if self._warm_up is not None:
+            await asyncio.gather(self._warm_up, return_exceptions=True)
+        if self._near_duplicates_load is not None:
+            self._near_duplicates_load.cancel()
+            await asyncio.gather(self._near_duplicates_load, return_exceptions=True)
+        if self.moderation is not None:
+            await self.moderation.close()
+        # Requests have finished by now, but detached calls (hedges, batch
+        # items) may still hold the connection pool
+        if not await self.limiter.drain(self.settings.shutdown_grace_seconds):
+            logger.warning(
+                "Shutting down with upstream calls in flight",
+                extra={"in_flight": self.limiter.in_flight},
+            )
+        if self._owns_http_client and self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+        if self._owns_claude:
+            self.claude = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.near_duplicates is not None:
+            self.near_duplicates.close()
+            self.near_duplicates = None
+        if self._metrics_publisher is not None:
+            self._metrics_publisher.cancel()
+            await asyncio.gather(self._metrics_publisher, return_exceptions=True)
+            self._metrics_publisher = None
+            # Final counts stay in the totals; this worker's gauges leave them
+            await asyncio.to_thread(
+                self.shared_metrics.write, metrics.REGISTRY.snapshot(gauges=False)
+            )
+
+    async def _publish_metrics(self) -> None:
+        """Write this worker's metrics for the others to read, periodically."""
+        while True:
+            await asyncio.sleep(self.settings.metrics_publish_interval)
+            try:
+                # Snapshot on the loop so values are not read mid-update
+                await asyncio.to_thread(self.shared_metrics.write, metrics.REGISTRY.snapshot())
+            except OSError as e:
+                logger.warning("Could not publish metrics", extra={"error": repr(e)})
+
+    def _bind_metrics(self) -> None:
+        """Expose limiter, cache and prompt-cache state as scrape-time gauges."""
+        limiter = self.limiter
+        metrics.UPSTREAM_IN_FLIGHT.set_function(lambda: limiter.in_flight)
+        metrics.UPSTREAM_LIMIT.set_function(lambda: limiter.limit)
+
+        cache = self.cache
+        metrics.CACHE_HIT_RATIO.set_function(lambda: cache.stats()["hit_ratio"])
+
+        # The Claude service only exists once warm-up has finished
+        metrics.PROMPT_CACHE_READ_RATIO.set_function(
+            lambda: self.claude.prompt_cache_stats()["read_ratio"] if self.claude else 0.0
+        )
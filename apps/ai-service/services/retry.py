@@ -0,0 +1,203 @@
+"""
+Retry policy for upstream model calls.
+
+Transient failures (timeouts, connection errors, 429 and 5xx) are retried with
+full-jitter exponential backoff inside a per-request deadline. Permanent
+failures (other 4xx, unparseable responses) fail immediately. Optionally, a
+hedged second attempt is started when the first one runs longer than the
+observed p95 latency of the same kind of call, and whichever finishes first
+wins.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from services.limiter import UpstreamOverloaded
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry and hedging configuration."""
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    deadline: float = 60.0
+    hedge: bool = False
+    hedge_min_delay: float = 2.0
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether an upstream error is worth another attempt."""
+    if isinstance(exc, UpstreamOverloaded):
+        return False  # our own admission control; retrying would defeat it
+    # Deferred so importing this module does not load the SDK
+    from anthropic import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(exc, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def _retry_after_hint(exc: BaseException) -> Optional[float]:
+    """Seconds from an upstream Retry-After header, if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies for hedge timing."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency at quantile ``q``, or None until enough samples exist."""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RetryingCaller:
+    """
+    Runs upstream attempts under a RetryPolicy.
+
+    Latencies are tracked per call label: a sub-second moderation call and a
+    20-second CSS generation have nothing in common, and a shared p95 would
+    hedge nearly every slow call.
+    """
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.retries = 0
+        self.hedges = 0
+
+    def tracker(self, label: str) -> LatencyTracker:
+        """Latency window for one kind of call, created on first use."""
+        tracker = self.trackers.get(label)
+        if tracker is None:
+            tracker = self.trackers[label] = LatencyTracker()
+        return tracker
+
+    def next_delay(self, exc: BaseException, attempt: int, deadline_at: float) -> Optional[float]:
+        """
+        Backoff before the next attempt, or None if the call should give up.
+
+        Args:
+            exc: Error raised by the attempt that just failed
+            attempt: Number of attempts made so far
+            deadline_at: ``time.monotonic()`` value by which the call must finish
+
+        Returns:
+            Seconds to sleep before retrying, or None to stop
+        """
+        if attempt >= self.policy.max_attempts or not is_retryable(exc):
+            return None
+        ceiling = min(self.policy.max_delay, self.policy.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        hint = _retry_after_hint(exc)
+        if hint is not None:
+            delay = max(delay, min(hint, self.policy.max_delay))
+        if time.monotonic() + delay >= deadline_at:
+            return None
+        self.retries += 1
+        return delay
+
+    async def call(self, attempt_fn: Callable[[], Awaitable[T]], label: str = "default") -> T:
+        """
+        Call ``attempt_fn`` until it succeeds, fails permanently or the deadline passes.
+
+        Args:
+            attempt_fn: Makes one upstream attempt
+            label: Kind of call (vision, css, ...); hedge timing uses its latencies
+
+        Returns:
+            The first successful result
+
+        Raises:
+            The last attempt's error, or TimeoutError past the deadline
+        """
+        tracker = self.tracker(label)
+        deadline_at = time.monotonic() + self.policy.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with asyncio.timeout(max(0.0, deadline_at - time.monotonic())):
+                    if self.policy.hedge:
+                        return await self._hedged(attempt_fn, tracker)
+                    return await self._timed(attempt_fn, tracker)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retry/hedge counters and observed latency percentiles per call label."""
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "latency": {
+                label: {
+                    "p50_seconds": tracker.percentile(0.5),
+                    "p95_seconds": tracker.percentile(0.95),
+                }
+                for label, tracker in sorted(self.trackers.items())
+            },
+        }
+
+    async def _timed(self, attempt_fn: Callable[[], Awaitable[T]], tracker: LatencyTracker) -> T:
+        started = time.monotonic()
+        result = await attempt_fn()
+        tracker.record(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, attempt_fn: Callable[[], Awaitable[T]], tracker: LatencyTracker) -> T:
+        """Start a second attempt once the first exceeds this label's p95; first success wins."""
+        p95 = tracker.percentile(0.95)
+        if p95 is None:
+            return await self._timed(attempt_fn, tracker)
+
+        primary = asyncio.create_task(self._timed(attempt_fn, tracker))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=max(p95, self.policy.hedge_min_delay))
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.create_task(self._timed(attempt_fn, tracker)))
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    # Prefer the primary's error; a rejected hedge is not informative
+                    if error is None or task is primary:
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
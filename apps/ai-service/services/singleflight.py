@@ -0,0 +1,72 @@
+"""
+In-flight request coalescing ("single flight").
+
+Identical concurrent requests share one upstream call. The first caller for a
+key starts the work as a task; callers arriving while it runs await the same
+task and receive its result (or exception). The task is not cancelled when a
+caller disconnects, so its result still reaches the other callers and the
+result cache. Keys are only held while the call is in flight; completed
+results are the result cache's job.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from services.metrics import COALESCED
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Per-process registry of in-flight calls keyed by request cache key."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], call: str = "") -> T:
+        """
+        Run ``fn`` once for all concurrent callers with the same key.
+
+        Args:
+            key: Request key (the result cache key)
+            fn: Coroutine function doing the work; only the first caller's runs
+            call: Metric label for the kind of call
+
+        Returns:
+            Result of the shared call
+        """
+        pending = self.join(key, call)
+        if pending is not None:
+            return await pending
+
+        task = asyncio.create_task(fn())
+        self._calls[key] = task
+        self.started += 1
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def join(self, key: str, call: str = "") -> Optional[Awaitable[Any]]:
+        """
+        Join the call in flight for ``key``, if there is one.
+
+        Returns:
+            Awaitable for the shared result, or None if nothing is in flight
+        """
+        task = self._calls.get(key)
+        if task is None:
+            return None
+        self.joined += 1
+        COALESCED.inc(call=call)
+        return asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """Calls in flight, calls started and callers that joined one."""
+        return {"in_flight": len(self._calls), "started": self.started, "joined": self.joined}
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here if every caller went away
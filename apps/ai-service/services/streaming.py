@@ -0,0 +1,202 @@
+"""
+Incremental parsing of streamed model output.
+
+``ClaudeService._clean_css`` and ``_parse_explanation_and_css`` work on a
+complete response. ``CSSStreamParser`` applies the same rules to text as it
+arrives: it splits an optional ``EXPLANATION:`` section from the ``CSS:``
+section and strips markdown code fences, so clients can render a live preview.
+
+CSS is held back until a top-level rule is complete and then sent through the
+same sanitizer as the final stylesheet, so a live preview never shows a rule
+the sanitizer removes. Joined, the CSS deltas equal the final CSS.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from services.css_parser import complete_rules_end, sanitize_css
+
+EXPLANATION_MARKER = "EXPLANATION:"
+CSS_MARKER = "CSS:"
+FENCE = "```"
+
+
+@dataclass
+class StreamEvent:
+    """One event emitted while streaming a design."""
+    type: str  # "explanation" | "css" | "done" | "error"
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+def extract_css(text: str) -> str:
+    """
+    CSS section of a complete response, by the rules ``CSSStreamParser`` uses.
+
+    If a code fence comes before the first ``{``, the CSS is the fenced block;
+    otherwise the text is raw CSS up to the first fence, if any.
+
+    Args:
+        text: Model output after any ``CSS:`` marker
+
+    Returns:
+        Unsanitized CSS text
+    """
+    fence = text.find(FENCE)
+    brace = text.find("{")
+    if fence >= 0 and (brace < 0 or fence < brace):
+        newline = text.find("\n", fence)
+        if newline < 0:
+            return ""
+        text = text[newline + 1:]
+    end = text.find(FENCE)
+    return text if end < 0 else text[:end]
+
+
+def _held_back(buffer: str, marker: str) -> int:
+    """Length of the buffer suffix that could be the start of ``marker``."""
+    for size in range(min(len(marker) - 1, len(buffer)), 0, -1):
+        if marker.startswith(buffer[-size:]):
+            return size
+    return 0
+
+
+class CSSStreamParser:
+    """
+    Streaming counterpart of the explanation/CSS parsers.
+
+    Feed text chunks with ``feed``; each call returns the explanation and CSS
+    deltas that are safe to emit so far. CSS deltas are whole sanitized rules.
+    Call ``finish`` at end of stream to flush anything still held back.
+    """
+
+    def __init__(self, expect_explanation: bool = False):
+        """
+        Args:
+            expect_explanation: Whether the response may start with an
+                ``EXPLANATION:`` section followed by ``CSS:``
+        """
+        self._buffer = ""
+        self._state = "start" if expect_explanation else "css_start"
+        self._pending_css = ""  # extracted CSS not yet forming a complete rule
+        self.explanation = ""
+        self.css = ""
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """
+        Consume a chunk of model output.
+
+        Args:
+            chunk: Next piece of streamed text
+
+        Returns:
+            Explanation/CSS delta events ready to send
+        """
+        self._buffer += chunk
+        events: List[StreamEvent] = []
+
+        while True:
+            before = (self._state, len(self._buffer))
+            handler = getattr(self, f"_on_{self._state}")
+            handler(events)
+            if (self._state, len(self._buffer)) == before:
+                return events
+
+    def finish(self) -> List[StreamEvent]:
+        """Flush held-back text at end of stream."""
+        events: List[StreamEvent] = []
+        if self._state == "explanation":
+            # No CSS marker ever arrived; the final batch parse decides
+            self._emit_explanation(events, self._buffer)
+            self._buffer = ""
+        if self._state == "start":
+            self._state = "css_start"
+        if self._state == "css_start":
+            self._emit_css(events, extract_css(self._buffer))
+        elif self._state in ("css_raw", "css_fenced"):
+            self._emit_css(events, self._buffer)
+        # An unclosed final rule is sanitized as is, as the batch parser would
+        self._flush_css(events, len(self._pending_css))
+        self._buffer = ""
+        self._state = "closed"
+        return events
+
+    # State handlers - each consumes what it can from the buffer
+
+    def _on_start(self, events: List[StreamEvent]) -> None:
+        stripped = self._buffer.lstrip()
+        if len(stripped) < len(EXPLANATION_MARKER):
+            if not EXPLANATION_MARKER.startswith(stripped):
+                self._state = "css_start"
+            return
+        if stripped.startswith(EXPLANATION_MARKER):
+            self._buffer = stripped[len(EXPLANATION_MARKER):]
+            self._state = "explanation"
+        else:
+            self._state = "css_start"
+
+    def _on_explanation(self, events: List[StreamEvent]) -> None:
+        index = self._buffer.find(CSS_MARKER)
+        if index >= 0:
+            text, self._buffer = self._buffer[:index], self._buffer[index + len(CSS_MARKER):]
+            self._emit_explanation(events, text)
+            self._state = "css_start"
+            return
+        keep = _held_back(self._buffer, CSS_MARKER)
+        text = self._buffer[: len(self._buffer) - keep]
+        self._buffer = self._buffer[len(text):]
+        self._emit_explanation(events, text)
+
+    def _on_css_start(self, events: List[StreamEvent]) -> None:
+        # Decide between fenced and raw CSS from whichever comes first
+        fence = self._buffer.find(FENCE)
+        brace = self._buffer.find("{")
+        if fence >= 0 and (brace < 0 or fence < brace):
+            newline = self._buffer.find("\n", fence)
+            if newline < 0:
+                return  # wait for the rest of the fence line (```css)
+            self._buffer = self._buffer[newline + 1:]
+            self._state = "css_fenced"
+        elif brace >= 0:
+            self._buffer = self._buffer.lstrip()
+            self._state = "css_raw"
+
+    def _on_css_raw(self, events: List[StreamEvent]) -> None:
+        self._on_css_fenced(events)
+
+    def _on_css_fenced(self, events: List[StreamEvent]) -> None:
+        index = self._buffer.find(FENCE)
+        if index >= 0:
+            self._emit_css(events, self._buffer[:index])
+            self._buffer = ""
+            self._state = "closed"
+            return
+        keep = _held_back(self._buffer, FENCE)
+        text = self._buffer[: len(self._buffer) - keep]
+        self._buffer = self._buffer[len(text):]
+        self._emit_css(events, text)
+
+    def _on_closed(self, events: List[StreamEvent]) -> None:
+        self._buffer = ""
+
+    def _emit_explanation(self, events: List[StreamEvent], text: str) -> None:
+        if not self.explanation:
+            text = text.lstrip()
+        if text:
+            self.explanation += text
+            events.append(StreamEvent("explanation", {"delta": text}))
+
+    def _emit_css(self, events: List[StreamEvent], text: str) -> None:
+        self._pending_css += text
+        self._flush_css(events, complete_rules_end(self._pending_css))
+
+    def _flush_css(self, events: List[StreamEvent], end: int) -> None:
+        """Sanitize the first ``end`` characters of pending CSS and emit the result."""
+        if not end:
+            return
+        text, self._pending_css = self._pending_css[:end], self._pending_css[end:]
+        css = sanitize_css(text).css
+        if css:
+            # Same separator the serializer puts between rules
+            delta = f"\n\n{css}" if self.css else css
+            self.css += delta
+            events.append(StreamEvent("css", {"delta": delta}))
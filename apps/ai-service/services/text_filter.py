@@ -0,0 +1,214 @@
+"""
+Local multi-pattern prefilter for text moderation.
+
+Text is normalized once (case, accents, digit and symbol substitutions,
+stretched letters) and split into words. Terms are indexed by their first
+word, so checking a text is one dict lookup per word no matter how many
+terms are loaded, and a guestbook entry takes microseconds. Matching whole
+words avoids the classic substring false positives ("class", "Scunthorpe").
+"""
+
+import csv
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Character substitutions used to dodge word filters ("fr33 m0ney")
+_LEET = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+_REPEATS = re.compile(r"(.)\1+")
+_WORD = re.compile(r"[^\W_]+")
+# Three or more letters separated by spaces or punctuation ("f r e e", "k.y.s")
+_SPACED = re.compile(r"(?<![^\W_])[^\W_](?:[\W_]{1,2}[^\W_](?![^\W_])){2,}")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+# Heuristics run on the raw text, each behind a cheap substring check
+_LINK = re.compile(r"https?://|www\.|\b[a-z0-9-]+\.(?:com|net|org|io|xyz|ru|ly|gg|me|biz|top)\b", re.IGNORECASE)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[a-z]{2,}", re.IGNORECASE)
+_DIGIT = re.compile(r"\d")
+_PHONE = re.compile(r"(?<![\d.])\+?\d(?:[\s.-]?\d){9,13}(?![\d.])")
+
+# Term actions: "reject" decides locally, "review" escalates to the model
+TERM_ACTIONS = ("reject", "review")
+
+# Built-in terms: unambiguous scams reject outright, everything that depends
+# on context (threats vs. game talk, self-harm) goes to the model. Deployments
+# add their own lists, including slurs, through MODERATION_TERMS_PATH.
+DEFAULT_TERMS: Tuple[Tuple[str, str, str], ...] = (
+    ("reject", "spam", "buy followers"),
+    ("reject", "spam", "free followers"),
+    ("reject", "spam", "cheap followers"),
+    ("reject", "spam", "crypto giveaway"),
+    ("reject", "spam", "double your bitcoin"),
+    ("reject", "spam", "verify your account"),
+    ("reject", "harassment", "kill yourself"),
+    ("reject", "harassment", "kys"),
+    ("reject", "sexual", "send nudes"),
+    ("review", "sexual", "nudes"),
+    ("review", "sexual", "onlyfans"),
+    ("review", "spam", "free money"),
+    ("review", "spam", "click here"),
+    ("review", "spam", "promo code"),
+    ("review", "spam", "dm me for"),
+    ("review", "self_harm", "kill myself"),
+    ("review", "self_harm", "end my life"),
+    ("review", "self_harm", "want to die"),
+    ("review", "self_harm", "suicide"),
+    ("review", "self_harm", "cut myself"),
+    ("review", "violence", "kill you"),
+    ("review", "violence", "shoot up"),
+    ("review", "violence", "bomb threat"),
+    ("review", "drugs", "plug for"),
+    ("review", "drugs", "selling pills"),
+    ("review", "personal_info", "my address is"),
+    ("review", "personal_info", "home address"),
+)
+
+
+@dataclass(frozen=True)
+class Term:
+    """One blocklist entry, stored under its first normalized word."""
+    text: str
+    category: str
+    action: str
+    rest: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class FilterResult:
+    """Outcome of the local prefilter for one text."""
+    action: str  # "approve", "reject" or "escalate"
+    flags: List[str]
+    matches: List[str]
+
+
+def _first_group(match: "re.Match[str]") -> str:
+    return match[1]
+
+
+def _join_spaced(match: "re.Match[str]") -> str:
+    return _SEPARATORS.sub("", match[0])
+
+
+def normalize(text: str) -> str:
+    """
+    Fold case, accents, common substitutions, spaced-out and stretched
+    letters ("F r 3 3 eee" -> "fre").
+    """
+    if not text.isascii():
+        text = "".join(
+            c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
+        )
+    text = _SPACED.sub(_join_spaced, text.casefold().translate(_LEET))
+    return _REPEATS.sub(_first_group, text)
+
+
+def words(text: str) -> List[str]:
+    """Words of normalized text."""
+    return _WORD.findall(text)
+
+
+def load_terms(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Read extra terms from a CSV file of ``action,category,term`` rows.
+
+    Blank lines and lines starting with ``#`` are ignored.
+
+    Args:
+        path: CSV file path
+
+    Returns:
+        (action, category, term) tuples
+
+    Raises:
+        ValueError: If a row is malformed or has an unknown action
+    """
+    terms = []
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.reader(line for line in f if line.strip() and not line.lstrip().startswith("#"))
+        for row in rows:
+            if len(row) != 3 or row[0].strip() not in TERM_ACTIONS:
+                raise ValueError(f"Invalid moderation term row in {path}: {row!r}")
+            terms.append(tuple(value.strip() for value in row))
+    return terms
+
+
+class TextFilter:
+    """Word-level multi-pattern matcher plus link and contact-detail heuristics."""
+
+    def __init__(
+        self,
+        terms: Iterable[Sequence[str]] = DEFAULT_TERMS,
+        max_links: int = 2,
+        approve_max_chars: int = 40,
+    ):
+        """
+        Args:
+            terms: (action, category, term) tuples
+            max_links: Texts with more links than this are escalated as possible spam
+            approve_max_chars: Longest text that may be approved locally; longer
+                texts without hits are escalated (0 escalates every text)
+        """
+        self.max_links = max_links
+        self.approve_max_chars = approve_max_chars
+        self._index: Dict[str, List[Term]] = {}
+        self.size = 0
+        for action, category, text in terms:
+            self.add(text, category, action)
+
+    def add(self, text: str, category: str, action: str) -> None:
+        """Add a term; matching is on whole normalized words."""
+        if action not in TERM_ACTIONS:
+            raise ValueError(f"Unknown term action: {action}")
+        term_words = words(normalize(text))
+        if not term_words:
+            return
+        term = Term(text=text, category=category, action=action, rest=tuple(term_words[1:]))
+        self._index.setdefault(term_words[0], []).append(term)
+        self.size += 1
+
+    def check(self, text: str) -> FilterResult:
+        """
+        Match a text against every term.
+
+        Args:
+            text: Raw user text
+
+        Returns:
+            FilterResult: ``reject`` if a reject term matched, ``approve`` for a
+            short text with no hits and no links, otherwise ``escalate``
+        """
+        hits: Dict[str, Term] = {}
+        found = words(normalize(text))
+        for i, word in enumerate(found):
+            for term in self._index.get(word, ()):
+                if not term.rest or tuple(found[i + 1:i + 1 + len(term.rest)]) == term.rest:
+                    hits[term.text] = term
+
+        flags = list(dict.fromkeys(term.category for term in hits.values()))
+        heuristic = False
+        if "." in text and len(_LINK.findall(text)) > self.max_links:
+            flags.append("spam")
+            heuristic = True
+        if ("@" in text and _EMAIL.search(text)) or (_DIGIT.search(text) and _PHONE.search(text)):
+            flags.append("personal_info")
+            heuristic = True
+
+        if any(term.action == "reject" for term in hits.values()):
+            action = "reject"
+        elif hits or heuristic or not self._clearly_safe(text):
+            action = "escalate"
+        else:
+            action = "approve"
+        return FilterResult(action=action, flags=list(dict.fromkeys(flags)), matches=list(hits))
+
+    def _clearly_safe(self, text: str) -> bool:
+        """
+        Whether a text without hits is safe to approve without the model.
+
+        A missing term proves little about a long text, so only short texts
+        without links qualify; the rest is the model's call.
+        """
+        if len(text) > self.approve_max_chars:
+            return False
+        return not ("." in text and _LINK.search(text))
@@ -0,0 +1,382 @@
+"""
+Precompiled theme templates for mock and fallback CSS.
+
+The stylesheet template is split into literal chunks and named slots once, at
+import. Every ``DesignPreferences`` axis maps to a small table of slot values
+(dark/light surfaces, contrast, neon glow strength, pixel density, animation
+level), and rendered themes are memoized per (palette, preferences), so the
+path served in mock mode and during upstream outages is a dict lookup.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+from models.design import DesignPreferences
+
+DEFAULT_PALETTE = ("#FF006E", "#8338EC", "#3A86FF")
+
+# Palettes for description-based fallbacks, picked by a stable hash of the text
+PRESET_PALETTES: Tuple[Tuple[str, str, str], ...] = (
+    ("#FF006E", "#8338EC", "#3A86FF"),  # neon cyberpunk
+    ("#FF71CE", "#01CDFE", "#05FFA1"),  # vaporwave
+    ("#F72585", "#7209B7", "#4CC9F0"),  # synthwave
+    ("#39FF14", "#0B3D0B", "#C0FF00"),  # terminal green
+    ("#FFBE0B", "#FB5607", "#FF006E"),  # arcade sunset
+    ("#00F5D4", "#9B5DE5", "#F15BB5"),  # pastel pixel
+)
+
+_SLOT = re.compile(r"\$\{(\w+)\}")
+_HEX_COLOR = re.compile(r"#(?:[0-9A-Fa-f]{6}|[0-9A-Fa-f]{3})\b")
+_TITLE_UNSAFE = re.compile(r"[^\w\s,.'&-]")
+
+# Distinct (palette, preferences) renders kept in memory
+THEME_CACHE_SIZE = 1024
+
+_THEME_TEMPLATE = """/* PixelBoxx Profile - ${title} */
+:root {
+  --primary-color: ${primary};
+  --secondary-color: ${secondary};
+  --accent-color: ${accent};
+  --glow-color: ${primary};
+  --bg-start: ${bg_start};
+  --bg-end: ${bg_end};
+  --panel-bg: ${panel_bg};
+  --text-color: ${text};
+  --border-width: ${border_width};
+  --pixel-size: ${pixel_size};
+  --glow-size: ${glow_size};
+  --animation-speed: ${animation_speed};
+}
+
+.pixelpage {
+  background: ${page_background};
+  color: var(--text-color);
+  font-family: 'Courier New', monospace;
+  padding: var(--pixel-size);
+  image-rendering: pixelated;
+}
+
+.profile-header {
+  background: linear-gradient(90deg, var(--primary-color) 0%, var(--secondary-color) 100%);
+  padding: calc(var(--pixel-size) * 4);
+  position: relative;
+  box-shadow:
+    0 0 0 var(--border-width) var(--accent-color),
+    0 var(--pixel-size) 0 var(--border-width) rgba(0, 0, 0, 0.3);
+  text-align: center;
+  text-shadow: ${header_text_shadow};${header_animation}
+}
+
+.profile-avatar {
+  border: var(--border-width) solid var(--accent-color);
+  box-shadow:
+    0 0 var(--glow-size) var(--glow-color),
+    inset 0 0 20px rgba(0, 0, 0, 0.3);
+  image-rendering: pixelated;
+  border-radius: 0;${avatar_animation}
+}
+
+.profile-bio {
+  background: var(--panel-bg);
+  border: var(--border-width) solid var(--primary-color);
+  padding: calc(var(--pixel-size) * 3);
+  margin: calc(var(--pixel-size) * 2) 0;
+  box-shadow:
+    0 0 0 2px var(--accent-color),
+    0 var(--pixel-size) var(--glow-size) rgba(0, 0, 0, 0.5);
+  line-height: 1.6;
+}
+
+.top-friends {
+  display: grid;
+  grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
+  gap: var(--pixel-size);
+  margin: calc(var(--pixel-size) * 2) 0;
+}
+
+.top-friends-item {
+  background: var(--panel-bg);
+  border: ${thin_border} solid var(--secondary-color);
+  padding: var(--pixel-size);
+  text-align: center;
+  transition: ${transition};
+}
+
+.top-friends-item:hover {
+  transform: ${hover_lift};
+  box-shadow:
+    0 0 var(--glow-size) var(--secondary-color),
+    0 var(--pixel-size) 0 var(--secondary-color);
+}
+
+.photo-gallery {
+  display: grid;
+  grid-template-columns: repeat(auto-fill, minmax(200px, 1fr));
+  gap: calc(var(--pixel-size) * 2);
+  margin: calc(var(--pixel-size) * 2) 0;
+}
+
+.photo-gallery-item {
+  border: var(--border-width) solid var(--accent-color);
+  box-shadow: 0 0 15px rgba(0, 0, 0, 0.5);
+  transition: ${transition};
+  image-rendering: pixelated;
+}
+
+.photo-gallery-item:hover {
+  transform: ${hover_zoom};
+  box-shadow: 0 0 var(--glow-size) var(--glow-color);
+}
+
+.guestbook {
+  background: var(--panel-bg);
+  border: var(--border-width) solid var(--primary-color);
+  padding: calc(var(--pixel-size) * 2);
+  margin: calc(var(--pixel-size) * 2) 0;
+}
+
+.guestbook-entry {
+  background: ${entry_bg};
+  border-left: var(--border-width) solid var(--accent-color);
+  padding: var(--pixel-size);
+  margin: var(--pixel-size) 0;
+}
+
+.music-player {
+  background: linear-gradient(135deg, var(--primary-color) 0%, var(--secondary-color) 100%);
+  border: var(--border-width) solid var(--accent-color);
+  padding: calc(var(--pixel-size) * 2);
+  text-align: center;
+  box-shadow:
+    0 0 calc(var(--glow-size) * 1.5) var(--glow-color),
+    inset 0 0 20px rgba(0, 0, 0, 0.3);
+}
+
+.widget,
+.profile-badge {
+  border: ${thin_border} solid var(--accent-color);
+  background: var(--panel-bg);
+  box-shadow: 0 0 var(--glow-size) var(--glow-color);
+}
+${extra_rules}
+@media (max-width: 768px) {
+  .pixelpage {
+    padding: calc(var(--pixel-size) / 2);
+  }
+
+  .top-friends {
+    grid-template-columns: repeat(2, 1fr);
+  }
+
+  .photo-gallery {
+    grid-template-columns: repeat(2, 1fr);
+  }
+}
+"""
+
+_KEYFRAMES = """
+@keyframes glow-pulse {
+  0%, 100% { filter: drop-shadow(0 0 calc(var(--glow-size) / 2) var(--glow-color)); }
+  50% { filter: drop-shadow(0 0 var(--glow-size) var(--glow-color)); }
+}
+
+@keyframes float {
+  0%, 100% { transform: translateY(0); }
+  50% { transform: translateY(calc(var(--pixel-size) * -1)); }
+}
+
+@media (prefers-reduced-motion: reduce) {
+  .pixelpage *,
+  .pixelpage *::before,
+  .pixelpage *::after {
+    animation: none !important;
+    transition: none !important;
+  }
+}
+"""
+
+_PIXEL_GRID = """
+.pixelpage {
+  background-image:
+    repeating-linear-gradient(0deg, rgba(255, 255, 255, 0.04) 0 1px, transparent 1px var(--pixel-size)),
+    repeating-linear-gradient(90deg, rgba(255, 255, 255, 0.04) 0 1px, transparent 1px var(--pixel-size)),
+    ${page_background};
+}
+
+.profile-header,
+.music-player {
+  box-shadow:
+    var(--pixel-size) 0 0 0 var(--accent-color),
+    calc(var(--pixel-size) * -1) 0 0 0 var(--accent-color),
+    0 var(--pixel-size) 0 0 var(--accent-color),
+    0 calc(var(--pixel-size) * -1) 0 0 var(--accent-color);
+}
+"""
+
+_FOCUS_OUTLINES = """
+.pixelpage a:focus-visible,
+.pixelpage button:focus-visible {
+  outline: var(--border-width) solid var(--text-color);
+  outline-offset: 2px;
+}
+"""
+
+# Slot values per preference axis
+_SURFACES = {
+    # dark_mode -> page gradient ends, panel and entry backgrounds, text
+    True: {"bg_start": "#0a0e27", "bg_end": "#1a1f3a", "panel_bg": "rgba(0, 0, 0, 0.6)",
+           "entry_bg": "rgba(255, 255, 255, 0.05)", "text": "#ffffff"},
+    False: {"bg_start": "#f7f3ff", "bg_end": "#e3dcff", "panel_bg": "rgba(255, 255, 255, 0.75)",
+            "entry_bg": "rgba(0, 0, 0, 0.04)", "text": "#1a1030"},
+}
+_HIGH_CONTRAST_SURFACES = {
+    True: {"bg_start": "#000000", "bg_end": "#000000", "panel_bg": "#000000",
+           "entry_bg": "#111111", "text": "#ffffff"},
+    False: {"bg_start": "#ffffff", "bg_end": "#ffffff", "panel_bg": "#ffffff",
+            "entry_bg": "#f0f0f0", "text": "#000000"},
+}
+_NEON = {
+    "low": {"glow_size": "6px", "header_text_shadow": "none"},
+    "medium": {"glow_size": "20px", "header_text_shadow": "0 0 8px var(--glow-color)"},
+    "high": {"glow_size": "32px",
+             "header_text_shadow": "0 0 8px var(--glow-color), 0 0 24px var(--glow-color)"},
+}
+_DENSITY = {
+    "minimal": {"pixel_size": "4px", "border_width": "2px", "thin_border": "1px"},
+    "normal": {"pixel_size": "8px", "border_width": "4px", "thin_border": "2px"},
+    "heavy": {"pixel_size": "12px", "border_width": "6px", "thin_border": "3px"},
+}
+_ANIMATION = {
+    "none": {"animation_speed": "0s", "transition": "none", "hover_lift": "none",
+             "hover_zoom": "none", "header_animation": "", "avatar_animation": ""},
+    "low": {"animation_speed": "0.2s", "transition": "box-shadow 0.2s ease",
+            "hover_lift": "none", "hover_zoom": "none", "header_animation": "",
+            "avatar_animation": ""},
+    "medium": {"animation_speed": "0.3s",
+               "transition": "transform 0.3s ease, box-shadow 0.3s ease",
+               "hover_lift": "translateY(-4px)", "hover_zoom": "scale(1.05)",
+               "header_animation": "",
+               "avatar_animation": "\n  animation: float 4s ease-in-out infinite;"},
+    "high": {"animation_speed": "0.2s",
+             "transition": "transform 0.2s ease, box-shadow 0.2s ease",
+             "hover_lift": "translateY(-6px)", "hover_zoom": "scale(1.08)",
+             "header_animation": "\n  animation: glow-pulse 3s ease-in-out infinite;",
+             "avatar_animation": "\n  animation: float 3s ease-in-out infinite;"},
+}
+
+
+def _compile(template: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Split a template into literal chunks and the slot names between them."""
+    parts = _SLOT.split(template)
+    return tuple(parts[0::2]), tuple(parts[1::2])
+
+
+def _render(compiled: Tuple[Tuple[str, ...], Tuple[str, ...]], values: Dict[str, str]) -> str:
+    literals, slots = compiled
+    out = [literals[0]]
+    for slot, literal in zip(slots, literals[1:]):
+        out.append(values[slot])
+        out.append(literal)
+    return "".join(out)
+
+
+_COMPILED_THEME = _compile(_THEME_TEMPLATE)
+_COMPILED_PIXEL_GRID = _compile(_PIXEL_GRID)
+
+
+def render_theme(
+    palette: Sequence[str],
+    preferences: DesignPreferences,
+    title: str = "PixelBoxx",
+) -> str:
+    """
+    Render the fallback theme for a palette and preferences.
+
+    Args:
+        palette: Hex colors, most important first; missing entries use defaults
+        preferences: User design preferences
+        title: Short label for the header comment
+
+    Returns:
+        Complete stylesheet
+    """
+    # Model-supplied palettes are untrusted; only plain hex colors reach the CSS
+    valid = tuple(color.upper() for color in palette if _HEX_COLOR.fullmatch(color))[:3]
+    colors = valid + DEFAULT_PALETTE[len(valid):]
+    return _render_theme(
+        colors,
+        _TITLE_UNSAFE.sub("", title).strip()[:80],
+        preferences.dark_mode,
+        preferences.high_contrast,
+        # Free-form values outside the tables render (and cache) as the default
+        preferences.animation_level if preferences.animation_level in _ANIMATION else "medium",
+        preferences.pixel_density if preferences.pixel_density in _DENSITY else "normal",
+        preferences.neon_intensity if preferences.neon_intensity in _NEON else "medium",
+    )
+
+
+def description_palette(text: str) -> List[str]:
+    """
+    Palette for a text description.
+
+    Hex colors named in the text are used first; otherwise a preset palette is
+    picked by a stable hash of the normalized text, so the same description
+    always gets the same theme and different descriptions get varied ones.
+    """
+    named = [color.upper() for color in _HEX_COLOR.findall(text)][:3]
+    if named:
+        return named
+    digest = hashlib.sha256(" ".join(text.casefold().split()).encode("utf-8")).digest()
+    return list(PRESET_PALETTES[digest[0] % len(PRESET_PALETTES)])
+
+
+def theme_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the rendered-theme cache, for the health endpoint."""
+    info = _render_theme.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+
+@lru_cache(maxsize=THEME_CACHE_SIZE)
+def _render_theme(
+    colors: Tuple[str, str, str],
+    title: str,
+    dark_mode: bool,
+    high_contrast: bool,
+    animation_level: str,
+    pixel_density: str,
+    neon_intensity: str,
+) -> str:
+    primary, secondary, accent = colors
+    surfaces = (_HIGH_CONTRAST_SURFACES if high_contrast else _SURFACES)[dark_mode]
+    animation = _ANIMATION[animation_level]
+    density = _DENSITY[pixel_density]
+    # Glow reduces legibility, so high contrast always uses the faintest
+    neon = _NEON["low" if high_contrast else neon_intensity]
+
+    values = {
+        "title": title,
+        "primary": primary,
+        "secondary": secondary,
+        "accent": accent,
+        **surfaces,
+        **density,
+        **neon,
+        **animation,
+        "page_background": (
+            "var(--bg-start)" if high_contrast
+            else "linear-gradient(135deg, var(--bg-start) 0%, var(--bg-end) 100%)"
+        ),
+    }
+
+    extra = []
+    if animation_level in ("medium", "high"):
+        extra.append(_KEYFRAMES)
+    if pixel_density == "heavy":
+        extra.append(_render(_COMPILED_PIXEL_GRID, values))
+    if high_contrast:
+        extra.append(_FOCUS_OUTLINES)
+    values["extra_rules"] = "".join(extra)
+
+    return _render(_COMPILED_THEME, values)
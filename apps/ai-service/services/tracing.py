@@ -0,0 +1,101 @@
+"""
+Per-request tracing.
+
+Each request gets a request ID (taken from the caller's ``X-Request-ID`` or
+generated) and a list of timing spans. Spans are recorded around pipeline
+stages and upstream calls, returned to the caller in a ``Server-Timing``
+header and written to the structured request log.
+"""
+
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from services.metrics import STAGE_DURATION
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Request ID and timing spans for one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def add_span(self, name: str, seconds: float) -> None:
+        self.spans.append((name, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Spans in ``Server-Timing`` header format (durations in ms)."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def span_summary(self) -> Dict[str, float]:
+        """Total milliseconds per span name, for logging."""
+        summary: Dict[str, float] = {}
+        for name, seconds in self.spans:
+            summary[name] = round(summary.get(name, 0.0) + seconds * 1000, 2)
+        return summary
+
+
+def resolve_request_id(incoming: Optional[str]) -> str:
+    """Use the caller's request ID if it is well-formed, else generate one."""
+    if incoming and _REQUEST_ID_PATTERN.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def start_trace(request_id: str) -> Tuple[Trace, Any]:
+    """Begin a trace for the current context; returns it and a reset token."""
+    trace = Trace(request_id)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: Any) -> None:
+    _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Record a timing span on the current trace, if any."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, time.perf_counter() - started)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a design pipeline stage as both a trace span and a stage metric."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, elapsed)
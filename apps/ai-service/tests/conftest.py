@@ -0,0 +1,74 @@
+"""
+Shared test setup.
+
+Tests import the service modules the way ``main.py`` does, from the
+ai-service directory, and run coroutines with ``asyncio.run``.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import design  # noqa: E402
+from config import Settings  # noqa: E402
+from services.claude import ClaudeService  # noqa: E402
+from services.registry import ServiceRegistry  # noqa: E402
+
+
+class StubMessages:
+    """Stands in for ``AsyncAnthropic.messages``: records requests, replies from a function."""
+
+    def __init__(self, reply, usage):
+        self.reply = reply
+        self.usage = usage
+        self.requests = []
+
+    async def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=self.reply(request))],
+            usage=SimpleNamespace(**self.usage),
+        )
+
+
+@pytest.fixture
+def stub_claude():
+    """
+    Build a ClaudeService whose client is a StubMessages.
+
+    Call it with a ``reply(request) -> str`` function, optional usage counts
+    and Settings overrides; requests land in ``service.client.messages.requests``.
+    """
+    def build(reply, usage=None, **settings):
+        claude = ClaudeService(
+            Settings(enable_mock_responses=False, anthropic_api_key="test-key", **settings)
+        )
+        claude.client = SimpleNamespace(
+            messages=StubMessages(reply, usage or {"input_tokens": 10, "output_tokens": 5})
+        )
+        return claude
+
+    return build
+
+
+@pytest.fixture
+def design_client():
+    """
+    Build a TestClient for the design API around a given ClaudeService.
+
+    The registry is seeded with the service, so no warm-up or API key is
+    needed; the app has no middleware.
+    """
+    def build(claude):
+        app = FastAPI()
+        app.include_router(design.router)
+        app.state.services = ServiceRegistry(Settings(), claude=claude)
+        return TestClient(app)
+
+    return build
@@ -0,0 +1,110 @@
+"""Tests for API key authentication as configured by ``main.py``."""
+
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import get_settings
+
+CURRENT_KEY = "current-key"
+OLD_KEY = "old-key"
+
+
+@pytest.fixture
+def main_client(monkeypatch):
+    """
+    Build a TestClient for ``main.app`` configured from the given settings.
+
+    ``main`` reads its settings at import, so it is reloaded with the
+    settings in the environment; mock mode keeps the lifespan offline.
+    """
+    clients = []
+
+    def build(api_key="", api_keys="", metrics_public=False):
+        monkeypatch.setenv("API_KEY", api_key)
+        monkeypatch.setenv("API_KEYS", api_keys)
+        monkeypatch.setenv("METRICS_PUBLIC", str(metrics_public).lower())
+        monkeypatch.setenv("ENABLE_MOCK_RESPONSES", "true")
+        get_settings.cache_clear()
+        main = importlib.reload(importlib.import_module("main"))
+        client = TestClient(main.app)
+        client.__enter__()
+        clients.append(client)
+        return client
+
+    yield build
+    for client in clients:
+        client.__exit__(None, None, None)
+    get_settings.cache_clear()
+
+
+def test_missing_key_is_rejected(main_client):
+    response = main_client(api_key=CURRENT_KEY).get("/design/health")
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid or missing API key"}
+
+
+def test_wrong_key_is_rejected(main_client):
+    client = main_client(api_key=CURRENT_KEY)
+
+    assert client.get("/design/health", headers={"X-API-Key": "wrong"}).status_code == 401
+    # A prefix of the key is not the key
+    assert client.get("/design/health", headers={"X-API-Key": "current"}).status_code == 401
+
+
+def test_current_key_is_accepted(main_client):
+    response = main_client(api_key=CURRENT_KEY).get(
+        "/design/health", headers={"X-API-Key": CURRENT_KEY}
+    )
+
+    assert response.status_code == 200
+
+
+def test_old_key_works_during_rotation_and_not_after(main_client):
+    rotating = main_client(api_key=CURRENT_KEY, api_keys=OLD_KEY)
+    assert rotating.get("/design/health", headers={"X-API-Key": OLD_KEY}).status_code == 200
+    assert rotating.get("/design/health", headers={"X-API-Key": CURRENT_KEY}).status_code == 200
+
+    rotated = main_client(api_key=CURRENT_KEY)
+    assert rotated.get("/design/health", headers={"X-API-Key": OLD_KEY}).status_code == 401
+
+
+def test_several_keys_can_come_from_api_keys_alone(main_client):
+    client = main_client(api_keys=f"{OLD_KEY}, {CURRENT_KEY}")
+
+    for key in (OLD_KEY, CURRENT_KEY):
+        assert client.get("/design/health", headers={"X-API-Key": key}).status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/", "/health", "/health/ready", "/docs", "/redoc", "/openapi.json"])
+def test_exempt_paths_need_no_key(main_client, path):
+    response = main_client(api_key=CURRENT_KEY).get(path)
+
+    assert response.status_code == 200
+
+
+def test_exempt_paths_match_exactly(main_client):
+    # Only the listed paths are open; "/health/" is not "/health"
+    assert main_client(api_key=CURRENT_KEY).get("/health/").status_code == 401
+
+
+def test_metrics_need_a_key_by_default(main_client):
+    client = main_client(api_key=CURRENT_KEY)
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"X-API-Key": CURRENT_KEY}).status_code == 200
+
+
+def test_metrics_can_be_public(main_client):
+    client = main_client(api_key=CURRENT_KEY, metrics_public=True)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "pixelboxx_http_requests_total" in response.text
+
+
+def test_no_configured_keys_disables_authentication(main_client):
+    assert main_client().get("/design/health").status_code == 200
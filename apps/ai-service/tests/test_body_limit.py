@@ -0,0 +1,59 @@
+"""Tests for the request body size limit middleware."""
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from middleware import BodySizeLimitMiddleware
+
+LIMIT = 1000
+
+
+def client():
+    app = FastAPI()
+
+    @app.post("/limited/upload")
+    @app.post("/open")
+    async def echo(request: Request):
+        return {"received": len(await request.body())}
+
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=LIMIT, path_prefixes=["/limited"])
+    return TestClient(app)
+
+
+def chunks(total, size=100):
+    for _ in range(total // size):
+        yield b"x" * size
+
+
+def test_body_within_the_limit_passes():
+    response = client().post("/limited/upload", content=b"x" * LIMIT)
+
+    assert response.status_code == 200
+    assert response.json() == {"received": LIMIT}
+
+
+def test_declared_length_over_the_limit_is_413():
+    response = client().post("/limited/upload", content=b"x" * (LIMIT + 1))
+
+    assert response.status_code == 413
+    assert response.headers["connection"] == "close"
+
+
+def test_chunked_body_is_cut_off_when_it_crosses_the_limit():
+    response = client().post("/limited/upload", content=chunks(LIMIT * 3))
+
+    assert response.status_code == 413
+
+
+def test_chunked_body_within_the_limit_passes():
+    response = client().post("/limited/upload", content=chunks(LIMIT))
+
+    assert response.status_code == 200
+    assert response.json() == {"received": LIMIT}
+
+
+def test_other_paths_are_not_limited():
+    response = client().post("/open", content=b"x" * (LIMIT * 3))
+
+    assert response.status_code == 200
+    assert response.json() == {"received": LIMIT * 3}
@@ -0,0 +1,179 @@
+"""Tests for the result cache and its SQLite tier."""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from services import cache as cache_module
+from services.cache import DISK_PURGE_INTERVAL, ResultCache, make_cache_key
+from services.metrics import CACHE_LOOKUPS
+
+
+class Clock:
+    """Settable stand-in for ``time.time``."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def disk_keys(path):
+    with sqlite3.connect(path) as conn:
+        return {key for (key,) in conn.execute("SELECT key FROM results")}
+
+
+def test_keys_are_stable_and_order_insensitive_for_dicts():
+    assert make_cache_key("css", {"a": 1, "b": 2}) == make_cache_key("css", {"b": 2, "a": 1})
+    assert make_cache_key("css", "x") != make_cache_key("description", "x")
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def scenario():
+        cache = ResultCache(max_entries=2)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")  # "b" is now the least recently used
+        await cache.set("c", 3)
+        return [await cache.get(key) for key in ("a", "b", "c")], cache.stats()
+
+    values, stats = asyncio.run(scenario())
+
+    assert values == [1, None, 3]
+    assert stats["entries"] == 2
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_lookups_are_counted_by_result(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    before = {result: CACHE_LOOKUPS.value(result=result) for result in ("hit", "disk_hit", "miss")}
+
+    async def scenario():
+        first = ResultCache(disk_path=path)
+        await first.set("a", 1)
+        await first.get("a")
+        await first.get("b")
+        first.close()
+        second = ResultCache(disk_path=path)
+        await second.get("a")
+        second.close()
+
+    asyncio.run(scenario())
+
+    assert {
+        result: CACHE_LOOKUPS.value(result=result) - count for result, count in before.items()
+    } == {"hit": 1, "disk_hit": 1, "miss": 1}
+
+
+def test_entries_expire_after_the_ttl(clock):
+    async def scenario():
+        cache = ResultCache(ttl_seconds=60)
+        await cache.set("a", 1)
+        clock.now += 59
+        fresh = await cache.get("a")
+        clock.now += 1
+        return fresh, await cache.get("a"), cache.stats()["entries"]
+
+    fresh, expired, entries = asyncio.run(scenario())
+
+    assert fresh == 1
+    assert expired is None
+    assert entries == 0
+
+
+def test_disk_hits_are_promoted_into_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+
+    async def scenario():
+        first = ResultCache(disk_path=path)
+        await first.set("a", {"css": ".pixelpage {}"})
+        first.close()
+
+        # A restarted worker starts with an empty memory tier
+        second = ResultCache(disk_path=path)
+        value = await second.get("a")
+        stats = second.stats()
+        second.close()  # the memory tier still answers without the file
+        again = await second.get("a")
+        return value, stats, again, second.stats()
+
+    value, stats, again, after = asyncio.run(scenario())
+
+    assert value == {"css": ".pixelpage {}"}
+    assert (stats["disk_hits"], stats["entries"]) == (1, 1)
+    assert again == value
+    assert after["disk_hits"] == 1
+
+
+def test_expired_disk_rows_are_not_returned(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+
+    async def scenario():
+        first = ResultCache(ttl_seconds=60, disk_path=path)
+        await first.set("a", 1)
+        first.close()
+        clock.now += 60
+        second = ResultCache(ttl_seconds=60, disk_path=path)
+        value = await second.get("a")
+        second.close()
+        return value
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_expired_disk_rows_are_purged_without_being_read(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+
+    async def scenario():
+        cache = ResultCache(max_entries=1, ttl_seconds=60, disk_path=path)
+        await cache.set("old", 1)
+        clock.now += 60
+        for i in range(DISK_PURGE_INTERVAL):
+            await cache.set(f"new-{i}", i)
+        cache.close()
+
+    asyncio.run(scenario())
+
+    keys = disk_keys(path)
+    assert "old" not in keys
+    assert len(keys) == DISK_PURGE_INTERVAL
+
+
+def test_expired_disk_rows_are_purged_on_open(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+
+    async def scenario():
+        cache = ResultCache(ttl_seconds=60, disk_path=path)
+        await cache.set("old", 1)
+        cache.close()
+        clock.now += 60
+        ResultCache(ttl_seconds=60, disk_path=path).close()
+
+    asyncio.run(scenario())
+
+    assert disk_keys(path) == set()
+
+
+def test_disk_tier_keeps_the_rows_expiring_last(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    cap = 10
+
+    async def scenario():
+        cache = ResultCache(ttl_seconds=60, disk_path=path, disk_max_entries=cap)
+        for i in range(DISK_PURGE_INTERVAL):
+            clock.now += 0.01
+            await cache.set(f"key-{i}", i)
+        cache.close()
+
+    asyncio.run(scenario())
+
+    assert disk_keys(path) == {f"key-{i}" for i in range(DISK_PURGE_INTERVAL - cap, DISK_PURGE_INTERVAL)}
@@ -0,0 +1,91 @@
+"""Tests for prompt caching in ClaudeService, against a local stub client."""
+
+import asyncio
+import json
+
+from config import Settings
+from models.design import DesignAnalysis, DesignPreferences
+from prompts.design_prompts import DESIGN_SYSTEM_PROMPT, IMAGE_ANALYSIS_PROMPT
+from prompts.moderation_prompts import MODERATION_SYSTEM_PROMPT
+from services.claude import CHARS_PER_TOKEN, prompt_cache_min_tokens
+from services.css_parser import sanitize_css
+
+CSS_REPLY = "EXPLANATION: Neon glow.\nCSS:\n```css\n.pixelpage { color: #ff71ce }\n```"
+ANALYSIS = DesignAnalysis(
+    colors=["#FF71CE", "#01CDFE"],
+    aesthetic="vaporwave",
+    mood="dreamy",
+    layout_style="centered",
+    typography_suggestions="wide sans-serif",
+    animation_ideas="floating avatar",
+)
+
+
+def test_design_calls_share_one_cached_prefix(stub_claude):
+    claude = stub_claude(lambda request: CSS_REPLY)
+
+    async def main():
+        await claude.generate_css_from_description("neon vaporwave", DesignPreferences())
+        await claude.generate_css_from_analysis(ANALYSIS, DesignPreferences())
+
+    asyncio.run(main())
+    requests = claude.client.messages.requests + [claude._image_request("image/png", "AAAA")]
+    for request in requests:
+        prefix, instructions = request["system"]
+        assert prefix == {
+            "type": "text",
+            "text": DESIGN_SYSTEM_PROMPT,
+            "cache_control": {"type": "ephemeral"},
+        }
+        assert "cache_control" not in instructions
+        # Per-request data comes after the cached prefix, never inside it
+        assert "neon vaporwave" not in json.dumps(request["system"])
+    assert requests[-1]["system"][1]["text"] == IMAGE_ANALYSIS_PROMPT
+
+
+def test_design_prefix_reaches_the_minimum_cacheable_length():
+    tokens = len(DESIGN_SYSTEM_PROMPT) // CHARS_PER_TOKEN
+    assert tokens >= prompt_cache_min_tokens(Settings().anthropic_model) == 1024
+
+
+def test_reference_stylesheet_survives_the_sanitizer():
+    reference = DESIGN_SYSTEM_PROMPT.split("REFERENCE STYLESHEET:")[1].split("\n\n", 2)[2]
+    result = sanitize_css(reference)
+    assert result.removed == []
+    assert ".profile-badge" in result.css
+
+
+def test_prefixes_below_the_minimum_get_no_breakpoint(stub_claude):
+    claude = stub_claude(lambda request: "[]")
+    request = claude._text_moderation_request([("abcd1234", (None, "hello"))])
+    assert request["system"] == [{"type": "text", "text": MODERATION_SYSTEM_PROMPT}]
+    assert prompt_cache_min_tokens("claude-haiku-4-5-20251001") == 4096
+    assert prompt_cache_min_tokens("claude-3-5-haiku-20241022") == 2048
+
+
+def test_prompt_caching_can_be_disabled(stub_claude):
+    claude = stub_claude(lambda request: CSS_REPLY, anthropic_prompt_caching=False)
+    asyncio.run(claude.generate_css_from_description("neon vaporwave", DesignPreferences()))
+    (request,) = claude.client.messages.requests
+    assert "cache_control" not in request["system"][0]
+
+
+def test_cache_read_usage_is_recorded(stub_claude):
+    usage = {
+        "input_tokens": 40,
+        "output_tokens": 200,
+        "cache_read_input_tokens": 1800,
+        "cache_creation_input_tokens": 0,
+    }
+    claude = stub_claude(lambda request: CSS_REPLY, usage)
+
+    async def main():
+        for description in ("neon vaporwave", "pastel goth"):
+            await claude.generate_css_from_description(description, DesignPreferences())
+
+    asyncio.run(main())
+    stats = claude.prompt_cache_stats()
+    assert stats["enabled"] is True
+    assert stats["cache_read_tokens"] == 3600
+    assert stats["uncached_input_tokens"] == 80
+    assert stats["read_ratio"] == round(3600 / 3680, 4)
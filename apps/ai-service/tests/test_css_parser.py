@@ -0,0 +1,143 @@
+"""Tests for the CSS parser and sanitizer."""
+
+import pytest
+
+from services.css_parser import (
+    complete_rules_end,
+    extract_colors,
+    is_allowed_selector,
+    sanitize_css,
+)
+
+
+@pytest.mark.parametrize(
+    "selector",
+    [
+        ".pixelpage",
+        ".pixelpage .profile-bio",
+        ".guestbook-entry:hover",
+        ".widget::before",
+        ".pixelpage > .top-friends",
+        ":root",
+    ],
+)
+def test_scoped_selectors_are_allowed(selector):
+    assert is_allowed_selector(selector)
+
+
+@pytest.mark.parametrize(
+    "selector",
+    [
+        "body",
+        "body .pixelpage",
+        "div.pixelpage",
+        ".not-a-profile-class",
+        "body:not(.pixelpage)",
+        "div:has(.pixelpage)",
+        ":is(.pixelpage, body)",
+        ":where(body)",
+        ".pixelpage:not(.widget)",
+        ".pixelpage ~ *",
+        ".pixelpage + div",
+        ".pixel\\page",
+    ],
+)
+def test_unscoped_selectors_are_rejected(selector):
+    assert not is_allowed_selector(selector)
+
+
+def test_sanitize_drops_unscoped_rules_and_keeps_the_rest():
+    result = sanitize_css(
+        "body { margin: 0 }\n"
+        ".pixelpage { color: #ff00ff }\n"
+        "body:not(.pixelpage) { display: none }"
+    )
+    assert ".pixelpage" in result.css
+    assert "body" not in result.css
+    assert len(result.removed) == 2
+
+
+def test_sanitize_drops_blocked_declarations():
+    result = sanitize_css(
+        ".pixelpage { position: fixed; behavior: url(x.htc); "
+        "background: url(javascript:alert(1)); color: red }"
+    )
+    assert "color: red" in result.css
+    for blocked in ("fixed", "behavior", "javascript"):
+        assert blocked not in result.css
+
+
+def test_sanitize_keeps_media_queries_with_scoped_rules():
+    result = sanitize_css("@media (max-width: 600px) { .widget { padding: 4px } body { margin: 0 } }")
+    assert "@media" in result.css and ".widget" in result.css
+    assert "body" not in result.css
+
+
+@pytest.mark.parametrize("value", ["rgb(nan, 0, 0)", "rgb(inf, 0, 0)", "hsl(inf, 50%, 50%)", "hsl(1e999, 50%, 50%)"])
+def test_non_finite_colors_are_dropped_without_raising(value):
+    result = sanitize_css(f".pixelpage {{ color: {value}; margin: 0 }}")
+    assert "color" not in result.css
+    assert "margin: 0" in result.css
+    assert extract_colors(f".pixelpage {{ color: {value} }}") == []
+
+
+def test_extract_colors_normalizes_in_order_of_use():
+    css = ".pixelpage { color: #f0f; background: rgb(0, 128, 255); border-color: hsl(120, 100%, 50%) }"
+    assert extract_colors(css) == ["#FF00FF", "#0080FF", "#00FF00"]
+
+
+def test_complete_rules_end_stops_after_the_last_closed_rule():
+    first = ".pixelpage { color: red }"
+    assert complete_rules_end(first + " .widget { color: blue") == len(first)
+    assert complete_rules_end(".pixelpage { color: red") == 0
+
+
+def test_complete_rules_end_ignores_braces_in_strings_and_comments():
+    rule = '.pixelpage::after { content: "}" }'
+    assert complete_rules_end(rule + " /* } */ .widget {") == len(rule)
+
+
+def test_complete_rules_end_waits_for_the_outer_block():
+    media = "@media print { .widget { color: red } }"
+    assert complete_rules_end(media[:-1]) == 0
+    assert complete_rules_end(media) == len(media)
+
+
+@pytest.mark.parametrize(
+    "declaration",
+    [
+        "background: \\75 rl(https://evil.example/x.png)",
+        "background: u\\rl(https://evil.example/x.png)",
+        "background: \\75\\72\\6c(javascript:alert(1))",
+        "background: e\\78pression(alert(1))",
+        "position: f\\69xed",
+        "position: FIXED",
+        "position: var(--position)",
+    ],
+)
+def test_escaped_values_are_decoded_before_checking(declaration):
+    result = sanitize_css(f".pixelpage {{ {declaration}; color: red }}")
+    assert result.css == ".pixelpage {\n  color: red;\n}"
+    assert len(result.removed) == 1
+
+
+def test_escaped_property_names_are_dropped():
+    result = sanitize_css(".pixelpage { \\62 ehavior: url(x.htc); color: red }")
+    assert "ehavior" not in result.css and "color: red" in result.css
+
+
+def test_escapes_in_harmless_values_are_kept():
+    result = sanitize_css('.pixelpage::before { content: "\\201C" }')
+    assert '"\\201C"' in result.css and result.removed == []
+
+
+def test_root_rules_only_set_custom_properties():
+    result = sanitize_css(":root { display: none; filter: blur(4px); --accent: #ff00ff }")
+    assert result.css == ":root {\n  --accent: #ff00ff;\n}"
+    assert result.removed == ["display (root)", "filter (root)"]
+
+
+def test_root_is_dropped_from_mixed_rules_that_style_elements():
+    result = sanitize_css(":root, .pixelpage { font-size: 0 }")
+    assert result.css == ".pixelpage {\n  font-size: 0;\n}"
+    assert sanitize_css(":root, .pixelpage { --accent: red }").css.startswith(":root, .pixelpage")
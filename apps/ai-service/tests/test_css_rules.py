@@ -0,0 +1,145 @@
+"""Tests for refinement rule selection and patch merging."""
+
+from services.css_parser import Stylesheet, parse_stylesheet
+from services.css_rules import merge_rules, relevant_rules, rule_key
+
+BASE = """
+:root { --accent: #ff00ff; }
+.pixelpage { background: #000; font-family: monospace; }
+.profile-header { color: #fff; animation: neon-flicker 2s infinite; }
+.profile-header-title { font-size: 2rem; }
+.music-player { border: 1px solid #0f0; animation: float 3s; }
+.guestbook-entry { padding: 4px; }
+@keyframes neon-flicker { 0% { opacity: 1; } 50% { opacity: 0.4; } }
+@keyframes float { from { transform: none; } to { transform: translateY(-4px); } }
+@media (max-width: 600px) {
+  .profile-header { font-size: 1rem; }
+  .guestbook-entry { padding: 2px; }
+}
+"""
+
+
+def rules(css):
+    return parse_stylesheet(css).rules
+
+
+def keys(nodes):
+    return [rule_key(node) for node in nodes]
+
+
+def render(nodes):
+    return Stylesheet(nodes).serialize()
+
+
+def test_rule_keys_ignore_insignificant_whitespace():
+    a, b, c, d = rules(
+        ".a > .b, .c { x: 1; } .a>.b,.c { x: 2; }"
+        " @media (max-width: 600px) {} @media (max-width:600px) {}"
+    )
+    assert rule_key(a) == rule_key(b) == ".a>.b,.c"
+    assert rule_key(c) == rule_key(d) == "@media (max-width:600px)"
+
+
+def test_feedback_about_an_area_selects_its_rules_and_page_rules():
+    selected = relevant_rules(rules(BASE), "make the header bluer")
+
+    assert keys(selected) == [
+        ":root",
+        ".pixelpage",
+        ".profile-header",
+        ".profile-header-title",
+        "@media (max-width:600px)",
+        "@keyframes neon-flicker",
+    ]
+    # Only the matching rule is kept inside the group
+    assert keys(selected[4].rules) == [".profile-header"]
+
+
+def test_keyframes_follow_the_rules_that_use_them():
+    selected = relevant_rules(rules(BASE), "change the song player border")
+
+    assert "@keyframes float" in keys(selected)
+    assert "@keyframes neon-flicker" not in keys(selected)
+
+
+def test_html_and_body_are_not_page_level_rules():
+    base = rules("html { color: red; } body { margin: 0; } .widget { color: blue; }")
+
+    assert keys(relevant_rules(base, "widget border")) == [".widget"]
+
+
+def test_unspecific_feedback_selects_every_rule():
+    base = rules(BASE)
+
+    assert relevant_rules(base, "make it more cheerful") == base
+
+
+def test_patch_replaces_a_rule_by_selector():
+    merged, changed = merge_rules(
+        rules(BASE), rules(".guestbook-entry { padding: 8px; margin: 2px; }")
+    )
+
+    assert changed == [".guestbook-entry"]
+    entry = next(rule for rule in merged if rule_key(rule) == ".guestbook-entry")
+    assert [(d.name, d.value) for d in entry.declarations] == [("padding", "8px"), ("margin", "2px")]
+    # The rule keeps its place
+    assert keys(merged) == keys(rules(BASE))
+
+
+def test_patch_appends_new_rules():
+    merged, changed = merge_rules(rules(BASE), rules(".profile-badge { color: gold; }"))
+
+    assert changed == [".profile-badge"]
+    assert keys(merged)[-1] == ".profile-badge"
+
+
+def test_empty_block_deletes_a_rule():
+    merged, changed = merge_rules(rules(BASE), rules(".music-player {}"))
+
+    assert changed == [".music-player"]
+    assert ".music-player" not in keys(merged)
+
+
+def test_deleting_a_missing_rule_changes_nothing():
+    base = rules(BASE)
+
+    merged, changed = merge_rules(base, rules(".widget {}"))
+
+    assert changed == []
+    assert render(merged) == render(base)
+
+
+def test_patch_inside_media_merges_into_the_group():
+    merged, changed = merge_rules(
+        rules(BASE),
+        rules("@media (max-width:600px) { .guestbook-entry { padding: 0; } .widget { gap: 1px; } }"),
+    )
+
+    assert changed == [
+        "@media (max-width:600px) .guestbook-entry",
+        "@media (max-width:600px) .widget",
+    ]
+    media = merged[-1]
+    assert keys(media.rules) == [".profile-header", ".guestbook-entry", ".widget"]
+    assert media.rules[1].declarations[0].value == "0"
+
+
+def test_keyframes_are_replaced_as_a_whole():
+    merged, changed = merge_rules(
+        rules(BASE),
+        rules("@keyframes neon-flicker { 0% { opacity: 0.8; } 100% { opacity: 1; } }"),
+    )
+
+    assert changed == ["@keyframes neon-flicker"]
+    keyframes = next(rule for rule in merged if rule_key(rule) == "@keyframes neon-flicker")
+    # The old 50% stop does not survive
+    assert keys(keyframes.rules) == ["0%", "100%"]
+
+
+def test_merge_does_not_modify_its_inputs():
+    base = rules(BASE)
+    before = render(base)
+
+    merge_rules(base, rules("@media (max-width: 600px) { .profile-header { color: red; } }"))
+
+    assert render(base) == before
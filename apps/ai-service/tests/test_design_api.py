@@ -0,0 +1,123 @@
+"""Tests for the design API endpoints."""
+
+import io
+
+import pytest
+from PIL import Image
+
+from config import Settings
+from services.claude import ClaudeService
+
+CURRENT_CSS = """
+.pixelpage { background: #000000; }
+.profile-header { color: #ffffff; }
+.guestbook-entry { padding: 4px; }
+@media (max-width: 600px) { .profile-header { font-size: 1rem; } }
+"""
+
+# Valid PNG signature, undecodable body
+CORRUPT_PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def png_bytes(color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_refine_merges_the_patch_into_the_stylesheet(stub_claude, design_client):
+    claude = stub_claude(
+        lambda request: (
+            "EXPLANATION: Made the header blue.\n"
+            "CSS:\n.profile-header { color: #0000ff; }\n.guestbook-entry {}"
+        )
+    )
+
+    response = design_client(claude).post(
+        "/design/refine",
+        json={"current_css": CURRENT_CSS, "feedback": "make the header bluer"},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["explanation"] == "Made the header blue."
+    assert body["changed_rules"] == [".profile-header", ".guestbook-entry"]
+    assert "#0000ff" in body["css"] and "#ffffff" not in body["css"]
+    assert ".guestbook-entry" not in body["css"]
+    assert "@media (max-width: 600px)" in body["css"]
+    assert body["colors"] == ["#000000", "#0000FF"]
+
+    # Only the rules about the header (and the page) were sent
+    prompt = claude.client.messages.requests[0]["messages"][0]["content"]
+    assert ".profile-header" in prompt
+    assert ".guestbook-entry" not in prompt
+
+
+def test_refine_sanitizes_the_merged_stylesheet(stub_claude, design_client):
+    claude = stub_claude(
+        lambda request: "EXPLANATION: Pinned it.\nCSS:\n.profile-header { position: fixed; color: red; }"
+    )
+
+    response = design_client(claude).post(
+        "/design/refine",
+        json={"current_css": CURRENT_CSS, "feedback": "pin the header"},
+    )
+
+    assert response.status_code == 200
+    assert "fixed" not in response.json()["css"]
+    assert "color: red" in response.json()["css"]
+
+
+def test_refine_returns_css_unchanged_in_mock_mode(design_client):
+    claude = ClaudeService(Settings(enable_mock_responses=True))
+
+    response = design_client(claude).post(
+        "/design/refine",
+        json={"current_css": CURRENT_CSS, "feedback": "make the header bluer"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["css"] == CURRENT_CSS
+    assert response.json()["changed_rules"] == []
+
+
+def test_refine_rejects_empty_css_and_short_feedback(design_client):
+    client = design_client(ClaudeService(Settings(enable_mock_responses=True)))
+
+    empty_css = client.post("/design/refine", json={"current_css": "  ", "feedback": "bluer"})
+    short_feedback = client.post("/design/refine", json={"current_css": CURRENT_CSS, "feedback": "x"})
+
+    assert empty_css.status_code == 400
+    assert short_feedback.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/design/from-image", "/design/from-image/stream"])
+def test_corrupt_image_is_rejected_in_mock_mode(design_client, path):
+    client = design_client(ClaudeService(Settings(enable_mock_responses=True)))
+
+    response = client.post(path, files={"image": ("corrupt.png", CORRUPT_PNG, "image/png")})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/design/from-image", "/design/from-image/stream"])
+def test_corrupt_image_is_rejected_with_a_client(stub_claude, design_client, path):
+    claude = stub_claude(lambda request: "vision should not be called")
+
+    response = design_client(claude).post(
+        path, files={"image": ("corrupt.png", CORRUPT_PNG, "image/png")}
+    )
+
+    assert response.status_code == 400
+    assert claude.client.messages.requests == []
+
+
+def test_mock_mode_designs_from_the_image_palette(design_client):
+    client = design_client(ClaudeService(Settings(enable_mock_responses=True)))
+
+    response = client.post(
+        "/design/from-image", files={"image": ("red.png", png_bytes(), "image/png")}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["colors"][0] == "#C81E1E"
@@ -0,0 +1,105 @@
+"""Tests for the AIMD admission limiter."""
+
+import asyncio
+
+import pytest
+
+from services.limiter import AdaptiveLimiter, UpstreamOverloaded
+
+
+def test_overload_halves_the_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter(max_limit=16, min_limit=2, decrease_cooldown=60.0)
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.limit == 8.0
+
+
+def test_limit_never_drops_below_the_minimum():
+    limiter = AdaptiveLimiter(max_limit=16, min_limit=3, decrease_cooldown=0.0)
+    for _ in range(10):
+        limiter.on_overload()
+    assert limiter.limit == 3.0
+
+
+def test_success_grows_the_limit_by_about_one_per_window():
+    limiter = AdaptiveLimiter(max_limit=16, min_limit=2, decrease_cooldown=0.0)
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.limit == 4.0
+    for _ in range(4):
+        limiter.on_success()
+    assert 4.9 < limiter.limit < 5.0
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.limit == 16.0
+
+
+def test_callers_over_the_limit_wait_in_order():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, queue_timeout=5.0)
+        order = []
+
+        async def call(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call(i) for i in range(4)))
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(main())
+    assert order == [0, 1, 2, 3]
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def test_full_queue_rejects_immediately():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, max_queue=1, queue_timeout=5.0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamOverloaded):
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return limiter.rejected
+
+    assert asyncio.run(main()) == 1
+
+
+def test_queue_timeout_raises_with_retry_after():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, queue_timeout=0.05)
+        async with limiter.slot():
+            with pytest.raises(UpstreamOverloaded) as info:
+                async with limiter.slot():
+                    pass
+        return info.value, limiter.stats()
+
+    error, stats = asyncio.run(main())
+    assert error.retry_after == 1
+    assert stats["queued"] == 0 and stats["in_flight"] == 0
+
+
+def test_drain_waits_for_in_flight_calls():
+    async def main():
+        limiter = AdaptiveLimiter()
+
+        async def call():
+            async with limiter.slot():
+                await asyncio.sleep(0.02)
+
+        task = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        drained = await limiter.drain(timeout=1.0)
+        await task
+        return drained
+
+    assert asyncio.run(main())
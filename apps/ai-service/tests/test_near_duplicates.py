@@ -0,0 +1,76 @@
+"""Tests for the near-duplicate image index and analysis reuse."""
+
+import asyncio
+import io
+
+from PIL import Image, ImageDraw
+
+from models.design import DesignAnalysis
+from services.cache import ResultCache, make_cache_key
+from services.near_duplicates import NearDuplicateIndex
+from services.phash import image_signature
+
+RED = (200, 30, 30)
+
+ANALYSIS = DesignAnalysis(
+    colors=["#C81E1E", "#000000", "#FFFFFF"],
+    aesthetic="retro",
+    mood="energetic",
+    layout_style="centered",
+    typography_suggestions="pixel fonts",
+    animation_ideas="blinking cursor",
+)
+
+
+def digest(n):
+    return f"{n:02x}" * 32
+
+
+def add(index, signature, image_digest):
+    assert asyncio.run(index.add(signature, image_digest))
+
+
+def test_candidates_are_closest_first_without_repeats():
+    index = NearDuplicateIndex(max_distance=5)
+    add(index, (0b111, RED), digest(3))
+    add(index, (0b0, RED), digest(1))
+    add(index, (0b1, RED), digest(2))
+    add(index, (0b0, RED), digest(1))  # the same image analyzed twice
+
+    assert index.candidates((0b0, RED)) == [digest(1), digest(2), digest(3)]
+    assert index.candidates((0b0, RED), limit=2) == [digest(1), digest(2)]
+    assert index.stats()["matches"] == 2
+
+
+def test_candidates_skip_other_colors_and_distant_hashes():
+    index = NearDuplicateIndex(max_distance=5)
+    add(index, (0b0, (30, 30, 200)), digest(1))
+    add(index, (0xFFFF, RED), digest(2))
+
+    assert index.candidates((0b0, RED)) == []
+    stats = index.stats()
+    assert (stats["lookups"], stats["matches"]) == (1, 0)
+
+
+def test_reuse_falls_through_to_a_match_that_is_still_cached(stub_claude):
+    image = Image.new("RGB", (64, 64), RED)
+    ImageDraw.Draw(image).rectangle((8, 8, 40, 40), fill=(250, 250, 250))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    value, color = image_signature(buffer.getvalue())
+
+    claude = stub_claude(lambda request: "vision should not be called")
+    claude.cache = ResultCache()
+    claude.near_duplicates = NearDuplicateIndex(max_distance=5)
+    # The closest match's analysis has been evicted; a farther one is cached
+    add(claude.near_duplicates, (value, color), digest(1))
+    add(claude.near_duplicates, (value ^ 0b11, color), digest(2))
+
+    async def scenario():
+        await claude.cache.set(
+            make_cache_key("image-analysis", claude.model, digest(2)), ANALYSIS.model_dump()
+        )
+        return await claude._cached_analyze_image(buffer.getvalue())
+
+    assert asyncio.run(scenario()) == ANALYSIS
+    assert claude.client.messages.requests == []
@@ -0,0 +1,87 @@
+"""Tests for perceptual hashing and the Hamming-distance index."""
+
+import io
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from services.image_processing import ImageProcessingError
+from services.phash import HashIndex, dhash, parse_hash
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def brute_force(hashes, query, max_distance):
+    return sorted(
+        ((value ^ query).bit_count(), entry)
+        for entry, value in enumerate(hashes)
+        if (value ^ query).bit_count() <= max_distance
+    )
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 4, 7, 10])
+def test_search_matches_a_linear_scan(max_distance):
+    rng = random.Random(max_distance)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    index = HashIndex(hashes)
+    queries = [flip_bits(rng.choice(hashes), rng.randint(0, max_distance + 2), rng) for _ in range(200)]
+    queries += [rng.getrandbits(64) for _ in range(50)]
+    for query in queries:
+        assert index.search(query, max_distance) == brute_force(hashes, query, max_distance)
+
+
+def test_nearest_returns_the_closest_entry():
+    index = HashIndex([0b1111, 0b0111, 0xFFFF_FFFF_FFFF_FFFF])
+    assert index.nearest(0b0011, 4) == (1, 1)
+    assert index.nearest(0xFFFF_0000_0000_0000, 4) is None
+
+
+def test_duplicate_hashes_are_all_returned():
+    index = HashIndex([42, 42])
+    assert index.search(42, 0) == [(0, 0), (0, 1)]
+    assert len(index) == 2
+
+
+def test_parse_hash_rejects_values_wider_than_64_bits():
+    assert parse_hash("ffffffffffffffff") == 2**64 - 1
+    with pytest.raises(ValueError):
+        parse_hash("1ffffffffffffffff")
+
+
+def picture():
+    image = Image.new("RGB", (400, 300))
+    draw = ImageDraw.Draw(image)
+    for y in range(300):
+        draw.line([(0, y), (400, y)], fill=(y // 2, 100, 255 - y // 2))
+    draw.ellipse([50, 50, 200, 200], fill=(255, 200, 0))
+    draw.rectangle([250, 100, 380, 280], fill=(20, 200, 80))
+    return image
+
+
+def encode(image, fmt="PNG", **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def test_dhash_survives_resizing_and_recompression():
+    image = picture()
+    original = dhash(encode(image))
+    copy = dhash(encode(image.resize((160, 120)), "JPEG", quality=40))
+    assert (original ^ copy).bit_count() <= 6
+
+
+def test_dhash_tells_different_images_apart():
+    image = picture()
+    mirrored = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    assert (dhash(encode(image)) ^ dhash(encode(mirrored))).bit_count() > 10
+
+
+def test_dhash_rejects_undecodable_bytes():
+    with pytest.raises(ImageProcessingError):
+        dhash(b"\x89PNG not really")
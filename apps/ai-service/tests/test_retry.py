@@ -0,0 +1,135 @@
+"""Tests for the retry policy and hedged attempts."""
+
+import asyncio
+
+import httpx
+import pytest
+from anthropic import APIStatusError
+
+from services.limiter import UpstreamOverloaded
+from services.retry import RetryingCaller, RetryPolicy, is_retryable
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return APIStatusError("upstream error", response=response, body=None)
+
+
+def flaky(failures, result="ok"):
+    """Attempt function that raises the given errors first, then succeeds."""
+    errors = list(failures)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return attempt, calls
+
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.01, deadline=5.0)
+
+
+@pytest.mark.parametrize("status", [429, 500, 503, 529])
+def test_transient_statuses_are_retryable(status):
+    assert is_retryable(status_error(status))
+
+
+@pytest.mark.parametrize("error", [status_error(400), status_error(401), ValueError("bad json"), UpstreamOverloaded("full", 1)])
+def test_permanent_errors_are_not_retryable(error):
+    assert not is_retryable(error)
+
+
+def test_transient_failures_are_retried_until_success():
+    attempt, calls = flaky([status_error(529), status_error(500)])
+    caller = RetryingCaller(FAST)
+    assert asyncio.run(caller.call(attempt)) == "ok"
+    assert len(calls) == 3
+    assert caller.retries == 2
+
+
+def test_gives_up_after_max_attempts():
+    attempt, calls = flaky([status_error(529)] * 5)
+    with pytest.raises(APIStatusError):
+        asyncio.run(RetryingCaller(FAST).call(attempt))
+    assert len(calls) == 3
+
+
+def test_permanent_failure_is_not_retried():
+    attempt, calls = flaky([status_error(400)])
+    with pytest.raises(APIStatusError):
+        asyncio.run(RetryingCaller(FAST).call(attempt))
+    assert len(calls) == 1
+
+
+def test_retry_after_longer_than_the_deadline_gives_up():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=30.0, deadline=0.5)
+    attempt, calls = flaky([status_error(429, {"retry-after": "10"})])
+    with pytest.raises(APIStatusError):
+        asyncio.run(RetryingCaller(policy).call(attempt))
+    assert len(calls) == 1
+
+
+def test_slow_attempt_is_hedged_and_the_first_success_wins():
+    async def main():
+        caller = RetryingCaller(RetryPolicy(hedge=True, hedge_min_delay=0.02))
+        for _ in range(20):
+            caller.tracker("css").record(0.01)
+        delays = [1.0, 0.01]
+
+        async def attempt():
+            delay = delays.pop(0)
+            await asyncio.sleep(delay)
+            return delay
+
+        started = asyncio.get_running_loop().time()
+        result = await caller.call(attempt, label="css")
+        return result, asyncio.get_running_loop().time() - started, caller.hedges
+
+    result, elapsed, hedges = asyncio.run(main())
+    assert result == 0.01
+    assert elapsed < 0.5
+    assert hedges == 1
+
+
+def test_hedge_timing_is_tracked_per_label():
+    async def main():
+        caller = RetryingCaller(RetryPolicy(hedge=True, hedge_min_delay=0.001))
+        # A shared window would now hold only the fast moderation calls and
+        # hedge every CSS call
+        for _ in range(20):
+            caller.tracker("css").record(0.2)
+        for _ in range(200):
+            caller.tracker("moderation_text").record(0.001)
+
+        async def attempt():
+            await asyncio.sleep(0.05)
+            return "css"
+
+        await caller.call(attempt, label="css")
+        return caller
+
+    caller = asyncio.run(main())
+    assert caller.hedges == 0
+    stats = caller.stats()["latency"]
+    assert set(stats) == {"css", "moderation_text"}
+    assert stats["moderation_text"]["p95_seconds"] == 0.001
+
+
+def test_no_hedging_until_a_label_has_enough_samples():
+    async def main():
+        caller = RetryingCaller(RetryPolicy(hedge=True, hedge_min_delay=0.001))
+        attempts = []
+
+        async def attempt():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        await caller.call(attempt, label="vision")
+        return caller.hedges, len(attempts)
+
+    assert asyncio.run(main()) == (0, 1)
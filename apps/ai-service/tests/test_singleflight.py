@@ -0,0 +1,82 @@
+"""Tests for in-flight request coalescing."""
+
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "css"
+
+        results = await asyncio.gather(*(flight.do("key", load, call="css") for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(main())
+    assert results == ["css"] * 5
+    assert len(calls) == 1
+    assert stats == {"in_flight": 0, "started": 1, "joined": 4}
+
+
+def test_different_keys_do_not_share():
+    async def main():
+        flight = SingleFlight()
+
+        async def load(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        return await asyncio.gather(flight.do("a", lambda: load("a")), flight.do("b", lambda: load("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_errors_reach_every_caller_and_the_key_is_released():
+    async def main():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+        async def succeed():
+            return "ok"
+
+        return results, await flight.do("key", succeed)
+
+    results, retry = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retry == "ok"
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    async def main():
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", load))
+        second = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_join_returns_none_when_nothing_is_in_flight():
+    assert SingleFlight().join("missing") is None
@@ -0,0 +1,159 @@
+"""Tests for incremental parsing of streamed model output and the SSE path."""
+
+import asyncio
+import json
+import random
+
+import httpx
+import pytest
+
+from api.design import _sse
+from config import Settings
+from models.design import DesignPreferences
+from services.claude import ClaudeService
+from services.streaming import CSSStreamParser, StreamEvent, extract_css
+
+CSS = (
+    ".pixelpage { background: #0d0221; color: #ff71ce }\n"
+    '.profile-bio::after { content: "}" }\n'
+    "body { margin: 0 }\n"
+    "@media (max-width: 600px) { .widget { padding: 4px } }\n"
+)
+DESCRIBED = f"EXPLANATION: Neon on deep purple.\nCSS:\n```css\n{CSS}```\nHope you like it!"
+
+
+def chunked(text, rng):
+    pieces = []
+    while text:
+        size = rng.randint(1, 12)
+        pieces.append(text[:size])
+        text = text[size:]
+    return pieces
+
+
+def run_parser(pieces, expect_explanation):
+    parser = CSSStreamParser(expect_explanation=expect_explanation)
+    events = []
+    for piece in pieces:
+        events += parser.feed(piece)
+    events += parser.finish()
+    return parser, events
+
+
+def deltas(events, kind):
+    return "".join(event.data["delta"] for event in events if event.type == kind)
+
+
+def batch_parse(text, expect_explanation):
+    claude = ClaudeService(Settings(enable_mock_responses=True, anthropic_api_key=""))
+    if expect_explanation:
+        return claude._parse_explanation_and_css(text)
+    return None, claude._clean_css(text)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize(
+    "text, expect_explanation",
+    [
+        (DESCRIBED, True),
+        (f"```css\n{CSS}```", False),
+        (CSS, False),
+        (f"Here you go:\n```\n{CSS}```", False),
+    ],
+)
+def test_stream_deltas_equal_the_batch_parse(seed, text, expect_explanation):
+    parser, events = run_parser(chunked(text, random.Random(seed)), expect_explanation)
+    explanation, css = batch_parse(text, expect_explanation)
+    assert deltas(events, "css") == parser.css == css
+    if expect_explanation:
+        assert deltas(events, "explanation").strip() == explanation
+
+
+def test_css_is_emitted_rule_by_rule_and_sanitized():
+    parser = CSSStreamParser()
+    assert parser.feed(".pixelpage { color: red") == []
+    events = parser.feed(" } body { margin: 0 } .widget {")
+    assert [event.data["delta"] for event in events] == [".pixelpage {\n  color: red;\n}"]
+    events = parser.feed(" color: blue }") + parser.finish()
+    assert deltas(events, "css").startswith("\n\n.widget")
+    assert "body" not in parser.css
+
+
+def test_marker_split_across_chunks_is_not_leaked():
+    parser, events = run_parser(["EXPLAN", "ATION: hi\nCS", "S:\n.pixelpage { color: red }"], True)
+    assert deltas(events, "explanation").strip() == "hi"
+    assert "CSS:" not in parser.explanation and "CS" not in parser.css
+
+
+def test_extract_css_prefers_a_leading_fence():
+    assert extract_css("intro\n```css\n.a { }\n```\nbye") == ".a { }\n"
+    assert extract_css(".a { }\n```\ntrailing") == ".a { }\n"
+    assert extract_css("```css") == ""
+
+
+def test_sse_framing():
+    frame = _sse(StreamEvent("css", {"delta": ".pixelpage {}\n"}))
+    assert frame == 'event: css\ndata: {"delta": ".pixelpage {}\\n"}\n\n'
+
+
+def anthropic_sse(text, usage):
+    """A Messages API event stream carrying ``text``, as the API sends it."""
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    body = event("message_start", {"type": "message_start", "message": {
+        "id": "msg_test", "type": "message", "role": "assistant", "model": "test", "content": [],
+        "stop_reason": None, "stop_sequence": None, "usage": usage,
+    }})
+    body += event("content_block_start", {
+        "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+    })
+    for start in range(0, len(text), 40):
+        body += event("content_block_delta", {
+            "type": "content_block_delta", "index": 0,
+            "delta": {"type": "text_delta", "text": text[start:start + 40]},
+        })
+    body += event("content_block_stop", {"type": "content_block_stop", "index": 0})
+    body += event("message_delta", {
+        "type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+        "usage": {"output_tokens": 50},
+    })
+    body += event("message_stop", {"type": "message_stop"})
+    return body.encode()
+
+
+def test_streamed_description_through_the_sdk_event_parser():
+    """Server-sent events split at arbitrary byte boundaries reach the client intact."""
+    payload = anthropic_sse(DESCRIBED, {"input_tokens": 30, "output_tokens": 0, "cache_read_input_tokens": 900})
+    requests = []
+
+    async def body():
+        rng = random.Random(7)
+        position = 0
+        while position < len(payload):
+            size = rng.randint(1, 64)
+            yield payload[position:position + size]
+            position += size
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body())
+
+    async def main():
+        settings = Settings(enable_mock_responses=False, anthropic_api_key="test-key")
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        claude = ClaudeService(settings, http_client=http_client)
+        events = [
+            event async for event in claude.stream_css_from_description("neon purple", DesignPreferences())
+        ]
+        await http_client.aclose()
+        return claude, events
+
+    claude, events = asyncio.run(main())
+    assert requests[0]["stream"] is True
+    done = events[-1]
+    assert done.type == "done" and "fallback" not in done.data
+    assert deltas(events, "css") == done.data["css"]
+    assert done.data["explanation"] == "Neon on deep purple."
+    assert "body" not in done.data["css"]
+    assert claude.prompt_cache_stats()["cache_read_tokens"] == 900
@@ -0,0 +1,71 @@
+"""Tests for image upload validation."""
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from api.uploads import read_image_upload
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+def upload(data, content_type="image/png"):
+    return UploadFile(
+        io.BytesIO(data), filename="upload", headers=Headers({"content-type": content_type})
+    )
+
+
+def read(data, content_type="image/png", max_bytes=1024, chunk_size=16):
+    return asyncio.run(read_image_upload(upload(data, content_type), max_bytes, chunk_size))
+
+
+def rejection(data, **kwargs):
+    with pytest.raises(HTTPException) as excinfo:
+        read(data, **kwargs)
+    return excinfo.value
+
+
+def test_image_is_read_hashed_and_sniffed():
+    data = PNG_HEADER + bytes(range(200))
+
+    image = read(data)
+
+    assert image.data == data
+    assert image.sha256 == hashlib.sha256(data).hexdigest()
+    assert image.media_type == "image/png"
+
+
+def test_file_at_the_limit_is_accepted():
+    data = PNG_HEADER + b"\x00" * (1024 - len(PNG_HEADER))
+
+    assert read(data).data == data
+
+
+def test_file_over_the_limit_is_413():
+    error = rejection(PNG_HEADER + b"\x00" * 1024)
+
+    assert error.status_code == 413
+
+
+def test_bad_magic_bytes_are_400():
+    error = rejection(b"%PDF-1.7 not an image" * 4)
+
+    assert error.status_code == 400
+    assert "Unsupported image format" in error.detail
+
+
+def test_empty_file_is_400():
+    error = rejection(b"")
+
+    assert error.status_code == 400
+    assert error.detail == "Image file is empty"
+
+
+def test_non_image_content_type_is_400():
+    error = rejection(PNG_HEADER, content_type="text/plain")
+
+    assert error.status_code == 400
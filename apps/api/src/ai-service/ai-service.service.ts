@@ -3,6 +3,7 @@ import { HttpService } from '@nestjs/axios';
 import { firstValueFrom } from 'rxjs';
 import { AxiosResponse } from 'axios';
 import FormData from 'form-data';
+import { randomUUID } from 'crypto';
 
 export interface DesignPreferences {
   dark_mode?: boolean;
@@ -24,6 +25,7 @@ export interface ModerationResult {
   flags: string[];
   action: 'approve' | 'reject' | 'review';
   reason?: string;
+  tier?: 'local' | 'model' | 'fallback';
 }
 
 @Injectable()
@@ -43,6 +45,7 @@ export class AiServiceService {
   async generateCSSFromImage(
     imageBuffer: Buffer,
     preferences?: DesignPreferences,
+    requestId: string = randomUUID(),
   ): Promise<DesignResult> {
     try {
       const formData = new FormData();
@@ -62,16 +65,22 @@ export class AiServiceService {
           {
             headers: {
               'X-API-Key': this.apiKey,
+              'X-Request-ID': requestId,
               ...formData.getHeaders(),
             },
           },
         ),
       );
 
-      this.logger.log('Generated CSS from image successfully');
+      this.logger.log(
+        `Generated CSS from image successfully (request ${requestId}, ${response.headers['server-timing'] ?? 'no timing'})`,
+      );
       return response.data;
     } catch (error) {
-      this.logger.error('Failed to generate CSS from image:', error.message);
+      this.logger.error(
+        `Failed to generate CSS from image (request ${requestId}):`,
+        error.message,
+      );
       throw new HttpException(
         'Failed to generate design from image',
         HttpStatus.INTERNAL_SERVER_ERROR,
@@ -85,6 +94,7 @@ export class AiServiceService {
   async generateCSSFromDescription(
     description: string,
     preferences?: DesignPreferences,
+    requestId: string = randomUUID(),
   ): Promise<DesignResult> {
     try {
       const response: AxiosResponse<DesignResult> = await firstValueFrom(
@@ -97,17 +107,20 @@ export class AiServiceService {
           {
             headers: {
               'X-API-Key': this.apiKey,
+              'X-Request-ID': requestId,
               'Content-Type': 'application/json',
             },
           },
         ),
       );
 
-      this.logger.log('Generated CSS from description successfully');
+      this.logger.log(
+        `Generated CSS from description successfully (request ${requestId}, ${response.headers['server-timing'] ?? 'no timing'})`,
+      );
       return response.data;
     } catch (error) {
       this.logger.error(
-        'Failed to generate CSS from description:',
+        `Failed to generate CSS from description (request ${requestId}):`,
         error.message,
       );
       throw new HttpException(
@@ -118,52 +131,127 @@ export class AiServiceService {
   }
 
   /**
-   * Moderate an image (placeholder - auto-approve for now)
-   * TODO: Implement actual vision-based moderation
+   * Moderate an image
+   *
+   * Copies of known-bad images are rejected locally by the AI service; other
+   * images are checked by the moderation model. Failures fall back to human
+   * review rather than approving unchecked content.
    */
-  async moderateImage(imageBuffer: Buffer): Promise<ModerationResult> {
-    // Placeholder implementation - auto-approve
-    this.logger.log('Image moderation (placeholder): auto-approved');
-
-    // TODO: Call AI service endpoint when implemented
-    // const response = await firstValueFrom(
-    //   this.httpService.post(
-    //     `${this.aiServiceUrl}/moderate/image`,
-    //     formData,
-    //     { headers: { 'X-API-Key': this.apiKey } }
-    //   )
-    // );
+  async moderateImage(
+    imageBuffer: Buffer,
+    requestId: string = randomUUID(),
+  ): Promise<ModerationResult> {
+    try {
+      const formData = new FormData();
+      formData.append('image', imageBuffer, {
+        filename: 'upload.jpg',
+        contentType: 'image/jpeg',
+      });
 
-    return {
-      safe: true,
-      score: 1.0,
-      flags: [],
-      action: 'approve',
-    };
+      const response: AxiosResponse<ModerationResult> = await firstValueFrom(
+        this.httpService.post(
+          `${this.aiServiceUrl}/moderate/image`,
+          formData,
+          {
+            headers: {
+              'X-API-Key': this.apiKey,
+              'X-Request-ID': requestId,
+              ...formData.getHeaders(),
+            },
+          },
+        ),
+      );
+
+      return response.data;
+    } catch (error) {
+      this.logger.error(
+        `Failed to moderate image (request ${requestId}):`,
+        error.message,
+      );
+      return this.reviewFallback();
+    }
   }
 
   /**
-   * Moderate text content (placeholder - auto-approve for now)
-   * TODO: Implement actual text moderation with Claude
+   * Moderate text content
+   *
+   * Clear cases are decided by the AI service's local prefilter; ambiguous
+   * text is batched into model calls. Failures fall back to human review.
    */
-  async moderateText(content: string): Promise<ModerationResult> {
-    // Placeholder implementation - auto-approve
-    this.logger.log('Text moderation (placeholder): auto-approved');
-
-    // TODO: Call AI service endpoint when implemented
-    // const response = await firstValueFrom(
-    //   this.httpService.post(
-    //     `${this.aiServiceUrl}/moderate/text`,
-    //     { content },
-    //     { headers: { 'X-API-Key': this.apiKey } }
-    //   )
-    // );
+  async moderateText(
+    content: string,
+    context?: string,
+    requestId: string = randomUUID(),
+  ): Promise<ModerationResult> {
+    try {
+      const response: AxiosResponse<ModerationResult> = await firstValueFrom(
+        this.httpService.post(
+          `${this.aiServiceUrl}/moderate/text`,
+          { content, context },
+          {
+            headers: {
+              'X-API-Key': this.apiKey,
+              'X-Request-ID': requestId,
+              'Content-Type': 'application/json',
+            },
+          },
+        ),
+      );
+
+      return response.data;
+    } catch (error) {
+      this.logger.error(
+        `Failed to moderate text (request ${requestId}):`,
+        error.message,
+      );
+      return this.reviewFallback();
+    }
+  }
 
+  /**
+   * Moderate many texts in one request (e.g. a backlog of chat messages)
+   */
+  async moderateTexts(
+    items: { id: string; content: string; context?: string }[],
+    requestId: string = randomUUID(),
+  ): Promise<Map<string, ModerationResult>> {
+    try {
+      const response: AxiosResponse<{
+        results: { id: string; result: ModerationResult }[];
+      }> = await firstValueFrom(
+        this.httpService.post(
+          `${this.aiServiceUrl}/moderate/batch`,
+          { items },
+          {
+            headers: {
+              'X-API-Key': this.apiKey,
+              'X-Request-ID': requestId,
+              'Content-Type': 'application/json',
+            },
+          },
+        ),
+      );
+
+      return new Map(response.data.results.map(({ id, result }) => [id, result]));
+    } catch (error) {
+      this.logger.error(
+        `Failed to moderate batch of ${items.length} texts (request ${requestId}):`,
+        error.message,
+      );
+      return new Map(items.map(({ id }) => [id, this.reviewFallback()]));
+    }
+  }
+
+  /**
+   * Verdict used when the AI service cannot be reached: queue for a human
+   */
+  private reviewFallback(): ModerationResult {
     return {
-      safe: true,
-      score: 1.0,
+      safe: false,
+      score: 0.5,
       flags: [],
-      action: 'approve',
+      action: 'review',
+      reason: 'AI moderation unavailable',
     };
   }
 
@@ -109,16 +109,15 @@ export class GuestbookService {
       },
     });
 
-    // TODO: Moderate guestbook entry content
-    // For now, auto-approve (placeholder)
+    // Moderate guestbook entry content
     try {
-      await this.moderationService.moderateText(
+      const moderation = await this.moderationService.moderateText(
         dto.content,
         ContentType.GUESTBOOK,
         entry.id,
         authorId,
       );
-      this.logger.log(`Guestbook entry ${entry.id} queued for moderation (auto-approved)`);
+      this.logger.log(`Guestbook entry ${entry.id} moderated: ${moderation.action}`);
     } catch (error) {
       this.logger.error('Failed to queue guestbook entry for moderation:', error);
       // Don't block entry creation if moderation fails
@@ -38,7 +38,7 @@ export class ModerationService {
 
   /**
    * Moderate image content
-   * Currently auto-approves - TODO: Implement actual AI moderation
+   * Known-bad copies are rejected locally by the AI service, the rest by model
    */
   async moderateImage(
     imageBuffer: Buffer,
@@ -52,7 +52,7 @@ export class ModerationService {
       userId,
     );
 
-    // Call AI moderation service (placeholder - auto-approves)
+    // Call AI moderation service (falls back to review if unavailable)
     const moderationResult = await this.aiService.moderateImage(imageBuffer);
 
     // Update queue entry with result
@@ -74,7 +74,7 @@ export class ModerationService {
 
   /**
    * Moderate text content
-   * Currently auto-approves - TODO: Implement actual AI moderation
+   * Clear cases are decided by the AI service's prefilter, the rest by model
    */
   async moderateText(
     content: string,
@@ -89,8 +89,11 @@ export class ModerationService {
       userId,
     );
 
-    // Call AI moderation service (placeholder - auto-approves)
-    const moderationResult = await this.aiService.moderateText(content);
+    // Call AI moderation service (falls back to review if unavailable)
+    const moderationResult = await this.aiService.moderateText(
+      content,
+      contentType.toLowerCase(),
+    );
 
     // Update queue entry with result
     await this.prisma.moderationQueue.update({